@@ -0,0 +1 @@
+"""Бенчмарки генераторов колод"""
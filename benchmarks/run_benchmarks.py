@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки генераторов колод на синтетических корпусах.
+
+Для каждой схемы (words, verbs) и размера корпуса замеряются создание
+моделей и потоковая сборка через PackageWriter, как в CLI. Сборка с
+каждым бэкендом выполняется в отдельном процессе, чтобы пиковая память
+одной не влияла на другую. Результаты пишутся в JSON и сравниваются с
+базовыми; при регрессии сверх порога скрипт завершается с кодом 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.synthetic import SCHEMAS, corpus_path, format_size, parse_size
+from deck_tools.apkg import BACKEND_GENANKI, BACKENDS
+from deck_tools.profiling import PhaseProfile
+
+DEFAULT_SIZES = "1k,100k,1m"
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent / "data"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.2
+# Абсолютные допуски, ниже которых разница считается шумом
+MIN_SECONDS_DELTA = 0.05
+MIN_RSS_DELTA_MB = 5
+
+
+def peak_rss_mb():
+    """Пиковый RSS текущего процесса в МБ (ru_maxrss в Linux — в КБ)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PhaseTimer(PhaseProfile):
+    """PhaseProfile, дополнительно записывающий пиковый RSS после каждой фазы"""
+
+    def run(self, name, func, *args, **kwargs):
+        with self.phase(name):
+            result = func(*args, **kwargs)
+        self.phases[name]["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        return result
+
+
+def import_generator(schema):
+    if schema == "words":
+        sys.path.insert(0, str(ROOT / "word"))
+        import generate_words_deck as module
+    else:
+        sys.path.insert(0, str(ROOT / "irregular_verbs"))
+        import generate_verbs_deck as module
+    return module
+
+
+def bench_streaming(schema, csv_file, out_dir, backend=BACKEND_GENANKI):
+    import genanki
+
+    from deck_tools.apkg import PackageWriter
+    from deck_tools.identity import stable_deck_id
+    from deck_tools.manifest import hash_row
+
+    module = import_generator(schema)
+    output = Path(out_dir) / f"{schema}_stream_{backend}.apkg"
+    timer = PhaseTimer()
+    if schema == "words":
+        models = [timer.run("model", module.create_card_model)]
+        records = module.iter_words_from_csv(csv_file)
+        rows = ((hash_row([*word, ""]), word) for word in records)
+
+        def notes_for_row(word):
+            return module.create_notes(word, models[0])
+
+    else:
+        models = timer.run("model", module.create_card_models)
+        records = module.iter_verbs_from_csv(csv_file)
+        rows = ((hash_row(verb), verb) for verb in records)
+
+        def notes_for_row(verb):
+            return module.create_notes(verb, models)
+
+    writer = PackageWriter(output, [csv_file], {}, {}, force=True)
+    deck = genanki.Deck(stable_deck_id("benchmark"), "benchmark")
+    timer.run(
+        "stream_build",
+        writer.write,
+        deck,
+        models,
+        rows,
+        notes_for_row,
+        profile=timer,
+        backend=backend,
+    )
+    return timer.report()["phases"], output.stat().st_size
+
+
+def _child(connection, bench, *args):
+    try:
+        connection.send(bench(*args))
+    except BaseException as e:
+        connection.send(e)
+    finally:
+        connection.close()
+
+
+def run_isolated(bench, *args):
+    """Запускает бенчмарк в отдельном процессе и возвращает его результат"""
+    context = multiprocessing.get_context("fork")
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(child, bench, *args))
+    process.start()
+    child.close()
+    result = parent.recv()
+    process.join()
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def run_case(schema, rows, data_dir, backends=(BACKEND_GENANKI,)):
+    """
+    Фазы потоковой сборки с бэкендом, отличным от genanki, получают префикс
+    "<бэкенд>/", а размер пакета - ключ stream_bytes_<бэкенд>.
+    """
+    csv_file = str(corpus_path(data_dir, schema, rows))
+    case = {"rows": rows, "csv_bytes": os.path.getsize(csv_file), "phases": {}}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for backend in backends:
+            phases, size = run_isolated(
+                bench_streaming, schema, csv_file, out_dir, backend
+            )
+            if backend == BACKEND_GENANKI:
+                case["phases"].update(phases)
+                case["stream_bytes"] = size
+            else:
+                for phase, data in phases.items():
+                    case["phases"][f"{backend}/{phase}"] = data
+                case[f"stream_bytes_{backend}"] = size
+    return case
+
+
+def package_size_keys(case):
+    return [key for key in case if "_bytes" in key and key != "csv_bytes"]
+
+
+def compare(results, baseline, threshold):
+    """Список строк с регрессиями относительно базовых результатов"""
+    regressions = []
+    for name, case in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            continue
+        for phase, current in case["phases"].items():
+            previous = base["phases"].get(phase)
+            if previous is None:
+                continue
+            for key, min_delta in (
+                ("seconds", MIN_SECONDS_DELTA),
+                ("peak_rss_mb", MIN_RSS_DELTA_MB),
+            ):
+                if key not in current or key not in previous:
+                    continue
+                delta = current[key] - previous[key]
+                if delta > min_delta and current[key] > previous[key] * (1 + threshold):
+                    regressions.append(
+                        f"{name} {phase} {key}: {previous[key]} -> {current[key]}"
+                    )
+        for key in package_size_keys(case):
+            if key in base and case[key] > base[key] * (1 + threshold):
+                regressions.append(f"{name} {key}: {base[key]} -> {case[key]}")
+    return regressions
+
+
+def print_case(name, case):
+    print(f"{name} ({case['rows']} строк, CSV {case['csv_bytes']} байт)")
+    for phase, data in case["phases"].items():
+        line = f"  {phase:<20} {data['seconds']:>9.3f} с"
+        if "peak_rss_mb" in data:
+            line += f"  пик RSS {data['peak_rss_mb']:>8.1f} МБ"
+        if "rows_per_s" in data:
+            line += f"  {data['rows_per_s']:>10.0f} строк/с"
+        print(line)
+    for key in package_size_keys(case):
+        print(f"  {key:<20} {case[key]:>9} байт")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Бенчмарки генераторов колод на синтетических CSV"
+    )
+    parser.add_argument(
+        "--schemas",
+        default=",".join(SCHEMAS),
+        help="Схемы корпусов через запятую (по умолчанию: words,verbs)",
+    )
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Размеры корпусов через запятую (по умолчанию: {DEFAULT_SIZES})",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=str(DEFAULT_DATA_DIR),
+        help="Каталог для сгенерированных корпусов (переиспользуются между запусками)",
+    )
+    parser.add_argument(
+        "-o", "--output", default="benchmark_results.json", help="Файл с результатами"
+    )
+    parser.add_argument(
+        "--baseline",
+        default=str(DEFAULT_BASELINE),
+        help="Базовые результаты для сравнения",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Сохранить результаты как новые базовые",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Допустимое относительное ухудшение (по умолчанию: 0.2 = 20%%)",
+    )
+    parser.add_argument(
+        "--backends",
+        default=BACKEND_GENANKI,
+        help=(
+            "Бэкенды записи для потоковой сборки через запятую "
+            f"(по умолчанию: {BACKEND_GENANKI}; доступны: {','.join(BACKENDS)})"
+        ),
+    )
+
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "cases": {},
+    }
+    for schema in args.schemas.split(","):
+        for size in args.sizes.split(","):
+            rows = parse_size(size)
+            name = f"{schema}/{format_size(rows)}"
+            case = run_case(schema, rows, args.data_dir, args.backends.split(","))
+            results["cases"][name] = case
+            print_case(name, case)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Результаты записаны в {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Базовые результаты сохранены в {args.baseline}")
+        return
+
+    if not Path(args.baseline).exists():
+        print(
+            f"Сравнение не выполнено: нет базовых результатов {args.baseline}.\n"
+            "Снимите их на этой машине с теми же --sizes и --schemas:\n"
+            "  python benchmarks/run_benchmarks.py --save-baseline",
+            file=sys.stderr,
+        )
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base_cases = baseline.get("cases", {})
+    missing = [name for name in results["cases"] if name not in base_cases]
+    if missing:
+        print(
+            f"Нет в базовых результатах, не сравниваются: {', '.join(missing)}",
+            file=sys.stderr,
+        )
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Регрессии (порог {args.threshold:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("Регрессий относительно базовых результатов нет.")
+
+
+if __name__ == "__main__":
+    main()
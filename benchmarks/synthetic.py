@@ -0,0 +1,133 @@
+"""
+Синтетические CSV для бенчмарков в формате words.csv и verbs.csv.
+
+Данные генерируются детерминированно из seed, поэтому корпус одного размера
+одинаков на всех машинах и между запусками.
+"""
+import csv
+import random
+from pathlib import Path
+
+WORD_COLUMNS = [
+    "word",
+    "transcription",
+    "translation",
+    "example_en",
+    "example_ru",
+    "audio_url",
+]
+VERB_COLUMNS = [
+    "infinitive",
+    "past_simple",
+    "past_participle",
+    "transcription_inf",
+    "transcription_ps",
+    "transcription_pp",
+    "translation",
+    "example_en",
+    "example_ru",
+]
+
+EN_SYLLABLES = ["ba", "con", "de", "fi", "gra", "ment", "lo", "pre", "sta", "ther", "un", "ve"]
+IPA_SYLLABLES = ["bæ", "kən", "dɪ", "faɪ", "ɡræ", "mənt", "ləʊ", "priː", "stə", "ðə", "ʌn", "viː"]
+RU_SYLLABLES = ["ра", "ко", "ми", "ста", "пре", "ло", "ну", "ве", "да", "жи", "тель", "ство"]
+EN_WORDS = ["the", "she", "often", "said", "that", "we", "never", "really", "like", "it"]
+RU_WORDS = ["она", "часто", "говорила", "что", "мы", "никогда", "очень", "это", "как"]
+
+SCHEMAS = {"words": WORD_COLUMNS, "verbs": VERB_COLUMNS}
+# Меняется при изменении генератора, чтобы не использовать старые корпуса
+CORPUS_VERSION = 2
+
+
+def parse_size(text):
+    """'1k' -> 1000, '1m' -> 1000000"""
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    if multiplier != 1:
+        text = text[:-1]
+    return int(text) * multiplier
+
+
+def format_size(rows):
+    for suffix, multiplier in (("m", 1000000), ("k", 1000)):
+        if rows >= multiplier and rows % multiplier == 0:
+            return f"{rows // multiplier}{suffix}"
+    return str(rows)
+
+
+def _unique_suffix(index):
+    """
+    Буквенный суффикс, делающий слова (и GUID заметок) уникальными. Он
+    начинается с "q", которой нет в слогах, поэтому граница основы и
+    суффикса однозначна.
+    """
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("a") + remainder) + letters
+    return "q" + letters
+
+
+def _pick(rng, syllables, count):
+    return "".join(rng.choice(syllables) for _ in range(count))
+
+
+def _sentence(rng, words, subject):
+    return " ".join([words[0].capitalize(), *rng.sample(words[1:], 4), subject]) + "."
+
+
+def word_row(rng, index):
+    count = rng.randint(1, 3)
+    word = _pick(rng, EN_SYLLABLES, count) + _unique_suffix(index)
+    return [
+        word,
+        f"[ˈ{_pick(rng, IPA_SYLLABLES, count)}]",
+        _pick(rng, RU_SYLLABLES, rng.randint(1, 3)),
+        _sentence(rng, EN_WORDS, word),
+        _sentence(rng, RU_WORDS, _pick(rng, RU_SYLLABLES, 2)),
+        f"https://example.com/sounds/{word}--_us_1.mp3",
+    ]
+
+
+def verb_row(rng, index):
+    stem = _pick(rng, EN_SYLLABLES, rng.randint(1, 2)) + _unique_suffix(index)
+    ipa = _pick(rng, IPA_SYLLABLES, 2)
+    if rng.random() < 0.2:
+        past_simple = f"{stem}ed/{stem}t"
+    else:
+        past_simple = f"{stem}ed"
+    return [
+        stem,
+        past_simple,
+        f"{stem}en",
+        f"[{ipa}]",
+        f"[{ipa}d]",
+        f"[{ipa}ən]",
+        _pick(rng, RU_SYLLABLES, 2) + "ть",
+        _sentence(rng, EN_WORDS, stem),
+        _sentence(rng, RU_WORDS, _pick(rng, RU_SYLLABLES, 2)),
+    ]
+
+
+def write_corpus(path, schema, rows, seed=0):
+    """Записывает CSV из rows строк схемы 'words' или 'verbs'"""
+    make_row = word_row if schema == "words" else verb_row
+    rng = random.Random(f"{schema}-{seed}")
+    tmp_path = Path(str(path) + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SCHEMAS[schema])
+        writer.writerows(make_row(rng, i) for i in range(rows))
+    tmp_path.replace(path)
+    return Path(path)
+
+
+def corpus_path(data_dir, schema, rows, seed=0):
+    """Путь к корпусу в data_dir; файл создаётся, только если его ещё нет"""
+    name = f"{schema}_{format_size(rows)}_seed{seed}_v{CORPUS_VERSION}.csv"
+    path = Path(data_dir) / name
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_corpus(path, schema, rows, seed)
+    return path
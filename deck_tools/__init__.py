@@ -0,0 +1,3 @@
+"""
+Общие инструменты сборки Anki колод для генераторов word/ и irregular_verbs/
+"""
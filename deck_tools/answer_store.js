@@ -0,0 +1,66 @@
+// Ответы, введённые на лицевой стороне, до проверки на обратной. Все ответы
+// хранятся в одной записи localStorage по ключам '<NoteId>:<карточка>'
+// (NoteId - короткий ID заметки из поля, заданного при сборке), поэтому
+// кавычки и ; в полях не попадают в ключи. Ответы старше суток и сверх
+// MAX_ENTRIES удаляются не чаще раза в час, вместе с ключами userAnswer*
+// прежних версий шаблонов. Обратная сторона читает ответ через takeAnswer
+// (answers.js), поэтому хранилище встраивается только в лицевые стороны.
+if (!window.answerStore) {
+    window.answerStore = (function() {
+        var NAME = 'rusEnglishAnki.answers';
+        var TTL = 24 * 60 * 60 * 1000;
+        var SWEEP_INTERVAL = 60 * 60 * 1000;
+        var MAX_ENTRIES = 100;
+
+        function load() {
+            try {
+                var data = JSON.parse(localStorage.getItem(NAME));
+                if (data && data.answers) {
+                    return data;
+                }
+            } catch (e) {
+            }
+            return {answers: {}, sweep: 0};
+        }
+
+        function save(data) {
+            try {
+                localStorage.setItem(NAME, JSON.stringify(data));
+            } catch (e) {
+            }
+        }
+
+        function sweep(data, now) {
+            var keys = Object.keys(data.answers).filter(function(key) {
+                return now - data.answers[key][1] <= TTL;
+            }).sort(function(a, b) {
+                return data.answers[b][1] - data.answers[a][1];
+            });
+            var answers = {};
+            keys.slice(0, MAX_ENTRIES).forEach(function(key) {
+                answers[key] = data.answers[key];
+            });
+            data.answers = answers;
+            data.sweep = now;
+            for (var i = localStorage.length - 1; i >= 0; i--) {
+                var key = localStorage.key(i);
+                if (key && key.indexOf('userAnswer') === 0) {
+                    localStorage.removeItem(key);
+                }
+            }
+        }
+
+        return {
+            set: function(key, value) {
+                var data = load();
+                var now = Date.now();
+                data.answers[key] = [value, now];
+                if (now - data.sweep > SWEEP_INTERVAL ||
+                        Object.keys(data.answers).length > MAX_ENTRIES) {
+                    sweep(data, now);
+                }
+                save(data);
+            }
+        };
+    })();
+}
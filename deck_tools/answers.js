@@ -0,0 +1,81 @@
+// Проверка ответа по множеству принимаемых ответов из скрытого поля Accepted.
+// Ответы нормализованы при сборке (deck_tools/answers.py), здесь нормализуется
+// только ввод ученика - по тем же правилам.
+window.normalizeAnswer = function(text) {
+    return text.normalize('NFC').toLowerCase()
+        .replace(/ё/g, 'е')
+        .replace(/[’‘`]/g, "'")
+        .replace(/[\u0300\u0301]/g, '')
+        .replace(/[^\p{L}\p{N}']+/gu, ' ')
+        .trim();
+};
+
+// Принимаемые ответы поля field из <script type="application/json" id="accepted_answers">
+window.readAccepted = function(field) {
+    var element = document.getElementById('accepted_answers');
+    try {
+        return JSON.parse(element.textContent)[field] || null;
+    } catch (e) {
+        return null;
+    }
+};
+
+// Ответ, сохранённый лицевой стороной в answerStore (answer_store.js), с
+// удалением из хранилища. Имя записи localStorage - NAME из answer_store.js.
+window.takeAnswer = function(key) {
+    var name = 'rusEnglishAnki.answers';
+    try {
+        var data = JSON.parse(localStorage.getItem(name));
+        var entry = data && data.answers && data.answers[key];
+        if (entry) {
+            delete data.answers[key];
+            localStorage.setItem(name, JSON.stringify(data));
+            return entry[0];
+        }
+    } catch (e) {
+    }
+    return '';
+};
+
+// 1 - верно, 2 - верно с одной опечаткой, 0 - неверно
+window.findAnswer = function(accepted, userAnswer) {
+    if (!accepted) {
+        return 0;
+    }
+    var MIN_TYPO_LENGTH = 5;  // как в answers.py
+    var accept = accepted.accept;
+    var has = function(key) {
+        return Object.prototype.hasOwnProperty.call(accept, key);
+    };
+    var answer = normalizeAnswer(userAnswer);
+    if (!answer) {
+        return 0;
+    }
+    if (accept[answer] === 1) {
+        return 1;
+    }
+    // Ученик перечислил несколько вариантов через ; / ,
+    var parts = userAnswer.split(/[;\/,]/);
+    for (var i = 0; parts.length > 1 && i < parts.length; i++) {
+        if (accept[normalizeAnswer(parts[i])] === 1) {
+            return 1;
+        }
+    }
+    if (!accepted.typos) {
+        return 0;
+    }
+    // В accept есть и ответы без одной буквы (только для ответов от
+    // MIN_TYPO_LENGTH букв): ввод совпал с ними - пропущенная буква, ввод без
+    // одной буквы - заменённая. Лишняя буква (ввод без одной буквы совпал с
+    // самим ответом) принимается тоже только для ответов от MIN_TYPO_LENGTH
+    if (has(answer)) {
+        return 2;
+    }
+    for (var j = 0; j < answer.length; j++) {
+        var key = answer.slice(0, j) + answer.slice(j + 1);
+        if (has(key) && (accept[key] === 2 || key.length >= MIN_TYPO_LENGTH)) {
+            return 2;
+        }
+    }
+    return 0;
+};
@@ -0,0 +1,164 @@
+"""
+Принимаемые ответы, нормализованные при сборке.
+
+Для каждой заметки заранее считается множество принимаемых ответов и
+кладётся в скрытое поле Accepted как JSON {поле: {"text": значение поля,
+"accept": {ответ: 1}}}. JS карточки (answers.js) нормализует только ввод
+ученика и проверяет его одним поиском в объекте, вместо разбора поля
+ответа при каждом показе карточки.
+
+Нормализация: нижний регистр, ё -> е, без знаков ударения и пунктуации.
+Варианты ответа: всё значение, части через ; / , и значение без
+(пояснений в скобках). С typos=True в accept добавляются ответы без одной
+буквы (значение 2), и JS принимает ответ с одной опечаткой. find_answer -
+тот же поиск, что findAnswer в answers.js.
+"""
+import json
+import re
+import unicodedata
+from functools import lru_cache
+from operator import attrgetter
+from pathlib import Path
+
+# Менять при изменении нормализации: манифест сборки пересоберёт заметки
+ANSWERS_VERSION = 1
+
+EXACT = 1
+TYPO = 2
+# Ответы короче не получают вариантов с опечаткой: слишком много совпадений
+MIN_TYPO_LENGTH = 5
+CACHE_SIZE = 65536
+
+ANSWERS_JS = Path(__file__).with_name("answers.js").read_text(encoding="utf-8")
+# Хранилище введённых ответов для ключей '<NoteId>:<карточка>'
+ANSWER_STORE_JS = Path(__file__).with_name("answer_store.js").read_text(
+    encoding="utf-8"
+)
+
+_CHARS = str.maketrans(
+    {"ё": "е", "’": "'", "‘": "'", "`": "'", "\u0300": None, "\u0301": None}
+)
+_NON_WORD_RE = re.compile(r"(?:[^\w']|_)+")
+_SEPARATORS_RE = re.compile(r"[;/,]")
+_PARENS_RE = re.compile(r"\([^()]*\)")
+
+
+def normalize_answer(text):
+    """Те же правила, что normalizeAnswer в answers.js"""
+    if (
+        text.isalpha()
+        and text.islower()
+        and "ё" not in text
+        and unicodedata.is_normalized("NFC", text)
+    ):
+        return text
+    text = unicodedata.normalize("NFC", text).lower().translate(_CHARS)
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def answer_variants(value):
+    """Нормализованные варианты ответа из значения поля"""
+    if value.isalpha():
+        return {normalize_answer(value)}
+    texts = [value]
+    if "(" in value:
+        texts.append(_PARENS_RE.sub(" ", value))
+    variants = set()
+    for text in texts:
+        parts = [text]
+        if _SEPARATORS_RE.search(text):
+            parts += _SEPARATORS_RE.split(text)
+        for part in parts:
+            answer = normalize_answer(part)
+            if answer:
+                variants.add(answer)
+                if answer.startswith("to "):
+                    variants.add(answer[3:])
+    return variants
+
+
+def accept_map(value, typos=False):
+    """{ответ: EXACT} и, с typos, {ответ без одной буквы: TYPO}"""
+    variants = answer_variants(value)
+    accept = dict.fromkeys(sorted(variants), EXACT)
+    if typos:
+        for answer in sorted(variants):
+            if len(answer) < MIN_TYPO_LENGTH:
+                continue
+            for i in range(len(answer)):
+                accept.setdefault(answer[:i] + answer[i + 1 :], TYPO)
+    return accept
+
+
+def find_answer(accepted, user_answer):
+    """
+    EXACT, TYPO или 0 для ввода ученика, как findAnswer в answers.js.
+    accepted - значение поля одного ответа: {"accept": ..., "typos": ...}.
+    """
+    if not accepted:
+        return 0
+    accept = accepted["accept"]
+    answer = normalize_answer(user_answer)
+    if not answer:
+        return 0
+    if accept.get(answer) == EXACT:
+        return EXACT
+    parts = _SEPARATORS_RE.split(user_answer)
+    if len(parts) > 1 and any(
+        accept.get(normalize_answer(part)) == EXACT for part in parts
+    ):
+        return EXACT
+    if not accepted.get("typos"):
+        return 0
+    if answer in accept:
+        return TYPO
+    for i in range(len(answer)):
+        key = answer[:i] + answer[i + 1 :]
+        # Лишняя буква - только в ответах от MIN_TYPO_LENGTH букв
+        if key in accept and (accept[key] == TYPO or len(key) >= MIN_TYPO_LENGTH):
+            return TYPO
+    return 0
+
+
+def _script_json(data):
+    # "<" экранируется, чтобы значение не закрыло <script> карточки
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).replace(
+        "<", "\\u003c"
+    )
+
+
+class AcceptedAnswers:
+    """
+    Значение поля Accepted для записи. fields - [(имя поля модели, атрибут
+    записи)]. JSON для каждого значения кешируется, поэтому повторяющиеся
+    значения (переводы, формы глаголов) нормализуются один раз за сборку.
+    """
+
+    def __init__(self, fields, typos=False):
+        self.typos = typos
+        self.fields = [(json.dumps(name), attrgetter(attr)) for name, attr in fields]
+        self.fragment = lru_cache(maxsize=CACHE_SIZE)(self._fragment)
+
+    def _fragment(self, value):
+        if value.isalpha():
+            # Буквы не экранируются в JSON: обычное слово собирается без json
+            if not self.typos:
+                answer = normalize_answer(value)
+                return f'{{"text":"{value}","accept":{{"{answer}":1}}}}'
+            accept = accept_map(value, True)
+            items = ",".join(f'"{answer}":{code}' for answer, code in accept.items())
+            return f'{{"text":"{value}","accept":{{{items}}},"typos":true}}'
+        accept = accept_map(value, self.typos)
+        data = {"text": value, "accept": accept}
+        if self.typos:
+            data["typos"] = True
+        return _script_json(data)
+
+    def __call__(self, record):
+        fragment = self.fragment
+        parts = [f"{name}:{fragment(get(record))}" for name, get in self.fields]
+        return "{" + ",".join(parts) + "}"
+
+    def options(self):
+        """Опции манифеста: смена нормализации или typos пересобирает заметки"""
+        return {"answers": [ANSWERS_VERSION, self.typos]}
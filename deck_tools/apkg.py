@@ -0,0 +1,295 @@
+"""
+Запись .apkg с переиспользованием коллекции из предыдущей сборки.
+
+Если опции, поля и набор карточек моделей не менялись, коллекция извлекается
+из прошлого .apkg, модели в ней обновляются (CSS и HTML шаблонов могли
+измениться), удаляются заметки изменённых и удалённых строк CSV и
+добавляются заметки только для новых и изменённых строк.
+"""
+import itertools
+import json
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from .bulk import BulkNoteWriter, tune_for_build
+from .manifest import BuildManifest, RowLog, note_digest
+from .media import DEFLATE_LEVEL, compress_type
+from .profiling import NULL_PROFILE
+
+COLLECTION_NAME = "collection.anki2"
+
+BACKEND_GENANKI = "genanki"
+BACKEND_SQLITE = "sqlite"
+BACKENDS = (BACKEND_GENANKI, BACKEND_SQLITE)
+
+BuildResult = namedtuple(
+    "BuildResult", "patched rows rebuilt removed_notes notes media"
+)
+
+
+def write_collection_header(cursor, deck, models, timestamp):
+    """Создаёт схему коллекции и записывает JSON колоды и моделей в col"""
+    from genanki.apkg_col import APKG_COL
+    from genanki.apkg_schema import APKG_SCHEMA
+
+    cursor.executescript(APKG_SCHEMA)
+    cursor.executescript(APKG_COL)
+
+    (decks_json,) = cursor.execute("SELECT decks FROM col").fetchone()
+    decks = json.loads(decks_json)
+    decks[str(deck.deck_id)] = deck.to_json()
+    cursor.execute("UPDATE col SET decks = ?", (json.dumps(decks),))
+    write_models(cursor, deck, models, timestamp)
+
+
+def write_models(cursor, deck, models, timestamp):
+    """Записывает (или заменяет) JSON моделей в col"""
+    (models_json,) = cursor.execute("SELECT models FROM col").fetchone()
+    models_by_id = json.loads(models_json)
+    for model in models:
+        models_by_id[str(model.model_id)] = model.to_json(timestamp, deck.deck_id)
+    cursor.execute("UPDATE col SET models = ?", (json.dumps(models_by_id),))
+
+
+def delete_notes(cursor, note_ids):
+    for start in range(0, len(note_ids), 500):
+        chunk = note_ids[start : start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f"DELETE FROM cards WHERE nid IN ({placeholders})", chunk)
+        cursor.execute(f"DELETE FROM notes WHERE id IN ({placeholders})", chunk)
+
+
+def next_free_id(cursor, timestamp):
+    (max_note,) = cursor.execute("SELECT MAX(id) FROM notes").fetchone()
+    (max_card,) = cursor.execute("SELECT MAX(id) FROM cards").fetchone()
+    return max(int(timestamp * 1000), (max_note or 0) + 1, (max_card or 0) + 1)
+
+
+def next_free_due(cursor):
+    """Позиция новой карточки после всех карточек коллекции"""
+    (max_due,) = cursor.execute("SELECT MAX(due) FROM cards").fetchone()
+    return 0 if max_due is None else max_due + 1
+
+
+def is_up_to_date(output, inputs, sources, options):
+    """
+    Колода уже собрана из тех же входных данных, опций и файлов кода и
+    шаблонов (source_hashes): проверка до построения моделей.
+    """
+    manifest = BuildManifest.for_output(output)
+    inputs = [str(path) for path in inputs]
+    return manifest.sources_current(output, inputs, sources, options)
+
+
+class PackageWriter:
+    def __init__(self, output, inputs, templates, options, force=False, sources=None):
+        self.output = Path(output)
+        self.inputs = [str(path) for path in inputs]
+        self.templates = templates
+        self.options = options
+        self.sources = sources
+        self.manifest = BuildManifest.for_output(output)
+        if force:
+            self.manifest.data = {}
+
+    def is_current(self):
+        """Колода уже собрана из тех же входных данных"""
+        return self.manifest.is_current(
+            self.output, self.inputs, self.templates, self.options
+        )
+
+    def mark_current(self):
+        """
+        Запоминает source_hashes актуальной колоды (изменился код, но не
+        модели), чтобы следующая проверка прошла до построения моделей.
+        """
+        recorded = self.manifest.data.get("sources")
+        if self.sources is not None and recorded != self.sources:
+            self.manifest.data["sources"] = self.sources
+            self.manifest.save()
+
+    def can_patch(self):
+        return (
+            self.manifest.deck_id is not None
+            and self.manifest.layout_matches(self.templates, self.options)
+            and self.manifest.output_matches(self.output)
+        )
+
+    def write(
+        self,
+        deck,
+        models,
+        rows,
+        notes_for_row,
+        media=None,
+        timestamp=None,
+        since=None,
+        profile=NULL_PROFILE,
+        backend=BACKEND_GENANKI,
+        positions=None,
+    ):
+        """
+        Записывает колоду в .apkg и обновляет манифест.
+
+        rows — итерируемые пары (хеш строки, запись), читаются потоково;
+        notes_for_row(запись) возвращает заметки genanki для строки;
+        media — словарь имя медиафайла -> содержимое (bytes) или путь к файлу;
+        since — PreviousBuild: записать только дельту относительно неё
+        (манифест при этом не обновляется);
+        profile — PhaseProfile для замеров фаз csv, notes, sqlite и zip;
+        backend — BACKEND_GENANKI (Note.write_to_db) или BACKEND_SQLITE
+        (пакетные executemany через BulkNoteWriter);
+        positions — итератор случайных позиций (--shuffle): их получают
+        только записываемые заметки, а при дописывании прошлой коллекции
+        позиции сдвигаются за её карточки, чтобы не совпасть с ними.
+        """
+        import shutil
+        import tempfile
+        import zipfile
+
+        media = media or {}
+        if timestamp is None:
+            timestamp = time.time()
+
+        patched = since is None and self.can_patch()
+        if patched:
+            deck.deck_id = self.manifest.deck_id
+            previous = self.manifest.previous_rows()
+        else:
+            previous = {}
+        if since is not None:
+            media = {
+                name: content
+                for name, content in media.items()
+                if name not in since.media
+            }
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            db_path = os.path.join(tmp_dir, COLLECTION_NAME)
+            if patched:
+                with zipfile.ZipFile(self.output) as previous_apkg:
+                    previous_apkg.extract(COLLECTION_NAME, tmp_dir)
+
+            conn = sqlite3.connect(db_path)
+            if backend == BACKEND_SQLITE:
+                tune_for_build(conn)
+            cursor = conn.cursor()
+            first_due = 0
+            with profile.phase("sqlite"):
+                if patched:
+                    write_models(cursor, deck, models, timestamp)
+                    id_gen = itertools.count(next_free_id(cursor, timestamp))
+                    first_due = next_free_due(cursor)
+                else:
+                    write_collection_header(cursor, deck, models, timestamp)
+                    id_gen = itertools.count(int(timestamp * 1000))
+
+            if backend == BACKEND_SQLITE:
+                bulk = BulkNoteWriter(
+                    cursor, timestamp, deck.deck_id, id_gen, defer_indexes=not patched
+                )
+                write_note = bulk.add
+            else:
+                bulk = None
+
+                def write_note(note, note_id):
+                    note.write_to_db(
+                        cursor,
+                        timestamp,
+                        deck.deck_id,
+                        itertools.chain([note_id], id_gen),
+                    )
+
+            rows = profile.timed_iter("csv", rows)
+            notes_for_row = profile.timed_call("notes", notes_for_row)
+            write_note = profile.timed_call("sqlite", write_note)
+
+            row_notes = RowLog()
+            reused = 0
+            for row_hash, record in rows:
+                candidates = previous.get(row_hash)
+                if candidates:
+                    note_ids, digests = candidates.pop()
+                    reused += 1
+                else:
+                    note_ids = []
+                    digests = bytearray()
+                    for note in notes_for_row(record):
+                        digest = note_digest(
+                            note.model.model_id, note.guid, "\x1f".join(note.fields)
+                        )
+                        if since is not None and digest in since.note_digests:
+                            continue
+                        if positions is not None:
+                            note.due = first_due + next(positions, 0)
+                        note_id = next(id_gen)
+                        write_note(note, note_id)
+                        note_ids.append(note_id)
+                        digests += digest
+                    if since is not None and not note_ids:
+                        reused += 1
+                row_notes.append(row_hash, note_ids, digests)
+
+            stale = [
+                note_id
+                for note_ids_list in previous.values()
+                for note_ids, _ in note_ids_list
+                for note_id in note_ids
+            ]
+            with profile.phase("sqlite"):
+                if bulk is not None:
+                    bulk.finish()
+                delete_notes(cursor, stale)
+                conn.commit()
+                conn.close()
+
+            tmp_output = self.output.with_name(self.output.name + ".tmp")
+            # Коллекция и текстовые файлы сжимаются, уже сжатые форматы
+            # (mp3, ogg, изображения) хранятся как есть
+            with profile.phase("zip"), zipfile.ZipFile(
+                tmp_output,
+                "w",
+                compression=zipfile.ZIP_DEFLATED,
+                compresslevel=DEFLATE_LEVEL,
+            ) as outzip:
+                outzip.write(db_path, COLLECTION_NAME)
+                outzip.writestr(
+                    "media", json.dumps({str(i): name for i, name in enumerate(media)})
+                )
+                for i, (name, content) in enumerate(media.items()):
+                    if isinstance(content, bytes):
+                        outzip.writestr(
+                            str(i), content, compress_type=compress_type(name)
+                        )
+                    else:
+                        outzip.write(content, str(i), compress_type(name))
+            tmp_output.replace(self.output)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        if since is None:
+            with profile.phase("manifest"):
+                self.manifest.record(
+                    self.output,
+                    self.inputs,
+                    self.templates,
+                    self.options,
+                    deck.deck_id,
+                    row_notes,
+                    media=media.keys(),
+                    sources=self.sources,
+                )
+                self.manifest.save()
+
+        return BuildResult(
+            patched=patched,
+            rows=len(row_notes),
+            rebuilt=len(row_notes) - reused,
+            removed_notes=len(stale),
+            notes=len(row_notes.note_ids),
+            media=len(media),
+        )
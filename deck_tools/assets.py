@@ -0,0 +1,36 @@
+"""
+Общие JS/CSS файлы, которые кладутся в .apkg один раз как медиафайлы.
+
+Имена начинаются с подчёркивания (Anki не удаляет такие файлы при проверке
+медиа) и содержат хеш содержимого: изменённый скрипт получает новое имя,
+и у ученика не остаётся закешированной старой версии. С minify JS и CSS
+минифицируются (deck_tools/minify.py).
+"""
+from pathlib import PurePosixPath
+
+from .manifest import hash_text
+from .minify import minify_text
+
+
+class SharedAssets:
+    def __init__(self, prefix, minify=False):
+        self.prefix = prefix
+        self.minify = minify
+        self.files = {}
+
+    def add(self, name, content):
+        """Добавляет файл и возвращает его имя в медиа коллекции"""
+        if self.minify:
+            content = minify_text(name, content)
+        path = PurePosixPath(name)
+        media_name = f"_{self.prefix}_{path.stem}.{hash_text(content)[:8]}{path.suffix}"
+        self.files[media_name] = content.encode("utf-8")
+        return media_name
+
+    def script(self, name, content):
+        """Тег <script>, подключающий JS файл из медиа"""
+        return f'<script src="{self.add(name, content)}"></script>\n'
+
+    def stylesheet(self, name, content):
+        """CSS модели, импортирующий файл стилей из медиа"""
+        return f'@import url("{self.add(name, content)}");\n'
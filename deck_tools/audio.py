@@ -0,0 +1,209 @@
+"""
+Скачивание аудио для колоды в локальный кеш с адресацией по содержимому.
+
+Файлы хранятся в ``<cache>/objects/<sha256[:32]><ext>``, а ``index.json``
+сопоставляет URL с хешем содержимого (или null для URL, вернувших 404/410).
+Повторная сборка берёт файлы из кеша и не обращается к сети. http.client и
+пул потоков импортируются только при скачивании.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path, PurePosixPath
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 3
+MAX_REDIRECTS = 5
+MISSING_STATUSES = (404, 410)
+
+
+def default_cache_dir(name):
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "rus-english-anki" / name
+
+
+def sound_tag(media_name):
+    return f"[sound:{media_name}]"
+
+
+class DownloadError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class AudioCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.index_path = self.cache_dir / "index.json"
+        self.lock = threading.Lock()
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.index = {}
+
+    def lookup(self, url):
+        """Путь к закешированному файлу для URL или None"""
+        name = self.index.get(url)
+        if name and (self.objects_dir / name).exists():
+            return self.objects_dir / name
+        return None
+
+    def is_missing(self, url):
+        """URL уже возвращал 404/410"""
+        return url in self.index and self.index[url] is None
+
+    def mark_missing(self, url):
+        with self.lock:
+            self.index[url] = None
+
+    def store(self, url, content):
+        digest = hashlib.sha256(content).hexdigest()
+        suffix = PurePosixPath(urlsplit(url).path).suffix.lower() or ".mp3"
+        name = f"{digest[:32]}{suffix}"
+        path = self.objects_dir / name
+        if not path.exists():
+            self.objects_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{name}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(content)
+            tmp_path.replace(path)
+        with self.lock:
+            self.index[url] = name
+        return path
+
+    def save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name("index.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        tmp_path.replace(self.index_path)
+
+
+class Downloader:
+    """
+    HTTP(S) загрузчик для пула потоков: каждый поток держит по одному
+    keep-alive соединению на хост, поэтому число соединений ограничено
+    числом потоков.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES):
+        self.timeout = timeout
+        self.retries = retries
+        self.local = threading.local()
+
+    def _connection(self, scheme, netloc):
+        import http.client
+
+        connections = self.local.__dict__.setdefault("connections", {})
+        key = (scheme, netloc)
+        if key not in connections:
+            cls = (
+                http.client.HTTPSConnection
+                if scheme == "https"
+                else http.client.HTTPConnection
+            )
+            connections[key] = cls(netloc, timeout=self.timeout)
+        return connections[key]
+
+    def _drop_connection(self, scheme, netloc):
+        connection = self.local.__dict__.get("connections", {}).pop(
+            (scheme, netloc), None
+        )
+        if connection is not None:
+            connection.close()
+
+    def _get_once(self, url):
+        import http.client
+
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https"):
+                raise DownloadError(f"неподдерживаемая схема URL: {url}")
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            connection = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", path)
+                response = connection.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                self._drop_connection(parts.scheme, parts.netloc)
+                raise
+            if response.status in (301, 302, 303, 307, 308):
+                url = urljoin(url, response.getheader("Location", ""))
+                continue
+            if response.status != 200:
+                raise DownloadError(f"HTTP {response.status}: {url}", response.status)
+            return body
+        raise DownloadError(f"слишком много перенаправлений: {url}")
+
+    def get(self, url):
+        """Скачивает URL с повторами при сетевых ошибках и ответах 5xx"""
+        import http.client
+
+        delay = 0.5
+        for attempt in range(self.retries + 1):
+            try:
+                return self._get_once(url)
+            except DownloadError as e:
+                if (e.status or 0) < 500 or attempt == self.retries:
+                    raise
+            except (OSError, http.client.HTTPException) as e:
+                if attempt == self.retries:
+                    raise DownloadError(f"{url}: {e}") from e
+            time.sleep(delay)
+            delay *= 2
+
+
+def fetch_audio(
+    urls,
+    cache,
+    workers=DEFAULT_WORKERS,
+    timeout=DEFAULT_TIMEOUT,
+    retries=DEFAULT_RETRIES,
+):
+    """
+    Возвращает (files, errors): files — URL -> путь к файлу в кеше,
+    errors — URL -> текст ошибки. Скачиваются только URL, которых нет в кеше.
+    """
+    files = {}
+    errors = {}
+    missing = []
+    for url in dict.fromkeys(urls):
+        path = cache.lookup(url)
+        if path is not None:
+            files[url] = path
+        elif cache.is_missing(url):
+            errors[url] = "файл отсутствует на сервере (по данным кеша)"
+        else:
+            missing.append(url)
+
+    if missing:
+        from concurrent.futures import ThreadPoolExecutor
+
+        downloader = Downloader(timeout=timeout, retries=retries)
+
+        def fetch(url):
+            try:
+                return url, cache.store(url, downloader.get(url)), None
+            except DownloadError as e:
+                if e.status in MISSING_STATUSES:
+                    cache.mark_missing(url)
+                return url, None, str(e)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for url, path, error in pool.map(fetch, missing):
+                if error is None:
+                    files[url] = path
+                else:
+                    errors[url] = error
+        cache.save()
+
+    return files, errors
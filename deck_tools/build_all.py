@@ -0,0 +1,274 @@
+"""
+Параллельная сборка нескольких колод по списку определений (build-all).
+
+Определения - JSON файл со списком колод (или {"decks": [...]}):
+
+    [
+        {"generator": "words", "source": "word/words.csv",
+         "name": "English Words", "output": "build/words.apkg",
+         "options": {"typos": true, "exclude": ["irregular_verbs/verbs.csv"]}},
+        {"generator": "verbs", "source": "irregular_verbs/verbs.csv"}
+    ]
+
+options - параметры командной строки генератора без "--" (true - флаг,
+список - повторяющийся параметр). Относительные пути отсчитываются от
+каталога файла определений. Колоды собираются независимо в пуле процессов:
+каждый процесс один раз импортирует генераторы и genanki и читает шаблоны,
+а вывод сборки колоды печатается целиком после её завершения.
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from .profiling import create_profile
+from .watch import FileCache
+
+ROOT = Path(__file__).resolve().parent.parent
+WORDS = "words"
+VERBS = "verbs"
+GENERATORS = {
+    WORDS: ROOT / "word" / "generate_words_deck.py",
+    VERBS: ROOT / "irregular_verbs" / "generate_verbs_deck.py",
+}
+DECK_KEYS = ("generator", "source", "name", "output", "options")
+# Режимы генераторов, которые не собирают колоду
+UNSUPPORTED_OPTIONS = ("watch", "validate", "preview", "cprofile", "tracemalloc")
+
+DeckSpec = namedtuple("DeckSpec", "index generator label argv output")
+DeckResult = namedtuple("DeckResult", "index status seconds log")
+
+_TEMPLATE_CACHE = None
+
+
+def load_generator(generator):
+    """Модуль генератора; импортируется один раз на процесс"""
+    path = GENERATORS[generator]
+    module = sys.modules.get(path.stem)
+    if module is None:
+        # Генератор слов импортирует constants из своего каталога
+        sys.path.insert(0, str(path.parent))
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[path.stem] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+def option_argv(key, value):
+    flag = "--" + key.replace("_", "-")
+    if value is True:
+        return [flag]
+    if value is False or value is None:
+        return []
+    if isinstance(value, list):
+        return [arg for item in value for arg in (flag, str(item))]
+    return [flag, str(value)]
+
+
+def load_decks(path):
+    """Читает определения колод и разбирает их параметры генераторами"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("decks")
+    if not isinstance(data, list) or not data:
+        raise ValueError("ожидается непустой список колод или {\"decks\": [...]}")
+
+    decks = []
+    outputs = {}
+    for index, deck in enumerate(data):
+        where = f"колода {index + 1}"
+        if not isinstance(deck, dict):
+            raise ValueError(f"{where}: ожидается объект")
+        unknown = sorted(set(deck) - set(DECK_KEYS))
+        if unknown:
+            raise ValueError(f"{where}: неизвестные ключи {', '.join(unknown)}")
+        generator = deck.get("generator")
+        if generator not in GENERATORS:
+            raise ValueError(
+                f"{where}: generator должен быть одним из {', '.join(GENERATORS)}"
+            )
+        if not deck.get("source"):
+            raise ValueError(f"{where}: не указан source")
+        options = deck.get("options", {})
+        for key in options:
+            if key.replace("-", "_") in UNSUPPORTED_OPTIONS:
+                raise ValueError(f"{where}: параметр {key} не поддерживается build-all")
+
+        argv = [str(deck["source"])]
+        argv += option_argv("name", deck.get("name"))
+        argv += option_argv("output", deck.get("output"))
+        for key, value in options.items():
+            argv += option_argv(key, value)
+        module = load_generator(generator)
+        stderr = io.StringIO()
+        try:
+            with redirect_stderr(stderr):
+                args = module.parse_args(argv)
+        except SystemExit:
+            lines = stderr.getvalue().strip().splitlines() or [" ".join(argv)]
+            message = lines[-1].split("error: ", 1)[-1]
+            raise ValueError(f"{where}: {message}") from None
+
+        output = (Path(path).parent / args.output).resolve()
+        if output in outputs:
+            raise ValueError(
+                f"{where}: output {args.output} совпадает с колодой {outputs[output]}"
+            )
+        outputs[output] = index + 1
+        decks.append(DeckSpec(index, generator, args.name, argv, args.output))
+    return decks
+
+
+def _init_worker(base_dir):
+    global _TEMPLATE_CACHE
+    os.chdir(base_dir)
+    _TEMPLATE_CACHE = FileCache()
+    for generator in GENERATORS:
+        load_generator(generator)
+
+
+def build_deck(deck):
+    """Собирает одну колоду и возвращает DeckResult с её выводом"""
+    module = load_generator(deck.generator)
+    log = io.StringIO()
+    status = 0
+    start = time.perf_counter()
+    with redirect_stdout(log), redirect_stderr(log):
+        try:
+            args = module.parse_args(deck.argv)
+            profile = create_profile(args.profile)
+            if deck.generator == WORDS:
+                module.build(args, profile, template_cache=_TEMPLATE_CACHE)
+            else:
+                module.build(args, profile)
+            if args.profile:
+                profile.save(args.profile)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc()
+            status = 1
+    return DeckResult(deck.index, status, time.perf_counter() - start, log.getvalue())
+
+
+def build_all(decks, base_dir, workers=None):
+    """
+    Собирает колоды в пуле из workers процессов (по умолчанию - число CPU),
+    печатая вывод каждой колоды по завершении. Возвращает DeckResult в
+    порядке определений.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(decks)))
+    sizes = {}
+    for deck in decks:
+        try:
+            sizes[deck.index] = os.stat(Path(base_dir) / deck.argv[0]).st_size
+        except OSError:
+            sizes[deck.index] = 0
+    # Самые большие источники первыми: меньше простоя в конце пакета
+    order = sorted(decks, key=lambda deck: -sizes[deck.index])
+
+    results = {}
+
+    def report(result):
+        deck = decks[result.index]
+        print(f"== {deck.label} ({deck.output}) ==")
+        print(result.log, end="")
+        results[result.index] = result
+
+    if workers == 1:
+        _init_worker(base_dir)
+        for deck in order:
+            report(build_deck(deck))
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(base_dir,)
+        ) as pool:
+            futures = [pool.submit(build_deck, deck) for deck in order]
+            for future in as_completed(futures):
+                report(future.result())
+    return [results[deck.index] for deck in decks]
+
+
+def print_summary(decks, results, wall, workers, file=sys.stdout):
+    width = max(len(deck.label) for deck in decks)
+    print(f"\n{'Колода':<{width}}  Генератор  Время     Статус", file=file)
+    for deck, result in zip(decks, results):
+        status = "ok" if result.status == 0 else f"ошибка ({result.status})"
+        print(
+            f"{deck.label:<{width}}  {deck.generator:<9}  "
+            f"{result.seconds:7.2f} с  {status}",
+            file=file,
+        )
+    built = sum(1 for result in results if result.status == 0)
+    total = sum(result.seconds for result in results)
+    print(
+        f"Собрано {built} из {len(results)} колод за {wall:.2f} с "
+        f"(сумма времени сборок {total:.2f} с, процессов: {workers})",
+        file=file,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Параллельная сборка колод по JSON файлу определений"
+    )
+    parser.add_argument("decks", help="JSON файл со списком колод")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="Число процессов сборки (по умолчанию: число CPU)",
+    )
+    parser.add_argument(
+        "--report", metavar="FILE", help="Записать JSON отчёт о времени сборки колод"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        decks = load_decks(args.decks)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {args.decks}: {e}", file=sys.stderr)
+        sys.exit(1)
+    report_path = Path(args.report).resolve() if args.report else None
+    base_dir = str(Path(args.decks).resolve().parent)
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(decks)))
+
+    start = time.perf_counter()
+    results = build_all(decks, base_dir, workers)
+    wall = time.perf_counter() - start
+    print_summary(decks, results, wall, workers)
+
+    if report_path is not None:
+        report = {
+            "wall_seconds": round(wall, 3),
+            "workers": workers,
+            "decks": [
+                {
+                    "name": deck.label,
+                    "generator": deck.generator,
+                    "output": deck.output,
+                    "status": result.status,
+                    "seconds": round(result.seconds, 3),
+                }
+                for deck, result in zip(decks, results)
+            ],
+        }
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if any(result.status for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
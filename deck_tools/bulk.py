@@ -0,0 +1,160 @@
+"""
+Пакетная запись заметок в коллекцию Anki напрямую через SQLite.
+
+Вместо Note.write_to_db (по одному INSERT на заметку и карточку, с
+проверками HTML в каждом поле) строки notes и cards копятся в списках и
+пишутся executemany пачками в одной транзакции. Коллекция собирается во
+временном файле, поэтому журнал и fsync ей не нужны.
+"""
+import hashlib
+import html
+import re
+
+DEFAULT_BATCH_SIZE = 10000
+
+BUILD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA cache_size = -65536",
+)
+
+_HTML_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def tune_for_build(conn):
+    """Настройки SQLite для одноразовой базы сборки: без журнала и fsync"""
+    for pragma in BUILD_PRAGMAS:
+        conn.execute(pragma)
+
+
+def field_checksum(text):
+    """Контрольная сумма поля сортировки, как её считает Anki (notes.csum)"""
+    stripped = html.unescape(_HTML_TAG_RE.sub("", text))
+    return int(hashlib.sha1(stripped.encode("utf-8")).hexdigest()[:8], 16)
+
+
+class BulkNoteWriter:
+    """
+    Накопитель строк notes и cards. add принимает те же заметки genanki, что
+    и Note.write_to_db, и выдаёт id карточек из того же генератора, поэтому
+    id и содержимое коллекции совпадают с путём через genanki (кроме csum,
+    который genanki оставляет нулевым).
+
+    С defer_indexes=True индексы notes и cards удаляются на время вставки и
+    создаются заново в finish - для новой коллекции это быстрее, чем
+    обновлять их на каждую строку.
+    """
+
+    def __init__(
+        self,
+        cursor,
+        timestamp,
+        deck_id,
+        id_gen,
+        batch_size=DEFAULT_BATCH_SIZE,
+        defer_indexes=False,
+    ):
+        self.cursor = cursor
+        self.mod = int(timestamp)
+        self.deck_id = deck_id
+        self.id_gen = id_gen
+        self.batch_size = batch_size
+        self.notes = []
+        self.cards = []
+        self.requirements = {}
+        self.deferred_indexes = []
+        if defer_indexes:
+            self.deferred_indexes = cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                "AND tbl_name IN ('notes', 'cards') AND sql IS NOT NULL"
+            ).fetchall()
+            for name, _ in self.deferred_indexes:
+                cursor.execute(f"DROP INDEX {name}")
+
+    def card_ords(self, note):
+        """
+        Номера шаблонов, для которых у заметки будут карточки. Требования
+        модели (model._req) разбираются один раз на модель, а не через
+        Note.cards для каждой заметки.
+        """
+        model = note.model
+        if model.model_type != model.FRONT_BACK:
+            return [card.ord for card in note.cards]
+        requirements = self.requirements.get(model.model_id)
+        if requirements is None:
+            requirements = [
+                (card_ord, any if any_or_all == "any" else all, field_ords)
+                for card_ord, any_or_all, field_ords in model._req
+            ]
+            self.requirements[model.model_id] = requirements
+        fields = note.fields
+        return [
+            card_ord
+            for card_ord, check, field_ords in requirements
+            if check(fields[i] for i in field_ords)
+        ]
+
+    def add(self, note, note_id):
+        sort_field = note.sort_field
+        self.notes.append(
+            (
+                note_id,
+                note.guid,
+                note.model.model_id,
+                self.mod,
+                -1,
+                note._format_tags(),
+                "\x1f".join(note.fields),
+                sort_field,
+                field_checksum(sort_field),
+                0,
+                "",
+            )
+        )
+        for card_ord in self.card_ords(note):
+            self.cards.append(
+                (
+                    next(self.id_gen),
+                    note_id,
+                    self.deck_id,
+                    card_ord,
+                    self.mod,
+                    -1,
+                    0,
+                    0,
+                    note.due,
+                    0,
+                    0,
+                    0,
+                    0,
+                    0,
+                    0,
+                    0,
+                    0,
+                    "",
+                )
+            )
+        if len(self.notes) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.notes:
+            self.cursor.executemany(
+                "INSERT INTO notes VALUES(?,?,?,?,?,?,?,?,?,?,?)", self.notes
+            )
+            self.notes = []
+        if self.cards:
+            self.cursor.executemany(
+                "INSERT INTO cards VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                self.cards,
+            )
+            self.cards = []
+
+    def finish(self):
+        """Дописывает накопленные строки и восстанавливает отложенные индексы"""
+        self.flush()
+        for _, sql in self.deferred_indexes:
+            self.cursor.execute(sql)
+        self.deferred_indexes = []
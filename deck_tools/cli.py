@@ -0,0 +1,139 @@
+"""
+Общая командная строка генераторов: python -m deck_tools <команда>.
+
+    build {words,verbs} CSV ...      сборка .apkg (параметры генератора)
+    preview {words,verbs} CSV DIR    HTML предпросмотр
+    validate {words,verbs} CSV       проверка CSV с отчётом
+    stats FILE                       сводка по CSV или .apkg
+    extract APKG -o CSV              CSV из готового .apkg
+    enrich, build-all                см. deck_tools/enrich.py и build_all.py
+
+Модуль импортирует только argparse, а каждая команда - только свои модули:
+validate, stats и extract не загружают генераторы и genanki, поэтому
+подходят для pre-commit хуков. Бюджет запуска проверяется так:
+
+    python -X importtime -m deck_tools validate words word/words.csv
+"""
+import argparse
+import sys
+
+# Ключи build_all.GENERATORS
+GENERATORS = ("words", "verbs")
+# Команды, параметры (и --help) которых разбирает main() их модуля
+PASSTHROUGH = {
+    "extract": ("extract", "Извлечь CSV из .apkg"),
+    "enrich": ("enrich", "Заполнить транскрипции и переводы из словарей"),
+    "build-all": ("build_all", "Собрать колоды по JSON определениям"),
+}
+
+
+def set_prog(*words):
+    # Имя программы в usage и ошибках argparse вызываемой команды
+    sys.argv[0] = " ".join(("python -m deck_tools",) + words)
+
+
+def run_generator(generator, argv):
+    from .build_all import load_generator
+
+    return load_generator(generator).main(argv)
+
+
+def build(args):
+    set_prog("build", args.generator)
+    run_generator(args.generator, args.args)
+
+
+def preview(args):
+    set_prog("preview", args.generator)
+    run_generator(args.generator, [args.csv_file, "--preview", args.dir, *args.args])
+
+
+def validate(args):
+    from .validation import SCHEMAS, run_validation
+
+    schema = SCHEMAS[args.generator]
+    if args.guid_field:
+        if args.guid_field not in schema.columns:
+            print(
+                f"Ошибка: нет колонки {args.guid_field} в схеме {args.generator}",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+        schema = schema._replace(key=args.guid_field)
+    sys.exit(run_validation(args.csv_file, schema, args.report, args.workers))
+
+
+def stats(args):
+    from .stats import file_stats, print_stats
+
+    try:
+        result = file_stats(args.file)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {args.file}: {e}", file=sys.stderr)
+        sys.exit(1)
+    print_stats(result)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m deck_tools",
+        description="Сборка, проверка и разбор Anki колод слов и глаголов",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="команда")
+    commands.required = True
+
+    command = commands.add_parser(
+        "build",
+        help="Собрать .apkg (параметры генератора: build words --help)",
+        add_help=False,
+    )
+    command.add_argument("generator", choices=GENERATORS)
+    command.add_argument("args", nargs=argparse.REMAINDER)
+    command.set_defaults(handler=build)
+
+    command = commands.add_parser("preview", help="HTML предпросмотр колоды")
+    command.add_argument("generator", choices=GENERATORS)
+    command.add_argument("csv_file", help="Источник заметок")
+    command.add_argument("dir", help="Каталог предпросмотра")
+    command.add_argument(
+        "args", nargs=argparse.REMAINDER, help="Другие параметры генератора"
+    )
+    command.set_defaults(handler=preview)
+
+    command = commands.add_parser("validate", help="Проверить CSV и вывести отчёт")
+    command.add_argument("generator", choices=GENERATORS)
+    command.add_argument("csv_file", help="Проверяемый CSV")
+    command.add_argument(
+        "--report", metavar="FILE", help="Записать JSON отчёт в файл вместо stdout"
+    )
+    command.add_argument(
+        "--workers", type=int, help="Число процессов (по умолчанию: число CPU)"
+    )
+    command.add_argument(
+        "--guid-field", help="Колонка, значения которой должны быть уникальными"
+    )
+    command.set_defaults(handler=validate)
+
+    command = commands.add_parser("stats", help="Сводка по CSV или .apkg")
+    command.add_argument("file", help="CSV колоды или .apkg")
+    command.set_defaults(handler=stats)
+
+    for name, (_, help) in PASSTHROUGH.items():
+        commands.add_parser(name, help=help, add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in PASSTHROUGH:
+        from importlib import import_module
+
+        set_prog(argv[0])
+        module = import_module(f".{PASSTHROUGH[argv[0]][0]}", __package__)
+        return module.main(argv[1:])
+    args = create_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Данные предыдущей сборки для дельта-пакетов (--since).
+
+Предыдущая сборка задаётся манифестом или самим .apkg. Из неё берутся
+note_digest всех заметок и имена медиафайлов: в дельта-пакет попадают
+только новые и изменённые заметки и новые медиафайлы.
+"""
+import json
+import sqlite3
+from collections import namedtuple
+from pathlib import Path
+
+from .apkg import COLLECTION_NAME
+from .manifest import BuildManifest, note_digest
+
+PreviousBuild = namedtuple("PreviousBuild", "note_digests media")
+
+
+def load_previous_build(path):
+    import zipfile
+
+    path = Path(path)
+    if not path.is_file():
+        raise FileNotFoundError(f"{path} не найден")
+    if zipfile.is_zipfile(path):
+        try:
+            return previous_build_from_apkg(path)
+        except (KeyError, zipfile.BadZipFile, sqlite3.Error) as e:
+            raise ValueError(f"{path}: повреждённый .apkg: {e}") from None
+    manifest = BuildManifest.load(path)
+    if not manifest.data:
+        raise ValueError(f"{path} не является .apkg или манифестом сборки")
+    return PreviousBuild(manifest.note_digests(), set(manifest.media))
+
+
+def previous_build_from_apkg(path, chunk_size=10000):
+    import tempfile
+    import zipfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with zipfile.ZipFile(path) as apkg:
+            apkg.extract(COLLECTION_NAME, tmp_dir)
+            media = set(json.loads(apkg.read("media") or "{}").values())
+
+        conn = sqlite3.connect(str(Path(tmp_dir) / COLLECTION_NAME))
+        try:
+            digests = set()
+            cursor = conn.execute("SELECT mid, guid, flds FROM notes")
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                digests.update(
+                    note_digest(mid, guid, fields) for mid, guid, fields in chunk
+                )
+        finally:
+            conn.close()
+
+    return PreviousBuild(digests, media)
@@ -0,0 +1,313 @@
+"""
+Локальные словари для заполнения транскрипций и переводов без сети.
+
+Исходные дампы - произношения в формате CMUdict (``WORD  AH0 B AE1 N D AH0 N``,
+ARPAbet переводится в IPA в стиле колод: ``[əˈbændən]``) и словари EN→RU в
+TSV (``слово<TAB>перевод``). Дамп один раз превращается в индекс
+``<cache>/<kind>-<hash>.idx``:
+
+    заголовок  MAGIC, число записей, число слотов, смещение таблицы
+    записи     b"ключ\\tзначение\\n", отсортированные по ключу
+    таблица    слоты (crc32 ключа, смещение записи), открытая адресация
+
+Индекс открывается через mmap: поиск - crc32, один-два слота таблицы и
+сравнение ключа, без чтения файла в память, поэтому словарь на миллионы
+статей почти не увеличивает RSS. Индекс пересобирается при изменении
+размера или времени изменения дампа.
+"""
+import hashlib
+import mmap
+import os
+import re
+import struct
+import zlib
+from pathlib import Path
+
+# Менять при изменении формата индекса или преобразования значений
+INDEX_VERSION = 1
+MAGIC = b"DKTIDX1\0"
+HEADER = struct.Struct("<8sQQQ")
+SLOT = struct.Struct("<IQ")
+MAX_TRANSLATIONS = 3
+
+PRONUNCIATIONS = "cmudict"
+TRANSLATIONS = "tsv"
+KINDS = (PRONUNCIATIONS, TRANSLATIONS)
+
+ARPABET_VOWELS = {
+    "AA": "ɑː",
+    "AE": "æ",
+    "AH": "ʌ",
+    "AO": "ɔː",
+    "AW": "aʊ",
+    "AY": "aɪ",
+    "EH": "e",
+    "ER": "ɜːr",
+    "EY": "eɪ",
+    "IH": "ɪ",
+    "IY": "iː",
+    "OW": "oʊ",
+    "OY": "ɔɪ",
+    "UH": "ʊ",
+    "UW": "uː",
+}
+# Безударные варианты, отличающиеся от ударных
+UNSTRESSED_VOWELS = {"AH": "ə", "ER": "ər", "IY": "i"}
+ARPABET_CONSONANTS = {
+    "B": "b",
+    "CH": "tʃ",
+    "D": "d",
+    "DH": "ð",
+    "F": "f",
+    "G": "ɡ",
+    "HH": "h",
+    "JH": "dʒ",
+    "K": "k",
+    "L": "l",
+    "M": "m",
+    "N": "n",
+    "NG": "ŋ",
+    "P": "p",
+    "R": "r",
+    "S": "s",
+    "SH": "ʃ",
+    "T": "t",
+    "TH": "θ",
+    "V": "v",
+    "W": "w",
+    "Y": "j",
+    "Z": "z",
+    "ZH": "ʒ",
+}
+# Допустимые в английском начала слога из нескольких согласных: знак
+# ударения ставится перед самым длинным из них (əˈbændən, hoʊˈtel)
+ONSETS = frozenset(
+    tuple(onset.split())
+    for onset in (
+        "p l|p r|b l|b r|k l|k r|ɡ l|ɡ r|f l|f r|t r|d r|θ r|ʃ r|"
+        "s p|s t|s k|s m|s n|s l|s w|t w|d w|k w|ɡ w|θ w|"
+        "p j|b j|t j|d j|k j|ɡ j|m j|n j|f j|v j|h j|l j|s j|"
+        "s p l|s p r|s t r|s k r|s k w|s p j|s k j|s t j"
+    ).split("|")
+)
+
+_COMMENT_RE = re.compile(r"\s+#.*$")
+_VARIANT_RE = re.compile(r"\(\d+\)$")
+_SPACES_RE = re.compile(r"\s+")
+_TOKEN_STRIP = ".,!?;:\"()[]"
+
+
+def normalize_key(text):
+    """Ключ словаря: нижний регистр, одиночные пробелы, без "to " у глагола"""
+    key = _SPACES_RE.sub(" ", text.strip().lower())
+    if key.startswith("to "):
+        key = key[3:]
+    return key
+
+
+def arpabet_to_ipa(phones):
+    """Произношение CMUdict (список фонем ARPAbet) в IPA без скобок"""
+    symbols = []
+    vowels = []
+    for phone in phones:
+        base = phone.rstrip("012")
+        if base in ARPABET_VOWELS:
+            stress = phone[len(base) :]
+            if stress == "0" and base in UNSTRESSED_VOWELS:
+                symbols.append(UNSTRESSED_VOWELS[base])
+            else:
+                symbols.append(ARPABET_VOWELS[base])
+            vowels.append((len(symbols) - 1, stress == "1"))
+        elif base in ARPABET_CONSONANTS:
+            symbols.append(ARPABET_CONSONANTS[base])
+        else:
+            raise ValueError(f"неизвестная фонема ARPAbet: {phone}")
+
+    # В односложных словах знак ударения не ставится ([pæk])
+    if len(vowels) > 1:
+        previous_vowel = -1
+        for index, primary in vowels:
+            if primary:
+                onset = index
+                consonants = tuple(symbols[previous_vowel + 1 : index])
+                if previous_vowel < 0:
+                    onset = 0
+                else:
+                    for size in range(min(len(consonants), 3), 0, -1):
+                        part = consonants[-size:]
+                        if size == 1 or part in ONSETS:
+                            onset = index - size
+                            break
+                symbols.insert(onset, "ˈ")
+                break
+            previous_vowel = index
+    return "".join(symbols)
+
+
+def read_pronunciations(path):
+    """Пары (ключ, IPA) из дампа CMUdict; альтернативные варианты пропускаются"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if not line.strip() or line.startswith(";;;"):
+                continue
+            parts = _COMMENT_RE.sub("", line).split()
+            if len(parts) < 2 or _VARIANT_RE.search(parts[0]):
+                continue
+            try:
+                ipa = arpabet_to_ipa([phone.upper() for phone in parts[1:]])
+            except ValueError:
+                continue
+            yield normalize_key(parts[0]), ipa
+
+
+def read_translations(path):
+    """Пары (ключ, перевод) из TSV словаря слово<TAB>перевод"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            parts = line.rstrip("\r\n").split("\t")
+            if len(parts) < 2 or not parts[0].strip() or not parts[1].strip():
+                continue
+            yield normalize_key(parts[0]), parts[1].strip()
+
+
+def write_index(pairs, index_path, merge=False):
+    """
+    Записывает индекс из пар (ключ, значение). Для повторяющихся ключей
+    остаётся первое значение, с merge - до MAX_TRANSLATIONS разных значений
+    через "; ".
+    """
+    entries = {}
+    for key, value in pairs:
+        if not key or "\t" in key or "\n" in key:
+            continue
+        value = value.replace("\t", " ").replace("\n", " ")
+        values = entries.get(key)
+        if values is None:
+            entries[key] = [value]
+        elif merge and len(values) < MAX_TRANSLATIONS and value not in values:
+            values.append(value)
+
+    slots = 1
+    while slots < len(entries) * 2:
+        slots *= 2
+    mask = slots - 1
+    table = bytearray(SLOT.size * slots)
+    data = bytearray()
+    for key in sorted(entries):
+        raw_key = key.encode("utf-8")
+        offset = HEADER.size + len(data)
+        data += raw_key + b"\t" + "; ".join(entries[key]).encode("utf-8") + b"\n"
+        slot = zlib.crc32(raw_key) & mask
+        while SLOT.unpack_from(table, slot * SLOT.size)[1]:
+            slot = (slot + 1) & mask
+        SLOT.pack_into(table, slot * SLOT.size, zlib.crc32(raw_key), offset)
+
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(entries), slots, HEADER.size + len(data)))
+        f.write(data)
+        f.write(table)
+    tmp_path.replace(index_path)
+    return len(entries)
+
+
+class Dictionary:
+    """Индекс словаря, открытый через mmap; lookup(термин) -> значение или None"""
+
+    def __init__(self, index_path):
+        self.path = Path(index_path)
+        with open(self.path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, slots, self.table = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError(f"{self.path}: не индекс словаря")
+        self.mask = slots - 1
+
+    def __len__(self):
+        return self.count
+
+    def get(self, raw_key):
+        """Значение по ключу в байтах (уже нормализованному)"""
+        data = self.map
+        hashed = zlib.crc32(raw_key)
+        slot = hashed & self.mask
+        size = len(raw_key)
+        while True:
+            stored, offset = SLOT.unpack_from(data, self.table + slot * SLOT.size)
+            if not offset:
+                return None
+            if (
+                stored == hashed
+                and data[offset + size : offset + size + 1] == b"\t"
+                and data[offset : offset + size] == raw_key
+            ):
+                start = offset + size + 1
+                return data[start : data.find(b"\n", start)].decode("utf-8")
+            slot = (slot + 1) & self.mask
+
+    def lookup(self, term):
+        """Значение для термина в любом регистре или None"""
+        key = term.lower() if term.isalpha() else normalize_key(term)
+        return self.get(key.encode("utf-8")) if key else None
+
+    def close(self):
+        self.map.close()
+
+
+def index_path_for(source, kind, cache_dir):
+    stat = os.stat(source)
+    data = "\x1f".join(
+        (str(Path(source).resolve()), str(stat.st_size), str(stat.st_mtime_ns))
+    )
+    digest = hashlib.sha256(f"{INDEX_VERSION}\x1f{data}".encode("utf-8"))
+    return Path(cache_dir) / f"{kind}-{digest.hexdigest()[:16]}.idx"
+
+
+def open_dictionary(source, kind, cache_dir):
+    """
+    Открывает словарь kind (PRONUNCIATIONS или TRANSLATIONS) из дампа source,
+    при необходимости построив индекс в cache_dir. Готовый .idx открывается
+    как есть.
+    """
+    if str(source).endswith(".idx"):
+        return Dictionary(source)
+    index_path = index_path_for(source, kind, cache_dir)
+    if not index_path.exists():
+        if kind == PRONUNCIATIONS:
+            write_index(read_pronunciations(source), index_path)
+        else:
+            write_index(read_translations(source), index_path, merge=True)
+    return Dictionary(index_path)
+
+
+def transcribe(text, pronunciations):
+    """
+    Транскрипция поля в скобках ([wʌz/wɜːr], [ˈhaɪmlɪk məˈnuːvər]) или None,
+    если хотя бы одного слова нет в словаре.
+    """
+    if text.isalpha():
+        ipa = pronunciations.lookup(text)
+        return None if ipa is None else f"[{ipa}]"
+    variants = []
+    for variant in text.split("/"):
+        words = []
+        for token in variant.split():
+            token = token.strip(_TOKEN_STRIP)
+            if not token:
+                continue
+            ipa = pronunciations.lookup(token)
+            if ipa is None and "-" in token:
+                parts = [pronunciations.lookup(part) for part in token.split("-")]
+                ipa = None if None in parts else "-".join(parts)
+            if ipa is None:
+                return None
+            words.append(ipa)
+        if not words:
+            return None
+        variants.append(" ".join(words))
+    return f"[{'/'.join(variants)}]"
@@ -0,0 +1,167 @@
+"""
+Заполнение пустых транскрипций и переводов CSV колод из локальных словарей.
+
+    python -m deck_tools.enrich word/words.csv -o words.csv \\
+        --pronunciations cmudict.dict --translations en-ru.tsv
+
+Схема (words.csv или verbs.csv) определяется по заголовку. CSV читается и
+пишется потоково, заполняются только пустые ячейки, остальные строки и
+колонки не меняются. Словари открываются через индекс deck_tools.dictionary.
+"""
+import argparse
+import csv
+import os
+import sys
+from collections import Counter
+from functools import partial
+from pathlib import Path
+
+from .audio import default_cache_dir
+from .dictionary import PRONUNCIATIONS, TRANSLATIONS, open_dictionary, transcribe
+
+# Колонка -> (колонка с английским термином, словарь)
+SCHEMAS = {
+    "words": {
+        "transcription": ("word", PRONUNCIATIONS),
+        "translation": ("word", TRANSLATIONS),
+    },
+    "verbs": {
+        "transcription_inf": ("infinitive", PRONUNCIATIONS),
+        "transcription_ps": ("past_simple", PRONUNCIATIONS),
+        "transcription_pp": ("past_participle", PRONUNCIATIONS),
+        "translation": ("infinitive", TRANSLATIONS),
+    },
+}
+DICTIONARY_CACHE_NAME = "dictionaries"
+
+
+def detect_schema(header):
+    for name, columns in SCHEMAS.items():
+        required = set(columns) | {source for source, _ in columns.values()}
+        if required <= set(header):
+            return name
+    raise ValueError("заголовок не похож ни на words.csv, ни на verbs.csv")
+
+
+class Enricher:
+    """
+    Заполняет пустые ячейки строк CSV. dictionaries - {PRONUNCIATIONS:
+    Dictionary, TRANSLATIONS: Dictionary}, отсутствующий словарь
+    пропускается. filled и missing - счётчики по колонкам.
+    """
+
+    def __init__(self, header, dictionaries):
+        self.width = len(header)
+        self.fillers = []
+        for column, (source, kind) in SCHEMAS[detect_schema(header)].items():
+            dictionary = dictionaries.get(kind)
+            if dictionary is None:
+                continue
+            if kind == PRONUNCIATIONS:
+                fill = partial(transcribe, pronunciations=dictionary)
+            else:
+                fill = dictionary.lookup
+            self.fillers.append(
+                (column, header.index(column), header.index(source), fill)
+            )
+        self.filled = Counter()
+        self.missing = Counter()
+
+    def rows(self, rows):
+        for row in rows:
+            if len(row) < self.width:
+                row += [""] * (self.width - len(row))
+            for column, target, source, fill in self.fillers:
+                term = row[source]
+                if (row[target] and not row[target].isspace()) or not term:
+                    continue
+                value = fill(term)
+                if value is None:
+                    self.missing[column] += 1
+                else:
+                    row[target] = value
+                    self.filled[column] += 1
+            yield row
+
+
+def enrich_csv(input_path, output_path, dictionaries):
+    """Записывает заполненный CSV в output_path (может совпадать с input_path)"""
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(input_path, "r", encoding="utf-8", newline="") as src, open(
+            tmp_path, "w", encoding="utf-8", newline=""
+        ) as dst:
+            reader = csv.reader(src)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError("пустой CSV")
+            enricher = Enricher(header, dictionaries)
+            writer = csv.writer(dst)
+            writer.writerow(header)
+            writer.writerows(enricher.rows(reader))
+        tmp_path.replace(output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return enricher
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Заполнить пустые транскрипции и переводы CSV из локальных словарей"
+    )
+    parser.add_argument("csv_file", help="CSV в формате words.csv или verbs.csv")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("-o", "--output", help="Куда записать заполненный CSV")
+    target.add_argument(
+        "--in-place", action="store_true", help="Перезаписать исходный CSV"
+    )
+    parser.add_argument(
+        "--pronunciations",
+        metavar="DICT",
+        help="Словарь произношений CMUdict (или готовый .idx)",
+    )
+    parser.add_argument(
+        "--translations",
+        metavar="TSV",
+        help="Словарь EN→RU: слово<TAB>перевод (или готовый .idx)",
+    )
+    parser.add_argument(
+        "--dict-cache",
+        default=str(default_cache_dir(DICTIONARY_CACHE_NAME)),
+        help=(
+            "Каталог индексов словарей "
+            "(по умолчанию: ~/.cache/rus-english-anki/dictionaries)"
+        ),
+    )
+    args = parser.parse_args(argv)
+    if not args.pronunciations and not args.translations:
+        parser.error("нужен --pronunciations и/или --translations")
+
+    dictionaries = {}
+    try:
+        for kind, source in (
+            (PRONUNCIATIONS, args.pronunciations),
+            (TRANSLATIONS, args.translations),
+        ):
+            if source:
+                dictionaries[kind] = open_dictionary(source, kind, args.dict_cache)
+        enricher = enrich_csv(
+            args.csv_file,
+            args.csv_file if args.in_place else args.output,
+            dictionaries,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for column, *_ in enricher.fillers:
+        print(
+            f"{column}: заполнено {enricher.filled[column]}, "
+            f"нет в словаре {enricher.missing[column]}",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
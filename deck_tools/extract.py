@@ -0,0 +1,252 @@
+"""
+Обратный импорт: CSV в формате words.csv или verbs.csv из готового .apkg.
+
+    python -m deck_tools.extract word/english_words.apkg -o words.csv
+
+Коллекция извлекается из пакета во временный каталог, заметки читаются
+из SQLite порциями по chunk_size в порядке ID (порядке добавления), а CSV
+пишется потоково, поэтому память не зависит от числа заметок. Поля
+сопоставляются колонкам по имени поля в модели заметки, модели - по ID
+моделей генераторов. В колодах прежних версий с отдельной моделью на
+каждую карточку у слова несколько одинаковых заметок - в CSV попадает одна.
+"""
+import argparse
+import csv
+import hashlib
+import html
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import zipfile
+from collections import Counter, namedtuple
+from pathlib import Path
+
+# Коллекции в порядке предпочтения: Anki 2.1 пишет обе, в collection.anki2
+# тогда только заглушка для старых версий
+COLLECTION_NAMES = ("collection.anki21", "collection.anki2")
+# Сжатая коллекция новых версий Anki (zstd) не поддерживается
+COMPRESSED_COLLECTION = "collection.anki21b"
+CHUNK_SIZE = 5000
+
+# models - ID моделей (должны совпадать с MODEL_ID и LEGACY_MODELS
+# генераторов), columns - пары (колонка CSV, поле модели)
+ExtractSchema = namedtuple("ExtractSchema", "models columns")
+SCHEMAS = {
+    "words": ExtractSchema(
+        models=(1707392319, 1707392320, 1707392321),
+        columns=(
+            ("word", "Word"),
+            ("transcription", "Transcription"),
+            ("translation", "Translation"),
+            ("example_en", "ExampleEn"),
+            ("example_ru", "ExampleRu"),
+            ("audio_url", "AudioUrl"),
+        ),
+    ),
+    "verbs": ExtractSchema(
+        models=(1607392324, 1607392319, 1607392320, 1607392321, 1607392322, 1607392323),
+        columns=(
+            ("infinitive", "Infinitive"),
+            ("past_simple", "PastSimple"),
+            ("past_participle", "PastParticiple"),
+            ("transcription_inf", "TransInf"),
+            ("transcription_ps", "TransPS"),
+            ("transcription_pp", "TransPP"),
+            ("translation", "Translation"),
+            ("example_en", "ExampleEn"),
+            ("example_ru", "ExampleRu"),
+        ),
+    ),
+}
+
+_BREAK_RE = re.compile(r"<br\s*/?>|</div>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def plain_text(value):
+    """Текст поля без HTML разметки, добавленной редактором Anki"""
+    if "<" not in value and "&" not in value:
+        return value
+    value = _TAG_RE.sub("", _BREAK_RE.sub(" ", value))
+    return " ".join(html.unescape(value).replace("\xa0", " ").split())
+
+
+def read_models(conn):
+    """ID модели -> имена полей по порядку"""
+    (models_json,) = conn.execute("SELECT models FROM col").fetchone()
+    if models_json:
+        return {
+            int(model_id): [
+                field["name"] for field in sorted(model["flds"], key=lambda f: f["ord"])
+            ]
+            for model_id, model in json.loads(models_json).items()
+        }
+    # Схема Anki 2.1.28+: модели и поля в отдельных таблицах
+    models = {}
+    rows = conn.execute("SELECT ntid, name FROM fields ORDER BY ntid, ord")
+    for model_id, name in rows:
+        models.setdefault(model_id, []).append(name)
+    return models
+
+
+def detect_schemas(models):
+    """Имена схем, модели которых есть в коллекции"""
+    return [
+        name
+        for name, schema in SCHEMAS.items()
+        if any(model_id in models for model_id in schema.models)
+    ]
+
+
+class Extractor:
+    """
+    Строки CSV схемы schema из заметок коллекции. rows - число выданных
+    строк, duplicates - пропущенные повторы (одинаковые заметки моделей
+    прежних версий), other - заметки других моделей по ID модели.
+    """
+
+    def __init__(self, schema, models, strip_html=False):
+        self.schema = SCHEMAS[schema]
+        self.header = [column for column, _ in self.schema.columns]
+        self.strip_html = strip_html
+        # ID модели -> индексы полей для колонок (None - поля нет в модели)
+        self.layouts = {}
+        for model_id in self.schema.models:
+            if model_id in models:
+                names = models[model_id]
+                self.layouts[model_id] = [
+                    names.index(field) if field in names else None
+                    for _, field in self.schema.columns
+                ]
+        # Повторы возможны только при нескольких моделях у одного слова
+        self.dedupe = len(self.layouts) > 1
+        self.rows = 0
+        self.duplicates = 0
+        self.other = Counter()
+
+    def extract(self, conn, chunk_size=CHUNK_SIZE):
+        seen = set()
+        cursor = conn.execute("SELECT mid, flds FROM notes ORDER BY id")
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            for model_id, fields in chunk:
+                layout = self.layouts.get(model_id)
+                if layout is None:
+                    self.other[model_id] += 1
+                    continue
+                values = fields.split("\x1f")
+                row = [
+                    values[index] if index is not None and index < len(values) else ""
+                    for index in layout
+                ]
+                if self.strip_html:
+                    row = [plain_text(value) for value in row]
+                if self.dedupe:
+                    digest = hashlib.blake2b(
+                        "\x1f".join(row).encode("utf-8"), digest_size=8
+                    ).digest()
+                    if digest in seen:
+                        self.duplicates += 1
+                        continue
+                    seen.add(digest)
+                self.rows += 1
+                yield row
+
+
+def open_collection(apkg_path, tmp_dir):
+    """Извлекает коллекцию из .apkg в tmp_dir и возвращает путь к ней"""
+    with zipfile.ZipFile(apkg_path) as apkg:
+        names = set(apkg.namelist())
+        for name in COLLECTION_NAMES:
+            if name in names:
+                return Path(apkg.extract(name, tmp_dir))
+    if COMPRESSED_COLLECTION in names:
+        raise ValueError(
+            "коллекция в новом сжатом формате; экспортируйте колоду в Anki "
+            'с флажком "Support older Anki versions"'
+        )
+    raise ValueError("в пакете нет коллекции Anki")
+
+
+def extract_csv(
+    apkg_path, output_path, schema=None, strip_html=False, chunk_size=CHUNK_SIZE
+):
+    """
+    Записывает заметки схемы schema (по умолчанию - единственной найденной
+    в пакете) из apkg_path в CSV output_path. Возвращает Extractor.
+    """
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.tmp")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(str(open_collection(apkg_path, tmp_dir)))
+        try:
+            models = read_models(conn)
+            found = detect_schemas(models)
+            if schema is None:
+                if not found:
+                    raise ValueError("в пакете нет моделей колод слов или глаголов")
+                if len(found) > 1:
+                    raise ValueError(
+                        f"в пакете модели нескольких колод ({', '.join(found)}), "
+                        "укажите --schema"
+                    )
+                schema = found[0]
+            elif schema not in found:
+                raise ValueError(f"в пакете нет моделей колоды {schema}")
+
+            extractor = Extractor(schema, models, strip_html)
+            try:
+                with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(extractor.header)
+                    writer.writerows(extractor.extract(conn, chunk_size))
+                tmp_path.replace(output_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+        finally:
+            conn.close()
+    return extractor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Извлечь CSV в формате words.csv или verbs.csv из .apkg"
+    )
+    parser.add_argument("apkg", help="Пакет .apkg (собранный генератором или экспорт)")
+    parser.add_argument("-o", "--output", required=True, help="Куда записать CSV")
+    parser.add_argument(
+        "--schema",
+        choices=SCHEMAS,
+        help="Формат CSV, если в пакете модели нескольких колод",
+    )
+    parser.add_argument(
+        "--strip-html",
+        action="store_true",
+        help="Убрать HTML разметку, добавленную при редактировании в Anki",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        extractor = extract_csv(args.apkg, args.output, args.schema, args.strip_html)
+    except (OSError, ValueError, zipfile.BadZipFile, sqlite3.Error) as e:
+        print(f"Ошибка: {args.apkg}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Записано строк: {extractor.rows} в {args.output}", file=sys.stderr)
+    if extractor.duplicates:
+        print(
+            f"Пропущено повторов заметок прежних моделей: {extractor.duplicates}",
+            file=sys.stderr,
+        )
+    other = sum(extractor.other.values())
+    if other:
+        print(f"Пропущено заметок других моделей: {other}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
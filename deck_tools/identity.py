@@ -0,0 +1,38 @@
+"""
+Детерминированные ID колод и GUID заметок.
+
+Пересобранная колода получает те же ID, поэтому Anki при импорте обновляет
+существующие заметки, а не создаёт новую колоду или дубликаты. genanki
+импортируется только при сборке (см. deck_tools/cli.py).
+"""
+import hashlib
+
+
+def stable_deck_id(*parts):
+    """ID колоды в диапазоне [2^30, 2^31), вычисленный из названия/настроек"""
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).digest()
+    return (1 << 30) + int.from_bytes(digest[:8], "big") % (1 << 30)
+
+
+def note_key(model, key):
+    """
+    Короткий ID заметки (до 10 символов [0-9a-z]) для ключей localStorage в
+    шаблонах: в отличие от GUID и значений полей, в нём нет кавычек и ;
+    """
+    data = f"{model.model_id}\x1f{key}".encode("utf-8")
+    number = int.from_bytes(hashlib.sha256(data).digest()[:6], "big")
+    digits = []
+    while number:
+        number, digit = divmod(number, 36)
+        digits.append("0123456789abcdefghijklmnopqrstuvwxyz"[digit])
+    return "".join(reversed(digits)) or "0"
+
+
+def note_guid(model, key):
+    """
+    GUID заметки по значению ключевой колонки. ID модели входит в хеш,
+    чтобы одинаковые ключи разных колод (например, become) не совпадали.
+    """
+    from genanki import guid_for
+
+    return guid_for(model.model_id, key)
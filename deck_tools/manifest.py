@@ -0,0 +1,287 @@
+"""
+Манифест сборки: хеши входных файлов, шаблонов, опций и строк CSV.
+
+Хранится рядом с выходным .apkg (``<output>.manifest.json``) и позволяет
+пропустить сборку без изменений или пересобрать только изменённые строки.
+"""
+import base64
+import hashlib
+import json
+import sys
+from array import array
+from collections import defaultdict
+from pathlib import Path
+
+MANIFEST_VERSION = 3
+MANIFEST_SUFFIX = ".manifest.json"
+# Ключи хешей шаблонов, от которых зависят заметки и карточки коллекции;
+# при изменении остальных (CSS, HTML) достаточно обновить модели
+LAYOUT_SUFFIXES = ("/fields", "/cards")
+# Общий код, от которого зависят модели и заметки (JS шаблонов, ответы, GUID)
+TOOLS_DIR = Path(__file__).resolve().parent
+
+
+def hash_text(text):
+    """SHA-1 строки в hex"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def hash_row(values):
+    """Хеш строки CSV по значениям полей"""
+    return hash_text("\x1f".join(values))
+
+
+def hash_file(path):
+    """SHA-1 содержимого файла, читаемого блоками"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def note_digest(model_id, guid, fields):
+    """SHA-1 заметки (модель, GUID и поля) для сравнения с прошлой сборкой"""
+    return hashlib.sha1(f"{model_id}\x1f{guid}\x1f{fields}".encode("utf-8")).digest()
+
+
+def source_hashes(paths):
+    """
+    Хеши файлов, из которых строятся модели: переданных (генератор,
+    шаблоны) и модулей deck_tools. По ним неизменённая колода пропускается
+    до построения моделей и импорта genanki.
+    """
+    paths = [*paths, *sorted(TOOLS_DIR.glob("*.py")), *sorted(TOOLS_DIR.glob("*.js"))]
+    return {
+        f"{Path(path).parent.name}/{Path(path).name}": hash_file(path)
+        for path in paths
+    }
+
+
+def file_stat(path):
+    stat = Path(path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def model_hashes(models):
+    """Хеши полей, CSS и HTML шаблонов моделей (в том числе встроенных в код)"""
+    hashes = {}
+    for model in models:
+        hashes[f"{model.name}/fields"] = hash_text(
+            json.dumps([model.model_id] + [f["name"] for f in model.fields])
+        )
+        hashes[f"{model.name}/cards"] = hash_text(
+            json.dumps([[t["name"] for t in model.templates], model._req])
+        )
+        hashes[f"{model.name}/css"] = hash_text(model.css)
+        for template in model.templates:
+            for side in ("qfmt", "afmt"):
+                hashes[f"{model.name}/{template['name']}/{side}"] = hash_text(
+                    template[side]
+                )
+    return hashes
+
+
+def _pack_array(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _unpack_array(typecode, text):
+    values = array(typecode, base64.b64decode(text))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class RowLog:
+    """
+    Компактный журнал строк сборки: SHA-1 строк, id их заметок и SHA-1
+    заметок хранятся в плоских массивах, без Python-объекта на каждую строку.
+    """
+
+    def __init__(self, digests=None, note_ids=None, counts=None, note_digests=None):
+        self.digests = digests or bytearray()
+        self.note_ids = note_ids or array("q")
+        self.counts = counts or array("H")
+        self.note_digests = note_digests or bytearray()
+
+    def append(self, row_hash, note_ids, note_digests):
+        """note_digests — склеенные 20-байтовые note_digest заметок строки"""
+        self.digests += bytes.fromhex(row_hash)
+        self.note_ids.extend(note_ids)
+        self.counts.append(len(note_ids))
+        self.note_digests += note_digests
+
+    def iter_note_digests(self):
+        for offset in range(0, len(self.note_digests), 20):
+            yield bytes(self.note_digests[offset : offset + 20])
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __iter__(self):
+        offset = 0
+        for i, count in enumerate(self.counts):
+            row_hash = self.digests[i * 20 : (i + 1) * 20].hex()
+            yield (
+                row_hash,
+                self.note_ids[offset : offset + count].tolist(),
+                bytes(self.note_digests[offset * 20 : (offset + count) * 20]),
+            )
+            offset += count
+
+    def to_json(self):
+        return {
+            "hashes": self.digests.hex(),
+            "note_ids": _pack_array(self.note_ids),
+            "counts": _pack_array(self.counts),
+            "note_digests": self.note_digests.hex(),
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if not data:
+            return cls()
+        return cls(
+            bytearray.fromhex(data["hashes"]),
+            _unpack_array("q", data["note_ids"]),
+            _unpack_array("H", data["counts"]),
+            bytearray.fromhex(data["note_digests"]),
+        )
+
+
+class BuildManifest:
+    def __init__(self, path, data=None):
+        self.path = Path(path)
+        self.data = data or {}
+
+    @classmethod
+    def for_output(cls, output):
+        return cls.load(Path(str(output) + MANIFEST_SUFFIX))
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            data = {}
+        if data.get("version") != MANIFEST_VERSION:
+            data = {}
+        return cls(path, data)
+
+    def save(self):
+        self.data["version"] = MANIFEST_VERSION
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        tmp_path.replace(self.path)
+
+    @property
+    def deck_id(self):
+        return self.data.get("deck_id")
+
+    def output_matches(self, output):
+        """Выходной файл существует и не менялся после прошлой сборки"""
+        return (
+            Path(output).exists() and self.data.get("output") == file_stat(output)
+        )
+
+    def inputs_match(self, inputs):
+        """
+        Сравнивает входные файлы с манифестом: сначала по размеру и mtime,
+        при расхождении по содержимому.
+        """
+        recorded = self.data.get("inputs", {})
+        if set(recorded) != {str(path) for path in inputs}:
+            return False
+        for path in inputs:
+            entry = recorded[str(path)]
+            stat = file_stat(path)
+            if {k: entry.get(k) for k in stat} == stat:
+                continue
+            if entry.get("sha1") != hash_file(path):
+                return False
+            entry.update(stat)
+        return True
+
+    def fingerprint_matches(self, templates, options):
+        return (
+            self.data.get("templates") == templates
+            and self.data.get("options") == options
+        )
+
+    def layout_matches(self, templates, options):
+        """
+        Совпадают опции, поля моделей и набор карточек: изменились разве что
+        CSS и HTML шаблонов, и заметки прошлой сборки можно переиспользовать.
+        """
+        recorded = self.data.get("templates") or {}
+        return (
+            self.data.get("options") == options
+            and set(recorded) == set(templates)
+            and all(
+                recorded[key] == value
+                for key, value in templates.items()
+                if key.endswith(LAYOUT_SUFFIXES)
+            )
+        )
+
+    def is_current(self, output, inputs, templates, options):
+        return (
+            self.fingerprint_matches(templates, options)
+            and self.output_matches(output)
+            and self.inputs_match(inputs)
+        )
+
+    def sources_current(self, output, inputs, sources, options):
+        """is_current по source_hashes вместо хешей построенных моделей"""
+        return (
+            self.data.get("sources") == sources
+            and self.data.get("options") == options
+            and self.output_matches(output)
+            and self.inputs_match(inputs)
+        )
+
+    def previous_rows(self):
+        """
+        Строки прошлой сборки: хеш строки -> список пар (id заметок,
+        note_digest заметок) для каждой строки с таким хешем. Сборщик забирает
+        из него неизменённые строки, а оставшиеся заметки считаются устаревшими.
+        """
+        previous = defaultdict(list)
+        for row_hash, note_ids, note_digests in RowLog.from_json(self.data.get("rows")):
+            previous[row_hash].append((note_ids, note_digests))
+        return previous
+
+    def note_digests(self):
+        """Множество note_digest всех заметок прошлой сборки"""
+        return set(RowLog.from_json(self.data.get("rows")).iter_note_digests())
+
+    @property
+    def media(self):
+        return self.data.get("media", [])
+
+    def record(
+        self, output, inputs, templates, options, deck_id, rows, media=(), sources=None
+    ):
+        """
+        rows — RowLog с хешами строк и заметок, media — имена медиафайлов,
+        sources — source_hashes для проверки до построения моделей.
+        """
+        self.data = {
+            "inputs": {
+                str(path): {**file_stat(path), "sha1": hash_file(path)}
+                for path in inputs
+            },
+            "templates": templates,
+            "sources": sources,
+            "options": options,
+            "deck_id": deck_id,
+            "rows": rows.to_json(),
+            "media": sorted(media),
+            "output": file_stat(output),
+        }
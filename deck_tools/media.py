@@ -0,0 +1,260 @@
+"""
+Подготовка медиафайлов колоды перед записью .apkg.
+
+Файлы с одинаковым содержимым (один и тот же клип, скачанный по разным URL
+или озвученный для разных слов) кладутся в колоду один раз под именем
+первого из них. Хеши содержимого кешируются в ``<cache>/index.json`` по
+пути, размеру и времени изменения файла, поэтому повторная сборка не
+читает файлы заново.
+
+С audio_format аудио перекодируется ffmpeg в компактный формат (моно,
+заданный битрейт). Результаты хранятся в ``<cache>/objects/`` по хешу
+содержимого и команды; если перекодированный файл не меньше исходного,
+остаётся исходный. subprocess, zipfile и пул потоков импортируются при
+первом использовании, чтобы не замедлять запуск команд без сборки.
+"""
+import hashlib
+import json
+import os
+import shlex
+import threading
+from collections import namedtuple
+from pathlib import Path, PurePosixPath
+
+AUDIO_FORMATS = {
+    "mp3": "-c:a libmp3lame",
+    "ogg": "-c:a libvorbis",
+    "opus": "-c:a libopus",
+}
+ENCODE_COMMAND = (
+    "ffmpeg -nostdin -loglevel error -y -i {input} -vn -ac 1 {codec} "
+    "-b:a {bitrate} {output}"
+)
+DEFAULT_BITRATE = "48k"
+DEFAULT_TIMEOUT = 60
+AUDIO_SUFFIXES = frozenset(
+    (".mp3", ".wav", ".ogg", ".oga", ".opus", ".m4a", ".aac", ".flac")
+)
+# Уже сжатые форматы: deflate почти не уменьшает их, только тратит время
+STORED_SUFFIXES = frozenset(
+    (".mp3", ".ogg", ".oga", ".opus", ".m4a", ".aac", ".flac", ".webm", ".mp4")
+    + (".jpg", ".jpeg", ".png", ".gif", ".webp", ".zip", ".gz")
+)
+# Уровень 1 сжимает коллекцию почти так же, как 6, но в несколько раз быстрее
+DEFLATE_LEVEL = 1
+
+MediaResult = namedtuple("MediaResult", "files errors duplicates encoded saved")
+
+
+class MediaError(Exception):
+    pass
+
+
+def compress_type(name):
+    """ZIP_STORED для уже сжатых форматов, иначе ZIP_DEFLATED"""
+    import zipfile
+
+    if PurePosixPath(name).suffix.lower() in STORED_SUFFIXES:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaStage:
+    """
+    Удаление дубликатов и перекодирование медиафайлов с кешем в cache_dir.
+    audio_format - ключ AUDIO_FORMATS или None (без перекодирования).
+    """
+
+    def __init__(
+        self,
+        cache_dir,
+        audio_format=None,
+        bitrate=DEFAULT_BITRATE,
+        workers=None,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.index_path = self.cache_dir / "index.json"
+        self.audio_format = audio_format
+        self.bitrate = bitrate
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        if audio_format:
+            self.command = ENCODE_COMMAND.replace(
+                "{codec}", AUDIO_FORMATS[audio_format]
+            ).replace("{bitrate}", bitrate)
+        else:
+            self.command = None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = {}
+        self.digests = index.get("digests", {})
+        self.encoded = index.get("encoded", {})
+        self.changed = False
+
+    def options(self):
+        """Опции манифеста: смена формата или битрейта пересобирает колоду"""
+        if self.command is None:
+            return {}
+        return {"media": [self.command]}
+
+    def digest(self, path):
+        """sha256 содержимого файла, из кеша, если файл не менялся"""
+        stat = os.stat(path)
+        key = str(Path(path).resolve())
+        cached = self.digests.get(key)
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+        digest = file_digest(path)
+        self.digests[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        self.changed = True
+        return digest
+
+    def encode_key(self, digest):
+        data = f"{self.command}\x1f{digest}".encode("utf-8")
+        return hashlib.sha256(data).hexdigest()[:32]
+
+    def encoded_path(self, digest):
+        """Путь к перекодированному файлу, "" - оставить исходный, None - нет в кеше"""
+        key = self.encode_key(digest)
+        if key not in self.encoded:
+            return None
+        name = self.encoded[key]
+        if name is None:
+            return ""
+        path = self.objects_dir / name
+        return path if path.exists() else None
+
+    def check(self):
+        """Проверяет, что программа перекодирования установлена"""
+        import shutil
+
+        program = shlex.split(self.command)[0]
+        if shutil.which(program) is None:
+            raise MediaError(f"программа перекодирования не найдена: {program}")
+
+    def encode(self, path, digest):
+        """Перекодирует файл; возвращает путь к результату или None"""
+        import subprocess
+
+        name = f"{self.encode_key(digest)}.{self.audio_format}"
+        output = self.objects_dir / name
+        tmp_output = output.with_name(
+            f"{output.stem}.{threading.get_ident()}.tmp.{self.audio_format}"
+        )
+        args = [
+            arg.format(input=path, output=tmp_output)
+            for arg in shlex.split(self.command)
+        ]
+        try:
+            result = subprocess.run(args, capture_output=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            tmp_output.unlink(missing_ok=True)
+            raise MediaError(f"перекодирование дольше {self.timeout} с") from None
+        if result.returncode != 0 or not tmp_output.exists():
+            tmp_output.unlink(missing_ok=True)
+            stderr = result.stderr.decode("utf-8", "replace").strip()
+            raise MediaError(f"код {result.returncode}: {stderr[-200:]}")
+        if tmp_output.stat().st_size >= os.stat(path).st_size:
+            tmp_output.unlink()
+            return None
+        tmp_output.replace(output)
+        return output
+
+    def process(self, files):
+        """
+        files - пары (имя медиафайла, путь). Возвращает MediaResult: files -
+        исходное имя -> (имя в колоде, путь), errors - имя -> ошибка
+        перекодирования (такие файлы остаются как есть), duplicates - число
+        удалённых дубликатов, encoded - число перекодированных файлов,
+        saved - сэкономлено байт.
+        """
+        unique = {}
+        result = {}
+        duplicates = 0
+        saved = 0
+        for name, path in files:
+            if name in result:
+                continue
+            digest = self.digest(path)
+            if digest in unique:
+                duplicates += 1
+                saved += os.stat(path).st_size
+            else:
+                unique[digest] = (name, path)
+            result[name] = digest
+
+        errors = {}
+        staged = dict(unique)
+        if self.command is not None:
+            missing = []
+            for digest, (name, path) in unique.items():
+                if PurePosixPath(name).suffix.lower() not in AUDIO_SUFFIXES:
+                    continue
+                encoded = self.encoded_path(digest)
+                if encoded is None:
+                    missing.append(digest)
+                elif encoded:
+                    staged[digest] = (self.renamed(name), encoded)
+            if missing:
+                from concurrent.futures import ThreadPoolExecutor
+
+                self.check()
+                self.objects_dir.mkdir(parents=True, exist_ok=True)
+
+                def encode(digest):
+                    try:
+                        return digest, self.encode(unique[digest][1], digest), None
+                    except MediaError as e:
+                        return digest, None, str(e)
+
+                with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                    for digest, encoded, error in pool.map(encode, missing):
+                        if error is not None:
+                            errors[unique[digest][0]] = error
+                            continue
+                        key = self.encode_key(digest)
+                        self.encoded[key] = encoded.name if encoded else None
+                        self.changed = True
+                        if encoded:
+                            name = unique[digest][0]
+                            staged[digest] = (self.renamed(name), encoded)
+
+        encoded = 0
+        for digest, (name, path) in unique.items():
+            staged_path = staged[digest][1]
+            if staged_path != path:
+                encoded += 1
+                saved += os.stat(path).st_size - os.stat(staged_path).st_size
+        self.save()
+        return MediaResult(
+            files={name: staged[digest] for name, digest in result.items()},
+            errors=errors,
+            duplicates=duplicates,
+            encoded=encoded,
+            saved=saved,
+        )
+
+    def renamed(self, name):
+        return f"{PurePosixPath(name).stem}.{self.audio_format}"
+
+    def save(self):
+        if not self.changed:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name("index.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"digests": self.digests, "encoded": self.encoded}, f)
+        tmp_path.replace(self.index_path)
+        self.changed = False
@@ -0,0 +1,399 @@
+"""
+Минификация шаблонов карточек при сборке (--minify).
+
+Anki разбирает HTML, JS и CSS шаблона при каждом показе карточки, поэтому
+из них убираются комментарии, отступы и лишние пробелы:
+
+- HTML: пробельные последовательности сжимаются до одного пробела и
+  удаляются рядом с блочными тегами; теги ``{{Field}}``, ``{{#Field}}``
+  остаются текстом и не меняются, значения атрибутов тоже;
+- JS: удаляются комментарии и отступы, переводы строк сохраняются (не
+  меняется автоматическая расстановка точек с запятой), строки и
+  регулярные выражения не трогаются;
+- CSS: удаляются комментарии и пробелы вокруг ``{};,:>``.
+
+Одинаковые атрибуты ``style="..."``, встречающиеся в шаблонах моделей
+больше одного раза, выносятся в классы ``ms1``, ``ms2``... в CSS модели
+(с ``!important``, чтобы сохранить приоритет встроенного стиля). Теги с
+``id`` не трогаются: их стили может менять JS карточки.
+
+Результаты кешируются в процессе по хешу исходного текста, поэтому режим
+--watch и build-all не минифицируют неизменённые шаблоны повторно.
+"""
+import hashlib
+import re
+from collections import Counter
+
+STYLE_CLASS_PREFIX = "ms"
+# Теги, пробелы вокруг которых не отображаются
+BLOCK_TAGS = frozenset(
+    "html head body title meta link div p br hr ul ol li dl dt dd table thead "
+    "tbody tfoot tr td th caption h1 h2 h3 h4 h5 h6 section article header "
+    "footer nav form fieldset legend".split()
+)
+JS_TYPES = ("", "text/javascript", "application/javascript", "module")
+CACHE_SIZE = 1024
+
+_TOKEN_RE = re.compile(
+    r"(?P<comment><!--.*?-->)"
+    # Содержимое pre и textarea переносится без изменений
+    r"|(?P<raw><(?P<raw_name>script|style|pre|textarea)\b"
+    r"(?P<raw_attrs>(?:\"[^\"]*\"|'[^']*'|[^'\">])*)>"
+    r"(?P<raw_body>.*?)</(?P=raw_name)\s*>)"
+    r"|(?P<tag></?[a-zA-Z!][^\s/>]*(?:\"[^\"]*\"|'[^']*'|[^'\">])*>)",
+    re.DOTALL | re.IGNORECASE,
+)
+_TAG_NAME_RE = re.compile(r"<(/?)([^\s/>]+)")
+_ATTR_RE = re.compile(r"([^\s=/>]+)(?:\s*=\s*(\"[^\"]*\"|'[^']*'|[^\s\"'>]+))?")
+_SPACES_RE = re.compile(r"\s+")
+_CSS_PUNCT_RE = re.compile(r"\s*([{};,>])\s*|:\s+")
+
+# Знаки JS, пробелы вокруг которых не нужны (без + - / * !: "a + +b")
+_JS_PUNCT = frozenset("{}()[];,=:?<>&|")
+# После этих знаков и слов / начинает регулярное выражение, а не деление
+_JS_REGEX_AFTER = frozenset("(,=:[!&|?{};+-*%<>~^")
+_JS_REGEX_KEYWORDS = frozenset(
+    "return typeof case do else in of new delete void throw instanceof".split()
+)
+
+_cache = {}
+
+
+def _cached(kind, text, minify, *args):
+    key = hashlib.sha256(
+        "\x1f".join((kind, repr(args), text)).encode("utf-8")
+    ).digest()
+    result = _cache.get(key)
+    if result is None:
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        result = _cache[key] = minify(text, *args)
+    return result
+
+
+def _skip_string(code, start):
+    """Индекс после строки JS/CSS, начинающейся в start"""
+    quote = code[start]
+    i = start + 1
+    while i < len(code):
+        char = code[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == quote:
+            return i + 1
+        i += 1
+    return i
+
+
+def _skip_regex(code, start):
+    """Индекс после тела регулярного выражения JS /.../ (флаги не входят)"""
+    i = start + 1
+    in_class = False
+    while i < len(code):
+        char = code[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "\n":
+            break
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "/":
+            return i + 1
+        i += 1
+    return i
+
+
+def _minify_js(code):
+    out = []
+    word = ""
+    i = 0
+    n = len(code)
+
+    def last():
+        return out[-1][-1] if out else "\n"
+
+    while i < n:
+        char = code[i]
+        if char in " \t\r\n\f\v":
+            start = i
+            while i < n and code[i] in " \t\r\n\f\v":
+                i += 1
+            newline = "\n" in code[start:i]
+            while out and out[-1] == " ":
+                out.pop()
+            if newline:
+                if last() != "\n":
+                    out.append("\n")
+            elif last() not in _JS_PUNCT and last() != "\n":
+                out.append(" ")
+            continue
+        if code.startswith("//", i):
+            end = code.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        if code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            if last() not in " \n" and i < n and code[i] not in " \t\r\n":
+                out.append(" ")
+            continue
+        if char in "'\"`":
+            end = _skip_string(code, i)
+            out.append(code[i:end])
+            word = ""
+            i = end
+            continue
+        if char == "/":
+            prev = out[-2][-1] if last() == " " and len(out) > 1 else last()
+            if prev in _JS_REGEX_AFTER or prev == "\n" or word in _JS_REGEX_KEYWORDS:
+                end = _skip_regex(code, i)
+                out.append(code[i:end])
+                word = ""
+                i = end
+                continue
+        if char in _JS_PUNCT and out and out[-1] == " ":
+            out.pop()
+        if char.isalnum() or char in "_$":
+            if not (out and (out[-1][-1].isalnum() or out[-1][-1] in "_$")):
+                word = ""
+            word += char
+        else:
+            word = ""
+        out.append(char)
+        i += 1
+    return "".join(out).strip()
+
+
+def minify_js(code):
+    """JS без комментариев, отступов и лишних пробелов"""
+    return _cached("js", code, _minify_js)
+
+
+def _minify_css(css):
+    parts = []
+    i = 0
+    n = len(css)
+    chunk = []
+
+    def flush():
+        if chunk:
+            text = _SPACES_RE.sub(" ", "".join(chunk))
+            parts.append(_CSS_PUNCT_RE.sub(lambda m: m.group(1) or ":", text))
+            chunk.clear()
+
+    while i < n:
+        if css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            chunk.append(" ")
+            continue
+        if css[i] in "'\"":
+            flush()
+            end = _skip_string(css, i)
+            parts.append(css[i:end])
+            i = end
+            continue
+        chunk.append(css[i])
+        i += 1
+    flush()
+    return "".join(parts).strip().replace(";}", "}")
+
+
+def minify_css(css):
+    """CSS без комментариев и лишних пробелов"""
+    return _cached("css", css, _minify_css)
+
+
+def _style_key(value):
+    """Нормализованный стиль атрибута или None, если его нельзя вынести"""
+    value = value[1:-1] if value[:1] in "'\"" else value
+    if not value.strip() or any(part in value for part in ("{{", "!", "'", '"')):
+        return None
+    return _minify_css(value).strip(";")
+
+
+def _parse_tag(tag):
+    closing, name = _TAG_NAME_RE.match(tag).groups()
+    body = tag[len(closing) + len(name) + 1 : -1]
+    self_closing = body.rstrip().endswith("/")
+    if self_closing:
+        body = body.rstrip()[:-1]
+    return closing, name, _ATTR_RE.findall(body), self_closing
+
+
+def _tag_style(attrs):
+    names = {name.lower(): value for name, value in attrs}
+    if "id" in names or not names.get("style"):
+        return None
+    return _style_key(names["style"])
+
+
+def inline_styles(html):
+    """Стили атрибутов style, которые можно вынести в класс"""
+    for match in _TOKEN_RE.finditer(html):
+        tag = match.group("tag")
+        if tag and not tag.startswith(("</", "<!")):
+            style = _tag_style(_parse_tag(tag)[2])
+            if style:
+                yield style
+
+
+def _minify_tag(tag, classes):
+    if tag.startswith("<!"):
+        return tag
+    closing, name, attrs, self_closing = _parse_tag(tag)
+    if closing:
+        return f"</{name}>"
+    style = _tag_style(attrs)
+    style_class = classes.get(style) if style else None
+    parts = [f"<{name}"]
+    class_added = False
+    for attr, value in attrs:
+        lower = attr.lower()
+        if style_class and lower == "style":
+            continue
+        if style_class and lower == "class" and value:
+            quote = value[0] if value[0] in "'\"" else '"'
+            inner = value[1:-1] if value[0] in "'\"" else value
+            value = f"{quote}{inner} {style_class}{quote}"
+            class_added = True
+        parts.append(f"{attr}={value}" if value else attr)
+    if style_class and not class_added:
+        parts.append(f'class="{style_class}"')
+    if not self_closing:
+        return " ".join(parts) + ">"
+    # Без пробела / вошёл бы в значение атрибута без кавычек
+    unquoted = "=" in parts[-1] and parts[-1][-1] not in "'\""
+    return " ".join(parts) + (" />" if unquoted else "/>")
+
+
+def _minify_raw(match):
+    name = match.group("raw_name").lower()
+    attrs = match.group("raw_attrs")
+    body = match.group("raw_body")
+    open_tag = _minify_tag(f"<{match.group('raw_name')}{attrs}>", {})
+    close_tag = f"</{match.group('raw_name')}>"
+    if name == "style":
+        body = minify_css(body)
+    elif name == "script":
+        types = dict((key.lower(), value) for key, value in _ATTR_RE.findall(attrs))
+        script_type = types.get("type", "").strip("'\"").lower()
+        if script_type in JS_TYPES:
+            body = minify_js(body)
+    return open_tag + body + close_tag
+
+
+def _is_block(token):
+    match = _TAG_NAME_RE.match(token) if token.startswith("<") else None
+    return bool(match) and match.group(2).lower() in BLOCK_TAGS
+
+
+def _minify_html(html, classes):
+    classes = dict(classes)
+    # (текст, тип): "text", "block", "inline" или "hidden" (script, style)
+    tokens = []
+    position = 0
+    for match in _TOKEN_RE.finditer(html):
+        if match.start() > position:
+            tokens.append((html[position : match.start()], "text"))
+        position = match.end()
+        if match.group("comment"):
+            continue
+        if match.group("raw"):
+            name = match.group("raw_name").lower()
+            kind = "inline" if name in ("pre", "textarea") else "hidden"
+            tokens.append((_minify_raw(match), kind))
+        else:
+            tag = match.group("tag")
+            kind = "block" if _is_block(tag) else "inline"
+            tokens.append((_minify_tag(tag, classes), kind))
+    if position < len(html):
+        tokens.append((html[position:], "text"))
+
+    out = []
+    for index, (text, kind) in enumerate(tokens):
+        if kind != "text":
+            out.append(text)
+            continue
+        text = _SPACES_RE.sub(" ", text)
+        if _neighbour(tokens, index, -1) == "block":
+            text = text.lstrip()
+        if _neighbour(tokens, index, 1) == "block":
+            text = text.rstrip()
+        out.append(text)
+    return "".join(out)
+
+
+def _neighbour(tokens, index, step):
+    """Тип ближайшего соседа; script, style и пробелы между ними пропускаются"""
+    index += step
+    while 0 <= index < len(tokens):
+        text, kind = tokens[index]
+        if kind != "hidden" and not (kind == "text" and text.isspace()):
+            return kind
+        index += step
+    return "block"
+
+
+def minify_html(html, classes=None):
+    """
+    HTML шаблона без комментариев и лишних пробелов; classes - стиль
+    (из inline_styles) -> класс, в который выносится атрибут style.
+    """
+    classes = tuple(sorted((classes or {}).items()))
+    return _cached("html", html, _minify_html, classes)
+
+
+def style_classes(htmls, min_count=2):
+    """Стиль -> имя класса для стилей, встречающихся min_count раз и больше"""
+    counts = Counter(style for html in htmls for style in inline_styles(html))
+    repeated = [style for style, count in counts.items() if count >= min_count]
+    return {
+        style: f"{STYLE_CLASS_PREFIX}{number}"
+        for number, style in enumerate(repeated, 1)
+    }
+
+
+def style_rules(classes):
+    """CSS правила вынесенных стилей"""
+    return "".join(
+        f".{name}{{"
+        + ";".join(f"{declaration}!important" for declaration in style.split(";"))
+        + "}"
+        for style, name in classes.items()
+    )
+
+
+def minify_models(models):
+    """
+    Минифицирует шаблоны и CSS моделей genanki на месте. Общие стили
+    выносятся в классы одинаково для всех моделей (CSS у моделей прежних
+    версий общий).
+    """
+    sides = [
+        template[side]
+        for model in models
+        for template in model.templates
+        for side in ("qfmt", "afmt")
+    ]
+    classes = style_classes(sides)
+    rules = style_rules(classes)
+    for model in models:
+        for template in model.templates:
+            for side in ("qfmt", "afmt"):
+                template[side] = minify_html(template[side], classes)
+        model.css = minify_css(model.css) + rules
+    return models
+
+
+def minify_text(name, content):
+    """Минифицирует общий файл по расширению (.js, .css); прочие - как есть"""
+    if name.endswith(".js"):
+        return minify_js(content)
+    if name.endswith(".css"):
+        return minify_css(content)
+    return content
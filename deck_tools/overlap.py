@@ -0,0 +1,308 @@
+"""
+Индекс пересечений корпусов: одни и те же слова в word/words.csv и
+irregular_verbs/verbs.csv (и в любом числе других CSV этих схем).
+
+Термины строк нормализуются: регистр, транскрипции в [скобках], "to " перед
+глаголом, варианты через / ; , (was/were). В индексе хранятся термины и
+место их первого появления, без остальных колонок строк, поэтому корпуса
+из миллионов строк индексируются потоково за один проход. Почти-дубликаты
+(pack/packing, choose/chooses) ищутся по "скелету" основного термина: без
+небуквенных символов, удвоенных букв и частых окончаний.
+"""
+import argparse
+import csv
+import json
+import re
+import sys
+import unicodedata
+from collections import Counter, namedtuple
+from operator import itemgetter
+
+# primary - колонки с основным термином строки, forms - другие формы
+# (их совпадения попадают в отчёт, но не участвуют в --exclude)
+CorpusSchema = namedtuple("CorpusSchema", "name primary forms")
+
+VERBS = CorpusSchema("verbs", ("infinitive",), ("past_simple", "past_participle"))
+WORDS = CorpusSchema("words", ("word",), ())
+SCHEMAS = (VERBS, WORDS)
+
+OVERLAP = "overlap"  # один термин в разных файлах
+DUPLICATE = "duplicate"  # один термин в разных строках одного файла
+NEAR = "near"  # разные основные термины с одинаковым скелетом
+
+Location = namedtuple("Location", "file line column term")
+Match = namedtuple("Match", "code first other")
+
+_BRACKETS_RE = re.compile(r"\[[^\]]*\]")
+_VARIANTS_RE = re.compile(r"[/;,|]")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+_DOUBLE_RE = re.compile(r"(.)\1+")
+SKELETON_SUFFIXES = ("ing", "ed", "es", "s", "e")
+MIN_STEM = 3
+
+# Место термина упаковано в одно число: файл, строка, номер колонки схемы
+_LINE_SHIFT = 8
+_SOURCE_SHIFT = 48
+
+
+def normalize(text):
+    """Нормализованный термин: без регистра, лишних пробелов и 'to ' в начале"""
+    if text.isalpha() and text.islower() and text.isascii():
+        return text
+    if not text.isascii():
+        text = unicodedata.normalize("NFKC", text).replace("’", "'")
+    text = " ".join(text.casefold().split())
+    if text.startswith("to "):
+        text = text[3:]
+    return text
+
+
+def terms(value):
+    """Нормализованные варианты значения: '[wʌz] was/were' -> ['was', 'were']"""
+    if "[" in value:
+        value = _BRACKETS_RE.sub(" ", value)
+    if _VARIANTS_RE.search(value) is None:
+        term = normalize(value)
+        return [term] if term else []
+    result = []
+    for part in _VARIANTS_RE.split(value):
+        term = normalize(part)
+        if term and term not in result:
+            result.append(term)
+    return result
+
+
+def _first_char(match):
+    return match.group(1)
+
+
+def skeleton(term):
+    """Ключ почти-дубликатов: только буквы, без удвоений и частого окончания"""
+    text = term if term.isalpha() else _NON_WORD_RE.sub("", term)
+    text = _DOUBLE_RE.sub(_first_char, text)
+    if text.endswith(SKELETON_SUFFIXES):
+        for suffix in SKELETON_SUFFIXES:
+            if text.endswith(suffix) and len(text) - len(suffix) >= MIN_STEM:
+                return text[: -len(suffix)]
+    return text
+
+
+def detect_schema(header):
+    for schema in SCHEMAS:
+        if all(name in header for name in schema.primary + schema.forms):
+            return schema
+    raise ValueError(
+        f"неизвестная схема CSV, нужна колонка word или infinitive: {','.join(header)}"
+    )
+
+
+def iter_rows(csv_file, columns):
+    """
+    Строки CSV как (номер первой строки записи в файле, значения columns).
+    Записи, в которых не хватает колонок, пропускаются - их покажет --validate.
+    """
+    with open(csv_file, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        indexes = [header.index(name) for name in columns]
+        width = max(indexes) + 1
+        get = itemgetter(*indexes) if len(indexes) > 1 else None
+        first = indexes[0]
+        previous_line = reader.line_num
+        for row in reader:
+            line = previous_line + 1
+            previous_line = reader.line_num
+            if len(row) >= width:
+                yield line, get(row) if get else (row[first],)
+
+
+def read_header(csv_file):
+    with open(csv_file, "r", encoding="utf-8", newline="") as file:
+        return next(csv.reader(file), [])
+
+
+class OverlapIndex:
+    """
+    Потоковый индекс терминов нескольких корпусов. add_file добавляет CSV и
+    записывает его совпадения с уже добавленными файлами и с самим собой.
+    """
+
+    def __init__(self, near=True):
+        self.near = near
+        self.sources = []  # [(файл, схема)]
+        self.rows = []
+        self.keys = {}  # термин -> место первого появления
+        self.skeletons = {}  # скелет основного термина -> первый такой термин
+        # [(код, место первого, место другого, термин первого, термин другого)]
+        self.matches = []
+
+    def add_file(self, csv_file):
+        schema = detect_schema(read_header(csv_file))
+        columns = schema.primary + schema.forms
+        primary_count = len(schema.primary)
+        source = len(self.sources)
+        self.sources.append((str(csv_file), schema))
+        keys = self.keys
+        skeletons = self.skeletons
+        matches = self.matches
+        near = self.near
+        # Формы глагола часто совпадают (cost/cost/cost) - термин строки
+        # учитывается один раз
+        multi_column = len(columns) > 1
+        seen = ()
+        rows = 0
+        for line, values in iter_rows(csv_file, columns):
+            rows += 1
+            row_location = (source << _SOURCE_SHIFT) | (line << _LINE_SHIFT)
+            if multi_column:
+                seen = set()
+            for column, value in enumerate(values):
+                location = row_location | column
+                for term in terms(value):
+                    if multi_column:
+                        if term in seen:
+                            continue
+                        seen.add(term)
+                    first = keys.setdefault(term, location)
+                    if first != location:
+                        if first >> _LINE_SHIFT != row_location >> _LINE_SHIFT:
+                            same_file = first >> _SOURCE_SHIFT == source
+                            code = DUPLICATE if same_file else OVERLAP
+                            matches.append((code, first, location, term, term))
+                        continue
+                    if near and column < primary_count:
+                        first_term = skeletons.setdefault(skeleton(term), term)
+                        first = keys[first_term]
+                        if first >> _LINE_SHIFT != row_location >> _LINE_SHIFT:
+                            matches.append((NEAR, first, location, first_term, term))
+        self.rows.append(rows)
+        return rows
+
+    def _location(self, packed, term):
+        csv_file, schema = self.sources[packed >> _SOURCE_SHIFT]
+        columns = schema.primary + schema.forms
+        line = (packed >> _LINE_SHIFT) & ((1 << (_SOURCE_SHIFT - _LINE_SHIFT)) - 1)
+        return Location(csv_file, line, columns[packed & 0xFF], term)
+
+    def iter_matches(self):
+        for code, first, other, first_term, term in self.matches:
+            yield Match(
+                code, self._location(first, first_term), self._location(other, term)
+            )
+
+    def report(self):
+        matches = [
+            {
+                "code": match.code,
+                "first": match.first._asdict(),
+                "other": match.other._asdict(),
+            }
+            for match in self.iter_matches()
+        ]
+        return {
+            "sources": [
+                {"file": csv_file, "schema": schema.name, "rows": rows}
+                for (csv_file, schema), rows in zip(self.sources, self.rows)
+            ],
+            "terms": len(self.keys),
+            "by_code": dict(Counter(match["code"] for match in matches)),
+            "matches": matches,
+        }
+
+
+def primary_keys(csv_file):
+    """Множество основных терминов корпуса"""
+    schema = detect_schema(read_header(csv_file))
+    keys = set()
+    for _, values in iter_rows(csv_file, schema.primary):
+        for value in values:
+            keys.update(terms(value))
+    return keys
+
+
+class Exclusion:
+    """
+    Фильтр строк, основной термин которых уже есть в других корпусах
+    (--exclude генераторов). cache - FileCache режима --watch.
+    """
+
+    def __init__(self, paths, cache=None):
+        self.keys = set()
+        for path in paths:
+            if cache is not None:
+                self.keys |= cache.get(path, primary_keys)
+            else:
+                self.keys |= primary_keys(path)
+        self.excluded = 0
+
+    def covers(self, value):
+        return any(term in self.keys for term in terms(value))
+
+    def filter(self, records, term_of):
+        """Записи, основной термин которых (term_of(запись)) не покрыт"""
+        for record in records:
+            if self.keys and self.covers(term_of(record)):
+                self.excluded += 1
+                continue
+            yield record
+
+
+def print_summary(report, file=None, limit=20):
+    for source in report["sources"]:
+        print(
+            f"{source['file']}: {source['rows']} строк ({source['schema']})",
+            file=file,
+        )
+    counts = report["by_code"]
+    print(
+        f"Терминов: {report['terms']}, пересечений между файлами: "
+        f"{counts.get(OVERLAP, 0)}, повторов внутри файлов: "
+        f"{counts.get(DUPLICATE, 0)}, почти-дубликатов: {counts.get(NEAR, 0)}",
+        file=file,
+    )
+    for match in report["matches"][:limit]:
+        first, other = match["first"], match["other"]
+        print(
+            f"  {match['code']}: {first['term']} ({first['file']}:{first['line']} "
+            f"{first['column']}) ~ {other['term']} ({other['file']}:{other['line']} "
+            f"{other['column']})",
+            file=file,
+        )
+    if len(report["matches"]) > limit:
+        print(f"  ... и ещё {len(report['matches']) - limit}", file=file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Пересечения и почти-дубликаты в корпусах слов и глаголов"
+    )
+    parser.add_argument("csv_files", nargs="+", help="CSV файлы схем words и verbs")
+    parser.add_argument(
+        "--report", metavar="FILE", help="Файл для JSON отчёта (по умолчанию stdout)"
+    )
+    parser.add_argument(
+        "--no-near",
+        action="store_true",
+        help="Не искать почти-дубликаты (меньше памяти на больших корпусах)",
+    )
+    args = parser.parse_args()
+
+    index = OverlapIndex(near=not args.no_near)
+    for csv_file in args.csv_files:
+        try:
+            index.add_file(csv_file)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка: {csv_file}: {e}", file=sys.stderr)
+            sys.exit(1)
+    report = index.report()
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    print_summary(report, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
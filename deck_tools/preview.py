@@ -0,0 +1,437 @@
+"""
+Статический HTML предпросмотр колоды без Anki.
+
+Каждая заметка отрисовывается всеми шаблонами своей модели той же
+подстановкой, что в Anki: {{Поле}}, секции {{#Поле}}...{{/Поле}} и
+{{^Поле}}...{{/Поле}}, фильтры вида {{text:Поле}} и {{FrontSide}} на обратной
+стороне. Шаблон компилируется в одно выражение Python один раз на модель в
+каждом процессе, страницы по page_size заметок рисуются параллельно в пуле
+процессов.
+
+Стороны карточек показываются в <iframe srcdoc>, чтобы скрипты и id разных
+карточек не мешали друг другу. CSS модели и неизменные <script> шаблонов
+выносятся в общие файлы рядом со страницами, поэтому страницы не повторяют
+их для каждой карточки.
+"""
+import html
+import os
+import re
+from collections import namedtuple
+from pathlib import Path
+
+from .manifest import hash_text
+
+DEFAULT_PAGE_SIZE = 50
+
+# Модель без genanki: ключ, поля, шаблоны ((имя, лицевая, обратная), ...) и CSS
+ModelSpec = namedtuple("ModelSpec", "key name fields templates css")
+PreviewResult = namedtuple("PreviewResult", "notes cards pages index")
+
+FIELD = "field"
+SECTION = "section"
+
+_TAG_RE = re.compile(r"\{\{([^{}]*)\}\}")
+_HTML_TAG_RE = re.compile(r"<[^>]*>")
+_SOUND_RE = re.compile(r"\[sound:([^\]]+)\]")
+# <script> без подстановок полей одинаков у всех карточек модели
+_STATIC_SCRIPT_RE = re.compile(r"<script>((?:(?!</script>|\{\{).)*)</script>", re.S)
+
+
+def parse_template(template):
+    """
+    Дерево шаблона: строки, (FIELD, имя, фильтры) и
+    (SECTION, имя, инвертирована ли, дочерние узлы).
+    """
+    root = []
+    stack = [(None, root)]
+    position = 0
+    for match in _TAG_RE.finditer(template):
+        if match.start() > position:
+            stack[-1][1].append(template[position : match.start()])
+        position = match.end()
+        tag = match.group(1).strip()
+        if tag[:1] in ("#", "^"):
+            children = []
+            name = tag[1:].strip()
+            stack[-1][1].append((SECTION, name, tag[0] == "^", children))
+            stack.append((name, children))
+        elif tag[:1] == "/":
+            name = tag[1:].strip()
+            if stack[-1][0] != name:
+                raise ValueError(f"{{{{/{name}}}}} без открывающей секции")
+            stack.pop()
+        else:
+            *filters, name = tag.split(":")
+            filters = tuple(f.strip() for f in filters)
+            stack[-1][1].append((FIELD, name.strip(), filters))
+    if len(stack) > 1:
+        raise ValueError(f"не закрыта секция {{{{#{stack[-1][0]}}}}}")
+    if position < len(template):
+        root.append(template[position:])
+    return root
+
+
+def strip_html(text):
+    return _HTML_TAG_RE.sub("", text)
+
+
+def _expression(nodes, field_index, literals, escape):
+    """Выражение Python, собирающее узлы из полей f и текста front"""
+
+    def literal(text):
+        literals.append(escape(text))
+        return f"L[{len(literals) - 1}]"
+
+    parts = []
+    for node in nodes:
+        if isinstance(node, str):
+            parts.append(literal(node))
+        elif node[0] == FIELD:
+            _, name, filters = node
+            if name == "FrontSide":
+                expression = "front"
+            elif name in field_index:
+                expression = f"f[{field_index[name]}]"
+            else:
+                expression = literal(f"{{unknown field {name}}}")
+            if "text" in filters:
+                expression = f"strip_html({expression})"
+            parts.append(expression)
+        else:
+            _, name, inverted, children = node
+            body = _expression(children, field_index, literals, escape)
+            if name in field_index:
+                test = f"f[{field_index[name]}].strip()"
+            else:
+                test = "False"
+            if inverted:
+                parts.append(f"('' if {test} else {body})")
+            else:
+                parts.append(f"({body} if {test} else '')")
+    if not parts:
+        return "''"
+    if len(parts) == 1:
+        return parts[0]
+    return f"''.join(({', '.join(parts)},))"
+
+
+def _unchanged(text):
+    return text
+
+
+def compile_template(template, fields, name="template", escape=_unchanged):
+    """
+    Функция render(f, front="") для шаблона: f - значения полей в порядке
+    fields, front - отрисованная лицевая сторона для {{FrontSide}}. Текст
+    шаблона в код не попадает, только индексы полей и литералов; escape
+    применяется к литералам один раз при компиляции.
+    """
+    literals = []
+    field_index = {field: i for i, field in enumerate(fields)}
+    expression = _expression(parse_template(template), field_index, literals, escape)
+    code = compile(f"lambda f, front='': {expression}", f"<{name}>", "eval")
+    return eval(code, {"L": tuple(literals), "strip_html": strip_html})
+
+
+def _nonempty_expression(nodes, field_index):
+    """Выражение Python: подставляют ли узлы хотя бы одно непустое поле f"""
+    parts = []
+    for node in nodes:
+        if isinstance(node, str):
+            continue
+        if node[0] == FIELD:
+            if node[1] in field_index:
+                parts.append(f"f[{field_index[node[1]]}].strip() != ''")
+            continue
+        _, name, inverted, children = node
+        body = _nonempty_expression(children, field_index)
+        if body == "False":
+            continue
+        test = f"f[{field_index[name]}].strip()" if name in field_index else "''"
+        parts.append(f"(({body}) if {'not ' if inverted else ''}{test} else False)")
+    return " or ".join(parts) if parts else "False"
+
+
+def compile_nonempty(template, fields, name="template"):
+    """
+    Функция nonempty(f): подставляет ли шаблон хотя бы одно непустое поле.
+    Как и Anki, карточка создаётся, только если это верно для лицевой стороны.
+    """
+    field_index = {field: i for i, field in enumerate(fields)}
+    expression = _nonempty_expression(parse_template(template), field_index)
+    return eval(compile(f"lambda f: {expression}", f"<{name}>", "eval"))
+
+
+class CompiledModel:
+    """
+    Скомпилированные шаблоны модели: [(имя, лицевая, обратная, непустая ли
+    лицевая)]. Стороны рисуются сразу экранированными для srcdoc: литералы
+    шаблонов экранируются при компиляции, для заметки - только значения полей.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.frame = _side_frame(spec.css)
+        self.templates = []
+        for name, qfmt, afmt in spec.templates:
+            label = f"{spec.name}/{name}"
+            front = compile_template(qfmt, spec.fields, f"{label}/front", _attribute)
+            back = compile_template(afmt, spec.fields, f"{label}/back", _attribute)
+            nonempty = compile_nonempty(qfmt, spec.fields, f"{label}/front")
+            self.templates.append((name, front, back, nonempty))
+
+    def cards(self, values):
+        """
+        (имя шаблона, лицевая, обратная) для карточек заметки. Как и Anki,
+        карточка не создаётся, если лицевая сторона не подставляет ни одного
+        непустого поля.
+        """
+        values = [_attribute(value) for value in values]
+        for name, front, back, nonempty in self.templates:
+            if not nonempty(values):
+                continue
+            question = front(values)
+            yield name, question, back(values, question)
+
+
+# Скомпилированные модели процесса: компилируются один раз на процесс
+_COMPILED = {}
+
+
+def _init_worker(specs):
+    for spec in specs:
+        if spec.key not in _COMPILED:
+            _COMPILED[spec.key] = CompiledModel(spec)
+
+
+def _hoist_scripts(template, files):
+    def replace(match):
+        name = f"preview-{hash_text(match.group(1))[:12]}.js"
+        files[name] = match.group(1)
+        return f'<script src="{name}"></script>'
+
+    return _STATIC_SCRIPT_RE.sub(replace, template)
+
+
+def model_spec(model, files):
+    """
+    ModelSpec модели genanki. CSS и неизменные скрипты шаблонов добавляются
+    в files (имя файла -> текст) и подключаются по ссылке.
+    """
+    css_name = f"preview-{hash_text(model.css)[:12]}.css"
+    files[css_name] = model.css
+    templates = tuple(
+        (
+            template["name"],
+            _hoist_scripts(template["qfmt"], files),
+            _hoist_scripts(template["afmt"], files),
+        )
+        for template in model.templates
+    )
+    fields = tuple(field["name"] for field in model.fields)
+    return ModelSpec(model.model_id, model.name, fields, templates, css_name)
+
+
+def _sound_button(match):
+    # Внутри srcdoc кавычки атрибутов записываются как &quot;
+    src = match.group(1)
+    return f"<audio controls preload=&quot;none&quot; src=&quot;{src}&quot;></audio>"
+
+
+def _attribute(text):
+    """Значение атрибута в двойных кавычках: достаточно экранировать & и кавычки"""
+    return text.replace("&", "&amp;").replace('"', "&quot;")
+
+
+def _side_frame(css):
+    """
+    Функция, оборачивающая сторону карточки в <iframe srcdoc>. Начало и конец
+    документа экранируются один раз, для каждой карточки - только содержимое.
+    """
+    head = _attribute(
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        f'<link rel="stylesheet" href="{css}"></head>'
+        '<body class="card"><div id="qa">'
+    )
+    tail = _attribute("</div></body></html>")
+    start = f'<iframe loading="lazy" srcdoc="{head}'
+    end = (
+        f'{tail}" onload="this.style.height=this.contentDocument'
+        ".documentElement.scrollHeight+'px'\"></iframe>"
+    )
+
+    def frame(content):
+        """content уже экранирован для атрибута"""
+        if "[sound:" in content:
+            content = _SOUND_RE.sub(_sound_button, content)
+        return start + content + end
+
+    return frame
+
+
+PAGE_STYLE = """
+body { font-family: sans-serif; margin: 20px; background: #f5f5f5; }
+nav { margin: 10px 0; }
+.note { background: white; margin: 15px 0; padding: 10px; border-radius: 5px; }
+.note h2 { font-size: 16px; margin: 0 0 10px; color: #555; }
+.card-row { display: flex; gap: 10px; margin-bottom: 10px; }
+.card-row h3 { font-size: 13px; width: 120px; margin: 0; color: #777; }
+iframe { flex: 1; border: 1px solid #ddd; min-height: 80px; background: white; }
+"""
+
+
+def page_name(page):
+    return f"page-{page:05d}.html"
+
+
+def _navigation(page, last):
+    links = ['<a href="index.html">Оглавление</a>']
+    if page > 1:
+        links.insert(0, f'<a href="{page_name(page - 1)}">← Назад</a>')
+    if not last:
+        links.append(f'<a href="{page_name(page + 1)}">Вперёд →</a>')
+    return f"<nav>{' | '.join(links)}</nav>"
+
+
+def render_page(output_dir, title, page, first_number, notes, last):
+    """
+    Пишет страницу page с заметками notes ([(ключ модели, значения полей)])
+    и возвращает (заметок, карточек).
+    """
+    parts = [
+        f'<!DOCTYPE html><html><head><meta charset="utf-8">'
+        f"<title>{html.escape(title)}: страница {page}</title>"
+        f"<style>{PAGE_STYLE}</style></head><body>",
+        _navigation(page, last),
+    ]
+    cards = 0
+    for number, (key, values) in enumerate(notes, first_number):
+        model = _COMPILED[key]
+        parts.append(
+            f'<div class="note"><h2>#{number} {html.escape(strip_html(values[0]))}'
+            f" ({html.escape(model.spec.name)})</h2>"
+        )
+        frame = model.frame
+        for name, question, answer in model.cards(values):
+            cards += 1
+            parts.append(
+                f'<div class="card-row"><h3>{html.escape(name)}</h3>'
+                f"{frame(question)}{frame(answer)}</div>"
+            )
+        parts.append("</div>")
+    parts.append(_navigation(page, last))
+    parts.append("</body></html>")
+    path = Path(output_dir) / page_name(page)
+    path.write_text("".join(parts), encoding="utf-8")
+    return len(notes), cards
+
+
+def _iter_pages(notes, model_keys, page_size):
+    """(номер страницы, номер первой заметки, заметки, последняя ли)"""
+    page = []
+    pages = 0
+    first_number = 1
+    for note in notes:
+        if len(page) == page_size:
+            pages += 1
+            yield pages, first_number, page, False
+            first_number += len(page)
+            page = []
+        page.append((model_keys[id(note.model)], note.fields))
+    if page or not pages:
+        yield pages + 1, first_number, page, True
+
+
+def write_index(output_dir, title, pages, page_size, notes, cards):
+    items = "".join(
+        f'<li><a href="{page_name(page)}">Страница {page}</a> '
+        f"(заметки {(page - 1) * page_size + 1}–{min(page * page_size, notes)})</li>"
+        for page in range(1, pages + 1)
+    )
+    path = Path(output_dir) / "index.html"
+    path.write_text(
+        f'<!DOCTYPE html><html><head><meta charset="utf-8">'
+        f"<title>{html.escape(title)}</title><style>{PAGE_STYLE}</style></head>"
+        f"<body><h1>{html.escape(title)}</h1>"
+        f"<p>Заметок: {notes}, карточек: {cards}, страниц: {pages}</p>"
+        f"<ol>{items}</ol></body></html>",
+        encoding="utf-8",
+    )
+    return path
+
+
+def write_preview(
+    output_dir,
+    models,
+    notes,
+    title="Колода",
+    page_size=DEFAULT_PAGE_SIZE,
+    workers=None,
+    media=None,
+):
+    """
+    Пишет предпросмотр заметок notes (genanki.Note моделей models) в
+    output_dir: index.html, страницы page-NNNNN.html, общие CSS и JS и
+    медиафайлы media (имя -> bytes, например SharedAssets.files).
+    """
+    workers = workers or os.cpu_count() or 1
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # Страницы и общие файлы прошлого предпросмотра
+    for pattern in ("page-*.html", "preview-*.css", "preview-*.js"):
+        for old_file in output_dir.glob(pattern):
+            old_file.unlink()
+
+    files = {}
+    specs = [model_spec(model, files) for model in models]
+    for name, content in files.items():
+        (output_dir / name).write_text(content, encoding="utf-8")
+    for name, content in (media or {}).items():
+        (output_dir / name).write_bytes(content)
+    model_keys = {id(model): spec.key for model, spec in zip(models, specs)}
+
+    pages = _iter_pages(notes, model_keys, page_size)
+    total_notes = total_cards = page_count = 0
+    if workers == 1:
+        _init_worker(specs)
+        for page, first_number, page_notes, last in pages:
+            note_count, card_count = render_page(
+                output_dir, title, page, first_number, page_notes, last
+            )
+            total_notes += note_count
+            total_cards += card_count
+            page_count = page
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(specs,)
+        ) as pool:
+            pending = []
+            for page, first_number, page_notes, last in pages:
+                pending.append(
+                    pool.submit(
+                        render_page,
+                        output_dir,
+                        title,
+                        page,
+                        first_number,
+                        page_notes,
+                        last,
+                    )
+                )
+                page_count = page
+                # Не больше двух страниц на процесс в памяти одновременно
+                if len(pending) >= workers * 2:
+                    note_count, card_count = pending.pop(0).result()
+                    total_notes += note_count
+                    total_cards += card_count
+            for future in pending:
+                note_count, card_count = future.result()
+                total_notes += note_count
+                total_cards += card_count
+
+    index = write_index(
+        output_dir, title, page_count, page_size, total_notes, total_cards
+    )
+    return PreviewResult(total_notes, total_cards, page_count, index)
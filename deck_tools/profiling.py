@@ -0,0 +1,136 @@
+"""
+Замеры фаз сборки для --profile и бенчмарков.
+
+PhaseProfile суммирует время и число строк по фазам. Когда профилирование
+выключено, используется NULL_PROFILE: его timed_iter и timed_call
+возвращают объекты без обёрток, поэтому горячий цикл ничего не платит.
+"""
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+TRACEMALLOC_TOP = 30
+
+
+class PhaseProfile:
+    enabled = True
+
+    def __init__(self):
+        self.phases = {}
+        self.started = time.perf_counter()
+
+    def add(self, name, seconds, rows=0):
+        phase = self.phases.setdefault(name, {"seconds": 0.0, "rows": 0})
+        phase["seconds"] += seconds
+        phase["rows"] += rows
+
+    @contextmanager
+    def phase(self, name, rows=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, rows)
+
+    def timed_iter(self, name, iterable):
+        """Итератор, время получения каждого элемента которого идёт в фазу name"""
+        iterator = iter(iterable)
+        phase = self.phases.setdefault(name, {"seconds": 0.0, "rows": 0})
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                phase["seconds"] += clock() - start
+                return
+            phase["seconds"] += clock() - start
+            phase["rows"] += 1
+            yield item
+
+    def timed_call(self, name, func):
+        """Обёртка func, время и число вызовов которой идут в фазу name"""
+        phase = self.phases.setdefault(name, {"seconds": 0.0, "rows": 0})
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                phase["seconds"] += clock() - start
+                phase["rows"] += 1
+
+        return timed
+
+    def report(self):
+        phases = {}
+        for name, data in self.phases.items():
+            entry = dict(data)
+            entry["seconds"] = round(data["seconds"], 4)
+            if data["rows"] and data["seconds"] > 0:
+                entry["rows_per_s"] = round(data["rows"] / data["seconds"], 1)
+            phases[name] = entry
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "phases": phases,
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+class NullProfile:
+    enabled = False
+
+    def add(self, name, seconds, rows=0):
+        pass
+
+    def phase(self, name, rows=0):
+        return nullcontext()
+
+    def timed_iter(self, name, iterable):
+        return iterable
+
+    def timed_call(self, name, func):
+        return func
+
+
+NULL_PROFILE = NullProfile()
+
+
+def create_profile(enabled):
+    return PhaseProfile() if enabled else NULL_PROFILE
+
+
+@contextmanager
+def capture(cprofile_path=None, tracemalloc_path=None):
+    """
+    Снимает профиль cProfile (файл для pstats/snakeviz) и/или статистику
+    выделений памяти tracemalloc (текстовый отчёт) на время блока.
+    """
+    profiler = None
+    if tracemalloc_path:
+        import tracemalloc
+
+        tracemalloc.start()
+    if cprofile_path:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        if tracemalloc_path:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(tracemalloc_path, "w", encoding="utf-8") as f:
+                f.write(f"current: {current} bytes\npeak: {peak} bytes\n\n")
+                for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]:
+                    f.write(f"{stat}\n")
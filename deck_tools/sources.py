@@ -0,0 +1,357 @@
+"""
+Потоковые источники записей для генераторов: CSV, JSONL, таблица или
+запрос SQLite и Parquet (если установлен pyarrow).
+
+Источник читает данные блоками и выдаёт значения только нужных колонок в
+порядке полей записи, без промежуточной копии всего файла. Колонки
+источника сопоставляются с полями записи по имени колонки CSV (word), по
+имени поля модели Anki (Word, FIELD_* из word/constants.py) или явно через
+--map ПОЛЕ=КОЛОНКА.
+"""
+import csv
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from pathlib import Path
+
+from .streaming import count_csv_rows
+
+DEFAULT_CHUNK_ROWS = 10000
+
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+FORMAT_SQLITE = "sqlite"
+FORMAT_PARQUET = "parquet"
+FORMATS = (FORMAT_CSV, FORMAT_JSONL, FORMAT_SQLITE, FORMAT_PARQUET)
+
+EXTENSIONS = {
+    ".csv": FORMAT_CSV,
+    ".jsonl": FORMAT_JSONL,
+    ".ndjson": FORMAT_JSONL,
+    ".db": FORMAT_SQLITE,
+    ".sqlite": FORMAT_SQLITE,
+    ".sqlite3": FORMAT_SQLITE,
+    ".parquet": FORMAT_PARQUET,
+}
+
+# Что читать: файл, его формат (None - по расширению), таблица или запрос
+# SQLite и явное сопоставление ((поле, колонка), ...)
+SourceSpec = namedtuple(
+    "SourceSpec", "path format table query mapping", defaults=(None, None, None, ())
+)
+
+# Поля записи генератора: имена (колонки CSV), обязательные поля и
+# имена полей модели Anki для каждого из них
+SourceFields = namedtuple("SourceFields", "names required aliases")
+
+
+def parse_mapping(items):
+    """['Word=headword', ...] -> (('Word', 'headword'), ...)"""
+    mapping = []
+    for item in items or ():
+        field, sep, column = item.partition("=")
+        if not sep or not field.strip() or not column.strip():
+            raise ValueError(f"ожидалось ПОЛЕ=КОЛОНКА: {item}")
+        mapping.append((field.strip(), column.strip()))
+    return tuple(mapping)
+
+
+def source_options(spec):
+    """
+    Опции манифеста сборки с параметрами источника. Для CSV без настроек
+    пусто, чтобы манифесты прежних сборок остались актуальными.
+    """
+    if not (spec.format or spec.table or spec.query or spec.mapping):
+        return {}
+    return {
+        "source": {
+            "format": spec.format,
+            "table": spec.table,
+            "query": spec.query,
+            "map": dict(spec.mapping),
+        }
+    }
+
+
+def _explicit_columns(fields, mapping):
+    """Словарь поле -> колонка из --map; неизвестные поля - ошибка"""
+    known = set(fields.names) | set(fields.aliases.values())
+    unknown = [field for field, _ in mapping if field not in known]
+    if unknown:
+        raise ValueError(f"неизвестные поля в --map: {', '.join(unknown)}")
+    return dict(mapping)
+
+
+def resolve_columns(available, fields, mapping=()):
+    """
+    Колонка источника для каждого поля fields.names (None, если её нет).
+    Без явного сопоставления колонка ищется по имени поля, затем по имени
+    поля Anki, без учёта регистра.
+    """
+    aliases = fields.aliases
+    explicit = _explicit_columns(fields, mapping)
+    by_lower = {}
+    for name in available:
+        by_lower.setdefault(name.lower(), name)
+
+    columns = []
+    missing = []
+    for name in fields.names:
+        alias = aliases.get(name)
+        column = explicit.get(name) or explicit.get(alias)
+        if column is not None:
+            if column not in available:
+                raise ValueError(f"в источнике нет колонки {column}")
+        else:
+            for candidate in (name, alias):
+                if candidate and candidate.lower() in by_lower:
+                    column = by_lower[candidate.lower()]
+                    break
+        if column is None and name in fields.required:
+            missing.append(alias or name)
+        columns.append(column)
+    if missing:
+        raise ValueError(
+            f"в источнике нет колонок: {', '.join(missing)} "
+            f"(есть: {', '.join(available)}; сопоставьте их через --map)"
+        )
+    return columns
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = str(value)
+    return value.strip()
+
+
+class Source(ABC):
+    """
+    Источник записей. position - номер текущей строки файла (CSV, JSONL) или
+    записи (SQLite, Parquet) для сообщений об ошибках.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.path = Path(spec.path)
+        self.position = 0
+
+    @abstractmethod
+    def columns(self):
+        """Имена колонок источника"""
+
+    @abstractmethod
+    def iter_rows(self, columns, required):
+        """Списки строковых значений columns (None - колонки нет)"""
+
+    def count(self):
+        return sum(1 for _ in self.iter_rows([], []))
+
+    def records(self, fields):
+        """Значения полей fields.names для каждой записи, без пробелов по краям"""
+        columns = resolve_columns(self.columns(), fields, self.spec.mapping)
+        required = [name in fields.required for name in fields.names]
+        return self.iter_rows(columns, required)
+
+
+class CsvSource(Source):
+    def columns(self):
+        with open(self.path, "r", encoding="utf-8", newline="") as file:
+            return next(csv.reader(file), [])
+
+    def iter_rows(self, columns, required):
+        with open(self.path, "r", encoding="utf-8", newline="") as file:
+            reader = csv.reader(file)
+            header = next(reader, [])
+            indexes = [header.index(c) if c is not None else None for c in columns]
+            width = max((i + 1 for i in indexes if i is not None), default=0)
+            needed = [i for i, flag in zip(indexes, required) if flag and i is not None]
+            required_width = max(needed, default=-1) + 1
+            complete = None not in indexes
+            for row in reader:
+                self.position = reader.line_num
+                if len(row) < width:
+                    if not row:
+                        continue
+                    if len(row) < required_width:
+                        raise ValueError(
+                            f"ожидалось {len(header)} колонок, найдено {len(row)}"
+                        )
+                    row += [""] * (width - len(row))
+                if complete:
+                    yield [row[i].strip() for i in indexes]
+                else:
+                    yield [row[i].strip() if i is not None else "" for i in indexes]
+
+    def count(self):
+        return count_csv_rows(self.path)
+
+
+class JsonlSource(Source):
+    """
+    Один JSON объект на строку; пустые строки пропускаются. Набор ключей у
+    объектов может различаться, поэтому колонки - это имена полей записи, а
+    ищутся они в каждом объекте (без учёта регистра, как в resolve_columns).
+    """
+
+    def columns(self):
+        return []
+
+    def records(self, fields):
+        explicit = _explicit_columns(fields, self.spec.mapping)
+        columns = []
+        for name in fields.names:
+            alias = fields.aliases.get(name)
+            column = explicit.get(name) or explicit.get(alias)
+            keys = [column] if column is not None else [name, alias]
+            columns.append(
+                (tuple(key.lower() for key in keys if key), column or alias or name)
+            )
+        required = [name in fields.required for name in fields.names]
+        return self.iter_rows(columns, required)
+
+    def iter_rows(self, columns, required):
+        """columns - пары (ключи поля в нижнем регистре, имя для ошибок)"""
+        with open(self.path, "r", encoding="utf-8") as file:
+            for self.position, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                record = {
+                    key.lower(): value for key, value in json.loads(line).items()
+                }
+                values = []
+                missing = []
+                for (keys, label), needed in zip(columns, required):
+                    for key in keys:
+                        if key in record:
+                            values.append(_text(record[key]))
+                            break
+                    else:
+                        if needed:
+                            missing.append(label)
+                        values.append("")
+                if missing:
+                    raise ValueError(f"нет обязательных полей: {', '.join(missing)}")
+                yield values
+
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqliteSource(Source):
+    """Таблица (--table) или запрос (--query) базы SQLite, открытой только для чтения"""
+
+    def connect(self):
+        return sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+
+    def query(self, conn):
+        if self.spec.query:
+            return self.spec.query
+        table = self.spec.table
+        if table is None:
+            tables = [
+                name
+                for (name,) in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+                    "AND name NOT LIKE 'sqlite_%'"
+                )
+            ]
+            if len(tables) != 1:
+                raise ValueError(
+                    f"в базе {len(tables)} таблиц, укажите --table или --query"
+                )
+            (table,) = tables
+        return f"SELECT * FROM {_quote_identifier(table)}"
+
+    def columns(self):
+        conn = self.connect()
+        try:
+            cursor = conn.execute(f"SELECT * FROM ({self.query(conn)}) LIMIT 0")
+            return [description[0] for description in cursor.description]
+        finally:
+            conn.close()
+
+    def iter_rows(self, columns, required):
+        select = ", ".join(
+            _quote_identifier(c) if c is not None else "''" for c in columns
+        )
+        conn = self.connect()
+        try:
+            cursor = conn.execute(f"SELECT {select or 1} FROM ({self.query(conn)})")
+            while True:
+                chunk = cursor.fetchmany(DEFAULT_CHUNK_ROWS)
+                if not chunk:
+                    break
+                for row in chunk:
+                    self.position += 1
+                    yield [_text(value) for value in row[: len(columns)]]
+        finally:
+            conn.close()
+
+    def count(self):
+        conn = self.connect()
+        try:
+            sql = f"SELECT COUNT(*) FROM ({self.query(conn)})"
+            return conn.execute(sql).fetchone()[0]
+        finally:
+            conn.close()
+
+
+class ParquetSource(Source):
+    """Читается пакетами строк и только нужными колонками; нужен pyarrow"""
+
+    def open(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError(
+                "для чтения Parquet нужен pyarrow: pip install pyarrow"
+            ) from None
+        return pq.ParquetFile(self.path)
+
+    def columns(self):
+        return list(self.open().schema_arrow.names)
+
+    def iter_rows(self, columns, required):
+        present = list(dict.fromkeys(c for c in columns if c is not None))
+        for batch in self.open().iter_batches(
+            batch_size=DEFAULT_CHUNK_ROWS, columns=present
+        ):
+            data = batch.to_pydict()
+            empty = [None] * batch.num_rows
+            for row in zip(*(data[c] if c is not None else empty for c in columns)):
+                self.position += 1
+                yield [_text(value) for value in row]
+
+    def count(self):
+        return self.open().metadata.num_rows
+
+
+SOURCES = {
+    FORMAT_CSV: CsvSource,
+    FORMAT_JSONL: JsonlSource,
+    FORMAT_SQLITE: SqliteSource,
+    FORMAT_PARQUET: ParquetSource,
+}
+
+
+def source_format(spec):
+    if spec.format:
+        return spec.format
+    suffix = Path(spec.path).suffix.lower()
+    if suffix not in EXTENSIONS:
+        raise ValueError(
+            f"неизвестный формат файла {spec.path}, укажите --format "
+            f"({', '.join(FORMATS)})"
+        )
+    return EXTENSIONS[suffix]
+
+
+def open_source(spec):
+    """Источник для SourceSpec или пути к файлу"""
+    if not isinstance(spec, SourceSpec):
+        spec = SourceSpec(spec)
+    return SOURCES[source_format(spec)](spec)
@@ -0,0 +1,121 @@
+"""
+Сводка по CSV колоды или готовому .apkg без сборки (python -m deck_tools stats).
+
+Для CSV - число строк, заполненность колонок и повторы ключа схемы
+words.csv или verbs.csv; для .apkg - заметки по моделям, карточки и
+медиафайлы. genanki и генераторы не импортируются.
+"""
+import csv
+import json
+import sys
+from collections import Counter, namedtuple
+from pathlib import Path
+
+from .validation import SCHEMAS
+
+CsvStats = namedtuple("CsvStats", "path schema rows filled duplicates")
+ApkgStats = namedtuple("ApkgStats", "path models cards media media_bytes")
+
+
+def detect_schema(header):
+    """Имя схемы, все обязательные колонки которой есть в заголовке"""
+    for name, schema in SCHEMAS.items():
+        if all(column in header for column in schema.required):
+            return name
+    return None
+
+
+def csv_stats(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        schema = detect_schema(header)
+        key = header.index(SCHEMAS[schema].key) if schema else None
+        filled = Counter()
+        keys = Counter()
+        rows = 0
+        for row in reader:
+            if not any(value.strip() for value in row):
+                continue
+            rows += 1
+            for column, value in zip(header, row):
+                if value.strip():
+                    filled[column] += 1
+            if key is not None and key < len(row) and row[key].strip():
+                keys[row[key].strip()] += 1
+    filled = {column: filled[column] for column in header}
+    duplicates = sum(count - 1 for count in keys.values())
+    return CsvStats(str(path), schema, rows, filled, duplicates)
+
+
+def model_names(conn):
+    """ID модели -> имя"""
+    (models_json,) = conn.execute("SELECT models FROM col").fetchone()
+    if models_json:
+        return {
+            int(model_id): model["name"]
+            for model_id, model in json.loads(models_json).items()
+        }
+    return dict(conn.execute("SELECT id, name FROM notetypes"))
+
+
+def apkg_stats(path):
+    """Сводка по .apkg; повреждённый пакет - ValueError"""
+    import sqlite3
+    import tempfile
+    import zipfile
+
+    from .extract import open_collection
+
+    try:
+        with zipfile.ZipFile(path) as apkg:
+            media = {}
+            if "media" in apkg.namelist():
+                media = json.loads(apkg.read("media") or "{}")
+            media_bytes = sum(apkg.getinfo(index).file_size for index in media)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            conn = sqlite3.connect(str(open_collection(path, tmp_dir)))
+            try:
+                names = model_names(conn)
+                models = [
+                    (names.get(model_id, str(model_id)), count)
+                    for model_id, count in conn.execute(
+                        "SELECT mid, count(*) FROM notes GROUP BY mid ORDER BY mid"
+                    )
+                ]
+                (cards,) = conn.execute("SELECT count(*) FROM cards").fetchone()
+            finally:
+                conn.close()
+    except (zipfile.BadZipFile, sqlite3.Error, KeyError) as e:
+        raise ValueError(f"повреждённый пакет: {e}") from None
+    return ApkgStats(str(path), models, cards, len(media), media_bytes)
+
+
+def print_stats(stats, file=None):
+    file = file or sys.stdout
+    if isinstance(stats, ApkgStats):
+        notes = sum(count for _, count in stats.models)
+        print(f"{stats.path}: заметок {notes}, карточек {stats.cards}", file=file)
+        for name, count in stats.models:
+            print(f"  {name}: {count}", file=file)
+        print(
+            f"Медиафайлов: {stats.media}, {stats.media_bytes / 1024:.1f} КБ",
+            file=file,
+        )
+        return
+    schema = f" ({stats.schema})" if stats.schema else ""
+    print(f"{stats.path}{schema}: строк {stats.rows}", file=file)
+    for column, count in stats.filled.items():
+        print(f"  {column}: заполнено {count}, пусто {stats.rows - count}", file=file)
+    if stats.schema:
+        print(
+            f"Повторов ключа {SCHEMAS[stats.schema].key}: {stats.duplicates}",
+            file=file,
+        )
+
+
+def file_stats(path):
+    """Сводка по файлу: .apkg или CSV"""
+    if Path(path).suffix.lower() == ".apkg":
+        return apkg_stats(path)
+    return csv_stats(path)
@@ -0,0 +1,22 @@
+"""
+Вспомогательные функции для потоковой обработки больших CSV файлов
+"""
+import csv
+import random
+from array import array
+
+
+def count_csv_rows(csv_file):
+    """Количество строк данных в CSV без заголовка (файл читается потоково)"""
+    with open(csv_file, "r", encoding="utf-8", newline="") as file:
+        return max(sum(1 for _ in csv.reader(file)) - 1, 0)
+
+
+def shuffled_positions(count):
+    """
+    Случайная перестановка позиций 0..count-1 в компактном массиве
+    (8 байт на строку вместо списка заметок).
+    """
+    positions = array("q", range(count))
+    random.shuffle(positions)
+    return positions
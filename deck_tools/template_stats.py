@@ -0,0 +1,16 @@
+"""
+Размер шаблонов моделей: сколько байт HTML/JS и CSS Anki разбирает при показе карточек
+"""
+
+
+def template_bytes(models):
+    """Суммарный размер qfmt/afmt и CSS моделей в байтах UTF-8"""
+    return sum(
+        len(model.css.encode("utf-8"))
+        + sum(
+            len(template[side].encode("utf-8"))
+            for template in model.templates
+            for side in ("qfmt", "afmt")
+        )
+        for model in models
+    )
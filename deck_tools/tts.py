@@ -0,0 +1,159 @@
+"""
+Озвучка слов локальным синтезатором речи при сборке колоды.
+
+Текст передаётся на stdin команды TTS (espeak-ng, piper или своя команда с
+подстановками {voice}, {output} и {text}), результат - WAV файл. Файлы
+кешируются в ``<cache>/<sha256[:32]>.wav`` по хешу команды, голоса и текста,
+поэтому повторная сборка не запускает синтезатор. Каждый синтез - отдельный
+процесс, они запускаются параллельно из пула потоков.
+"""
+import hashlib
+import os
+import re
+import shlex
+import threading
+from pathlib import Path
+
+ENGINE_COMMANDS = {
+    "espeak-ng": "espeak-ng -v {voice} --stdin -w {output}",
+    "piper": "piper --model {voice} --output_file {output}",
+}
+ENGINES = tuple(ENGINE_COMMANDS)
+# Голос по умолчанию; piper нужен путь к модели голоса .onnx
+DEFAULT_VOICES = {"espeak-ng": "en-us"}
+DEFAULT_TIMEOUT = 60
+
+_BRACKETS_RE = re.compile(r"\[[^\]]*\]")
+_SEPARATORS_RE = re.compile(r"\s*[/;|]\s*")
+
+
+class TtsError(Exception):
+    pass
+
+
+def speech_text(value):
+    """Текст для озвучки: без [транскрипций], варианты was/were через запятую"""
+    value = _BRACKETS_RE.sub(" ", value)
+    return " ".join(_SEPARATORS_RE.sub(", ", value).split())
+
+
+class TtsEngine:
+    """
+    Команда синтеза: command - шаблон командной строки с {voice}, {output} и
+    необязательным {text} (без оболочки, каждый аргумент отдельно).
+    """
+
+    def __init__(self, command, voice="", cache_dir=None, timeout=DEFAULT_TIMEOUT):
+        if "{output}" not in command:
+            raise ValueError(f"в команде TTS нет {{output}}: {command}")
+        self.command = command
+        self.voice = voice or ""
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.timeout = timeout
+
+    @classmethod
+    def from_args(cls, engine, command, voice, cache_dir):
+        """Движок по параметрам командной строки или None, если TTS не включён"""
+        if not engine and not command:
+            return None
+        if not command:
+            command = ENGINE_COMMANDS[engine]
+            voice = voice or DEFAULT_VOICES.get(engine)
+            if not voice:
+                raise ValueError(f"для {engine} нужен --tts-voice")
+        return cls(command, voice, cache_dir)
+
+    def options(self):
+        """Опции манифеста сборки"""
+        return {"tts": [self.command, self.voice]}
+
+    def check(self):
+        """Проверяет, что программа команды установлена"""
+        import shutil
+
+        program = shlex.split(self.command)[0]
+        if shutil.which(program) is None:
+            raise TtsError(f"команда TTS не найдена: {program}")
+
+    def key(self, text):
+        data = "\x1f".join((self.command, self.voice, text)).encode("utf-8")
+        return hashlib.sha256(data).hexdigest()[:32]
+
+    def cache_path(self, text):
+        return self.cache_dir / f"{self.key(text)}.wav"
+
+    def synthesize(self, text, path):
+        """Озвучивает text в WAV файл path"""
+        import subprocess
+
+        tmp_path = path.with_name(f"{path.stem}.{threading.get_ident()}.tmp.wav")
+        args = [
+            arg.format(voice=self.voice, output=tmp_path, text=text)
+            for arg in shlex.split(self.command)
+        ]
+        try:
+            result = subprocess.run(
+                args,
+                input=text.encode("utf-8"),
+                capture_output=True,
+                timeout=self.timeout,
+            )
+        except FileNotFoundError:
+            raise TtsError(f"команда TTS не найдена: {args[0]}") from None
+        except subprocess.TimeoutExpired:
+            tmp_path.unlink(missing_ok=True)
+            raise TtsError(f"TTS не ответил за {self.timeout} с") from None
+        if result.returncode != 0 or not tmp_path.exists():
+            tmp_path.unlink(missing_ok=True)
+            stderr = result.stderr.decode("utf-8", "replace").strip()
+            raise TtsError(f"код {result.returncode}: {stderr[-200:]}")
+        if tmp_path.stat().st_size == 0:
+            tmp_path.unlink()
+            raise TtsError("пустой аудиофайл")
+        tmp_path.replace(path)
+        return path
+
+
+def generate_audio(texts, engine, workers=None):
+    """
+    Возвращает (files, errors): files - текст -> путь к WAV в кеше, errors -
+    текст -> ошибка. Синтезируются только тексты, которых нет в кеше. Если
+    программы TTS нет, сразу выбрасывает TtsError.
+    """
+    workers = workers or os.cpu_count() or 1
+    files = {}
+    errors = {}
+    missing = []
+    for text in dict.fromkeys(texts):
+        if not text:
+            continue
+        path = engine.cache_path(text)
+        if path.exists():
+            files[text] = path
+        else:
+            missing.append(text)
+
+    if missing:
+        from concurrent.futures import ThreadPoolExecutor
+
+        engine.check()
+        engine.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        def synthesize(text):
+            try:
+                return text, engine.synthesize(text, engine.cache_path(text)), None
+            except TtsError as e:
+                return text, None, str(e)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for text, path, error in pool.map(synthesize, missing):
+                if error is None:
+                    files[text] = path
+                else:
+                    errors[text] = error
+    return files, errors
+
+
+def media_name(path):
+    """Имя медиафайла озвучки в колоде"""
+    return f"tts-{Path(path).stem[:16]}.wav"
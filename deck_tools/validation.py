@@ -0,0 +1,373 @@
+"""
+Проверка CSV за один проход с отчётом обо всех проблемах.
+
+Файл читается построчно и режется на блоки по границам записей CSV (с
+учётом кавычек, внутри которых могут быть переводы строк). Блоки
+проверяются параллельно в пуле процессов, дубликаты ключей ищутся по
+всему файлу после проверки блоков. Каждая проблема записывается с номером
+строки файла и колонкой.
+"""
+import csv
+import json
+import os
+import re
+import sys
+from collections import Counter, namedtuple
+from operator import itemgetter
+
+DEFAULT_CHUNK_LINES = 50000
+
+ERROR = "error"
+WARNING = "warning"
+
+# Символы, ломающие строковые литералы '...' в JS шаблонов и атрибуты onclick="..."
+JS_LITERAL_BREAKERS = ("'", '"', "\\", "\n", "\r")
+
+Issue = namedtuple("Issue", "row column code severity message value")
+
+CsvSchema = namedtuple(
+    "CsvSchema",
+    [
+        "columns",  # все колонки CSV (необязательные могут отсутствовать)
+        "required",  # колонки, которые не должны быть пустыми
+        "key",  # колонка, значения которой должны быть уникальными (GUID)
+        "transcriptions",  # колонки с транскрипцией в [квадратных скобках]
+        "urls",  # колонки с http(s) URL
+        "js_literals",  # колонки, подставляемые в JS строки шаблонов
+    ],
+)
+
+# Схемы CSV генераторов (columns должны совпадать с WordRecord и VerbRecord,
+# required - с SOURCE_FIELDS). Они здесь, а не в генераторах, чтобы
+# python -m deck_tools validate не импортировал генераторы. js_literals -
+# поля, которые собираемые шаблоны подставляют в '...' (озвучка); ответы
+# читаются из JSON поля Accepted, ключи ответов строятся из NoteId, а
+# card_example_back.html с '{{ExampleEn}}' не входит в TEMPLATE_FILES
+SCHEMAS = {
+    "words": CsvSchema(
+        columns=(
+            "word",
+            "transcription",
+            "translation",
+            "example_en",
+            "example_ru",
+            "audio_url",
+        ),
+        required=("word", "transcription", "translation", "example_en"),
+        key="word",
+        transcriptions=("transcription",),
+        urls=("audio_url",),
+        js_literals=("audio_url",),
+    ),
+    "verbs": CsvSchema(
+        columns=(
+            "infinitive",
+            "past_simple",
+            "past_participle",
+            "transcription_inf",
+            "transcription_ps",
+            "transcription_pp",
+            "translation",
+            "example_en",
+            "example_ru",
+        ),
+        required=(
+            "infinitive",
+            "past_simple",
+            "past_participle",
+            "transcription_inf",
+            "transcription_ps",
+            "transcription_pp",
+            "translation",
+            "example_en",
+        ),
+        key="infinitive",
+        transcriptions=("transcription_inf", "transcription_ps", "transcription_pp"),
+        urls=(),
+        js_literals=("infinitive", "past_simple", "past_participle"),
+    ),
+}
+
+
+TRANSCRIPTION_RE = re.compile(r"\[[^\[\]]*\]")
+URL_RE = re.compile(r"https?://[^\s/?#]+\S*", re.IGNORECASE)
+# Пробел или табуляция на границе значений строки, склеенной через \x1f
+EDGE_SPACES = (" \x1f", "\x1f ", "\t\x1f", "\x1f\t")
+
+
+def _has_js_breaker(text):
+    for char in JS_LITERAL_BREAKERS:
+        if char in text:
+            return True
+    return False
+
+
+def _has_edge_space(joined):
+    if joined[:1].isspace() or joined[-1:].isspace():
+        return True
+    for pair in EDGE_SPACES:
+        if pair in joined:
+            return True
+    return False
+
+
+def _getter(positions):
+    """Функция, возвращающая кортеж значений колонок (itemgetter всегда даёт кортеж)"""
+    indexes = [i for _, i in positions]
+    if not indexes:
+        return lambda values: ()
+    if len(indexes) == 1:
+        (i,) = indexes
+        return lambda values: (values[i],)
+    return itemgetter(*indexes)
+
+
+def check_chunk(schema, header, start_line, lines):
+    """
+    Проверяет блок строк файла, начинающийся со строки start_line.
+    Возвращает (число записей, проблемы, [(ключ, строка)]).
+
+    Для каждой записи сначала выполняются быстрые проверки всей строки
+    (поиск подстрок в склеенных значениях), и только при совпадении
+    ищутся конкретные колонки - на корректных данных это почти бесплатно.
+    """
+    index = {name: i for i, name in enumerate(header)}
+    width = len(header)
+
+    def positions(names):
+        return [(name, index[name]) for name in names if name in index]
+
+    required = positions(schema.required)
+    transcriptions = positions(schema.transcriptions)
+    urls = positions(schema.urls)
+    js_literals = positions(schema.js_literals)
+    get_required = _getter(required)
+    get_js_literals = _getter(js_literals)
+    key_index = index.get(schema.key)
+    padding = [""] * width
+
+    issues = []
+    keys = []
+    rows = 0
+    reader = csv.reader(lines)
+    previous_line = 0
+    for values in reader:
+        row = start_line + previous_line
+        previous_line = reader.line_num
+        if not values:
+            continue
+        rows += 1
+        if len(values) != width:
+            issues.append(
+                Issue(
+                    row,
+                    None,
+                    "column_count",
+                    ERROR,
+                    f"ожидалось {width} колонок, найдено {len(values)} "
+                    "(запятая в значении без кавычек?)",
+                    None,
+                )
+            )
+            values = (values + padding)[:width]
+
+        if _has_edge_space("\x1f".join(values)):
+            for i, value in enumerate(values):
+                if value != value.strip():
+                    issues.append(
+                        Issue(
+                            row, header[i], "whitespace", WARNING, "пробелы по краям", value
+                        )
+                    )
+            empty = True
+        else:
+            empty = not all(get_required(values))
+        if empty:
+            for name, i in required:
+                if not values[i].strip():
+                    issues.append(Issue(row, name, "empty", ERROR, "пустое значение", ""))
+
+        for name, i in transcriptions:
+            value = values[i].strip()
+            if value and not TRANSCRIPTION_RE.fullmatch(value):
+                issues.append(
+                    Issue(
+                        row,
+                        name,
+                        "transcription",
+                        WARNING,
+                        "транскрипция должна быть в одних [квадратных скобках]",
+                        value,
+                    )
+                )
+        for name, i in urls:
+            value = values[i].strip()
+            if value and not URL_RE.fullmatch(value):
+                issues.append(
+                    Issue(
+                        row, name, "audio_url", ERROR, "некорректный http(s) URL", value
+                    )
+                )
+        if _has_js_breaker("\x1f".join(get_js_literals(values))):
+            for name, i in js_literals:
+                value = values[i]
+                if _has_js_breaker(value):
+                    issues.append(
+                        Issue(
+                            row,
+                            name,
+                            "js_literal",
+                            ERROR,
+                            "кавычка, обратная косая черта или перевод строки "
+                            "ломают JS строку в шаблоне",
+                            value,
+                        )
+                    )
+        if key_index is not None:
+            key = values[key_index].strip()
+            if key:
+                keys.append((key, row))
+    return rows, issues, keys
+
+
+def iter_chunks(file, first_line, chunk_lines):
+    """
+    Блоки строк файла [(номер первой строки, строки)], которые режутся
+    только между записями CSV: строка с нечётным числом кавычек открывает
+    (или закрывает) значение, продолжающееся на следующей строке.
+    """
+    lines = []
+    start = first_line
+    line_number = first_line
+    in_quotes = False
+    for line in file:
+        lines.append(line)
+        line_number += 1
+        if line.count('"') % 2:
+            in_quotes = not in_quotes
+        if not in_quotes and len(lines) >= chunk_lines:
+            yield start, lines
+            lines = []
+            start = line_number
+    if lines:
+        yield start, lines
+
+
+def validate_csv(csv_file, schema, workers=None, chunk_lines=DEFAULT_CHUNK_LINES):
+    """Проверяет CSV и возвращает отчёт (словарь, готовый для JSON)"""
+    workers = workers or os.cpu_count() or 1
+    issues = []
+    rows = 0
+    first_seen = {}
+
+    with open(csv_file, "r", encoding="utf-8", newline="") as file:
+        header_line = file.readline()
+        header = next(csv.reader([header_line]), [])
+        missing = [name for name in schema.required if name not in header]
+        if missing:
+            issues.append(
+                Issue(
+                    1,
+                    None,
+                    "header",
+                    ERROR,
+                    f"нет колонок: {', '.join(missing)}",
+                    ",".join(header),
+                )
+            )
+            return build_report(csv_file, rows, issues)
+
+        chunks = iter_chunks(file, 2, chunk_lines)
+        if workers == 1:
+            for chunk in chunks:
+                result = check_chunk(schema, header, *chunk)
+                rows += _merge(result, first_seen, schema, issues)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = []
+                for chunk in chunks:
+                    pending.append(pool.submit(check_chunk, schema, header, *chunk))
+                    # Не больше двух блоков на процесс в памяти одновременно
+                    if len(pending) >= workers * 2:
+                        result = pending.pop(0).result()
+                        rows += _merge(result, first_seen, schema, issues)
+                for future in pending:
+                    rows += _merge(future.result(), first_seen, schema, issues)
+
+    return build_report(csv_file, rows, issues)
+
+
+def _merge(result, first_seen, schema, issues):
+    chunk_rows, chunk_issues, keys = result
+    issues.extend(chunk_issues)
+    _collect_duplicates(keys, first_seen, schema.key, issues)
+    return chunk_rows
+
+
+def _collect_duplicates(keys, first_seen, column, issues):
+    for key, row in keys:
+        first_row = first_seen.setdefault(key, row)
+        if first_row != row:
+            issues.append(
+                Issue(
+                    row,
+                    column,
+                    "duplicate",
+                    ERROR,
+                    f"значение уже встречалось в строке {first_row}",
+                    key,
+                )
+            )
+
+
+def build_report(csv_file, rows, issues):
+    issues.sort(key=lambda issue: (issue.row, issue.column or ""))
+    severities = Counter(issue.severity for issue in issues)
+    return {
+        "file": str(csv_file),
+        "rows": rows,
+        "errors": severities[ERROR],
+        "warnings": severities[WARNING],
+        "by_code": dict(Counter(issue.code for issue in issues)),
+        "issues": [issue._asdict() for issue in issues],
+    }
+
+
+def print_summary(report, file=None, limit=20):
+    """Краткая сводка отчёта для человека"""
+    print(
+        f"{report['file']}: {report['rows']} строк, ошибок: {report['errors']}, "
+        f"предупреждений: {report['warnings']}",
+        file=file,
+    )
+    for issue in report["issues"][:limit]:
+        column = f" [{issue['column']}]" if issue["column"] else ""
+        print(
+            f"  строка {issue['row']}{column}: {issue['code']}: {issue['message']}",
+            file=file,
+        )
+    if len(report["issues"]) > limit:
+        print(f"  ... и ещё {len(report['issues']) - limit}", file=file)
+
+
+def run_validation(csv_file, schema, report_path=None, workers=None):
+    """
+    Проверяет CSV, пишет JSON отчёт в report_path (или в stdout) и сводку
+    в stderr. Возвращает код выхода: 1, если найдены ошибки, 2, если CSV
+    или отчёт не удалось прочитать или записать.
+    """
+    try:
+        report = validate_csv(csv_file, schema, workers=workers)
+        if report_path:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+    if not report_path:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    print_summary(report, file=sys.stderr)
+    return 1 if report["errors"] else 0
@@ -0,0 +1,81 @@
+"""
+Режим --watch: пересборка колоды при изменении CSV или шаблонов.
+
+Изменения определяются опросом размера и mtime файлов (без зависимостей
+вроде inotify). Процесс не перезапускается, поэтому genanki уже импортирован,
+а FileCache держит в памяти прочитанные шаблоны и разобранные строки CSV
+и перечитывает только изменившиеся файлы.
+"""
+import time
+from pathlib import Path
+
+DEFAULT_INTERVAL = 0.2
+
+
+def _stat_key(path):
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+class FileCache:
+    """
+    Результаты load(path), которые пересчитываются только после изменения
+    файла. С args вызывается load(*args) - например, для источника с
+    таблицей SQLite и сопоставлением колонок (args должны быть хешируемыми).
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, path, load, *args):
+        key = (str(path), load, args)
+        stat = _stat_key(path)
+        entry = self.entries.get(key)
+        if entry is not None and stat is not None and entry[0] == stat:
+            return entry[1]
+        value = load(*args) if args else load(path)
+        self.entries[key] = (stat, value)
+        return value
+
+
+def snapshot(paths):
+    return {str(path): _stat_key(path) for path in paths}
+
+
+def watch(paths, rebuild, interval=DEFAULT_INTERVAL):
+    """
+    Опрашивает paths каждые interval секунд и вызывает rebuild(changed)
+    со списком изменившихся файлов. Ошибки сборки (в том числе sys.exit
+    из загрузчиков CSV) выводятся, и наблюдение продолжается. Ctrl+C
+    завершает работу.
+    """
+    paths = [str(path) for path in paths]
+    print(f"Наблюдение за {len(paths)} файлами, Ctrl+C для выхода...")
+    previous = snapshot(paths)
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot(paths)
+            if current == previous:
+                continue
+            if None in current.values():
+                # Редактор сохраняет файл через переименование - ждём появления
+                continue
+            changed = [path for path in paths if current[path] != previous[path]]
+            previous = current
+            print(f"Изменены: {', '.join(changed)}")
+            start = time.perf_counter()
+            try:
+                rebuild(changed)
+            except SystemExit:
+                print("Сборка не удалась, ждём следующего изменения.")
+                continue
+            except Exception as e:
+                print(f"Ошибка сборки: {e}")
+                continue
+            print(f"Пересборка заняла {(time.perf_counter() - start) * 1000:.0f} мс")
+    except KeyboardInterrupt:
+        print()
@@ -1,90 +1,116 @@
 #!/usr/bin/env python3
+# genanki is imported inside the build functions rather than at module load,
+# so --help, --validate and the non-build python -m deck_tools commands start
+# quickly.
 import argparse
-import csv
-import genanki
-import random
 import sys
+from collections import namedtuple
+from operator import attrgetter
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-def create_tts_button(text):
-    js_code = f"""
-    var utterance = new SpeechSynthesisUtterance('{text}');
-    utterance.lang = 'en-US';
-    utterance.rate = 0.8;
-    utterance.pitch = 1.0;
-    var voices = speechSynthesis.getVoices();
-    var americanVoices = voices.filter(voice =>
-        voice.lang === 'en-US' && (
-            voice.name.includes('Google US English') ||
-            voice.name.includes('Microsoft David') ||
-            voice.name.includes('Microsoft Mark') ||
-            voice.name.includes('Microsoft Zira') ||
-            voice.name.includes('Alex') ||
-            voice.name.includes('Samantha') ||
-            voice.name.includes('American') ||
-            (voice.name.includes('English') && voice.name.includes('United States'))
-        )
-    );
-    if (americanVoices.length === 0) {{
-        americanVoices = voices.filter(voice => voice.lang === 'en-US');
-    }}
-    if (americanVoices.length > 0) {{
-        utterance.voice = americanVoices[0];
-    }}
-    speechSynthesis.speak(utterance);
-    """
-    return f'<button onclick="{js_code}" style="background: #4CAF50; color: white; border: none; padding: 5px 10px; border-radius: 3px; cursor: pointer;">🔊</button>'
+from deck_tools.answers import ANSWER_STORE_JS, ANSWERS_JS, AcceptedAnswers
+from deck_tools.apkg import BACKEND_GENANKI, BACKENDS, PackageWriter, is_up_to_date
+from deck_tools.assets import SharedAssets
+from deck_tools.audio import default_cache_dir, sound_tag
+from deck_tools.delta import load_previous_build
+from deck_tools.identity import note_guid, note_key, stable_deck_id
+from deck_tools.manifest import hash_row, model_hashes, source_hashes
+from deck_tools.media import AUDIO_FORMATS, DEFAULT_BITRATE, MediaError, MediaStage
+from deck_tools.minify import minify_models
+from deck_tools.overlap import Exclusion
+from deck_tools.preview import DEFAULT_PAGE_SIZE, write_preview
+from deck_tools.profiling import NULL_PROFILE, capture, create_profile
+from deck_tools.sources import (
+    FORMAT_CSV,
+    FORMATS,
+    SourceFields,
+    SourceSpec,
+    open_source,
+    parse_mapping,
+    source_options,
+)
+from deck_tools.template_stats import template_bytes
+from deck_tools.tts import (
+    ENGINES,
+    TtsEngine,
+    TtsError,
+    generate_audio,
+    media_name,
+    speech_text,
+)
+from deck_tools.validation import SCHEMAS, run_validation
+from deck_tools.watch import DEFAULT_INTERVAL, FileCache, watch
 
+VerbRecord = namedtuple(
+    "VerbRecord",
+    "infinitive past_simple past_participle transcription_inf transcription_ps "
+    "transcription_pp translation example_en example_ru",
+)
 
-def create_check_function(correct_answer, input_id):
-    return f"""
-    function checkAnswer_{input_id}() {{
-        var input = document.getElementById('{input_id}');
-        var feedback = document.getElementById('feedback_{input_id}');
-        var userAnswer = input.value.trim().toLowerCase();
-        var correctAnswer = '{correct_answer}'.toLowerCase();
 
-        if (userAnswer === correctAnswer) {{
-            input.className = 'input-correct';
-            feedback.className = 'feedback correct';
-            feedback.innerHTML = '✓ Правильно!';
-            feedback.style.display = 'block';
-        }} else {{
-            input.className = 'input-incorrect';
-            feedback.className = 'feedback incorrect';
-            feedback.innerHTML = '✗ Неправильно. Правильный ответ: {correct_answer}';
-            feedback.style.display = 'block';
-        }}
-    }}
-    """
+MODEL_ID = 1607392324
+MODEL_NAME = "Irregular Verbs"
 
+# Prefix of the shared JS/CSS media files written with --shared-assets
+ASSETS_PREFIX = "irregular_verbs"
 
-def create_back_check_function(correct_answer, input_id):
-    return f"""
-    function checkAnswerBack_{input_id}() {{
-        var input = document.getElementById('{input_id}');
-        var feedback = document.getElementById('back_feedback_{input_id}');
-        var userAnswer = input.value.trim().toLowerCase();
-        var correctAnswer = '{correct_answer}'.toLowerCase();
+# Cache directory of --tts audio (inside XDG_CACHE_HOME)
+TTS_CACHE_NAME = "tts"
+# Cache directory of media digests and re-encoded audio (inside XDG_CACHE_HOME)
+MEDIA_CACHE_NAME = "media"
 
-        if (userAnswer === correctAnswer) {{
-            input.className = 'input-correct';
-            feedback.className = 'feedback correct';
-            feedback.innerHTML = '✓ Правильно!';
-            feedback.style.display = 'block';
-        }} else {{
-            input.className = 'input-incorrect';
-            feedback.className = 'feedback incorrect';
-            feedback.innerHTML = '✗ Неправильно. Правильный ответ: {correct_answer}';
-            feedback.style.display = 'block';
-        }}
-    }}
-    """
+# Five single-template models used by decks built before the shared model
+LEGACY_MODELS = [
+    (1607392319, "Irregular Verbs - Inf to PP"),
+    (1607392320, "Irregular Verbs - PS+PP to Inf"),
+    (1607392321, "Irregular Verbs - Inf+PS to PP"),
+    (1607392322, "Irregular Verbs - EN to RUS"),
+    (1607392323, "Irregular Verbs - RUS to EN"),
+]
+
+# CSV column that note GUIDs are derived from
+DEFAULT_GUID_FIELD = "infinitive"
+
+LAYOUT_SINGLE = "single"
+LAYOUT_LEGACY = "legacy"
+
+FIELDS = [
+    "Infinitive",
+    "PastSimple",
+    "PastParticiple",
+    "TransInf",
+    "TransPS",
+    "TransPP",
+    "Translation",
+    "ExampleEn",
+    "ExampleRu",
+    "Accepted",
+    "AudioInf",
+    "AudioPS",
+    "AudioPP",
+    "NoteId",
+]
+
+# [sound:...] fields with audio of each verb form pre-generated with --tts
+AUDIO_FIELDS = {
+    "Infinitive": "AudioInf",
+    "PastSimple": "AudioPS",
+    "PastParticiple": "AudioPP",
+}
 
+# Fields whose answers are checked on the back sides; their accepted answers
+# are precomputed into the Accepted field (see deck_tools/answers.py)
+ANSWER_FIELDS = [
+    ("Infinitive", "infinitive"),
+    ("PastSimple", "past_simple"),
+    ("PastParticiple", "past_participle"),
+    ("Translation", "translation"),
+]
+DEFAULT_ANSWERS = AcceptedAnswers(ANSWER_FIELDS)
 
-def create_card_models():
-    css = """
+CSS = """
     .card {
         font-family: Arial, sans-serif;
         font-size: 20px;
@@ -161,496 +187,949 @@ def create_card_models():
         border-color: #f44336 !important;
         background-color: #ffeaea;
     }
-    """
+"""
 
-    # Model 1: Infinitive → Past Participle (need Past Simple)
-    model1 = genanki.Model(
-        1607392319,
-        "Irregular Verbs - Inf to PP",
-        fields=[
-            {"name": "Infinitive"},
-            {"name": "PastSimple"},
-            {"name": "PastParticiple"},
-            {"name": "TransInf"},
-            {"name": "TransPS"},
-            {"name": "TransPP"},
-            {"name": "Translation"},
-            {"name": "ExampleEn"},
-            {"name": "ExampleRu"},
-        ],
-        templates=[
-            {
-                "name": "Card 1",
-                "qfmt": """
-                <div class="front">
-                    <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
-                + create_tts_button("{{Infinitive}}")
-                + """</div>
-                    <span> - </span>
-                    <input type="text" id="input1" placeholder="?" oninput="localStorage.setItem('userAnswer1_{{Infinitive}}_{{PastSimple}}', this.value)" onblur="localStorage.setItem('userAnswer1_{{Infinitive}}_{{PastSimple}}', this.value)">
-                    <span> - </span>
-                    <div class="verb-form">{{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
-                + create_tts_button("{{PastParticiple}}")
-                + """</div>
-                </div>
-                <script>
-                window.addEventListener('beforeunload', function() {
-                    var input = document.getElementById('input1');
-                    if (input) localStorage.setItem('userAnswer1', input.value);
-                });
-                </script>
-                """,
-                "afmt": """
-                <div class="front">
-                    <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
-                + create_tts_button("{{Infinitive}}")
-                + """</div>
-                    <span> - </span>
-                    <div class="verb-form"><strong>{{PastSimple}}</strong> <span class="transcription">{{TransPS}}</span> """
-                + create_tts_button("{{PastSimple}}")
-                + """</div>
-                    <span> - </span>
-                    <div class="verb-form">{{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
-                + create_tts_button("{{PastParticiple}}")
-                + """</div>
-                </div>
-                <div class="translation">{{Translation}}</div>
-                <div class="example">{{ExampleEn}}<br>{{ExampleRu}}</div>
-                <hr>
-                <div style="margin-top: 15px;">
-                    <div id="check_feedback1" class="feedback"></div>
-                </div>
-                <script>
-                (function() {
-                    var feedback = document.getElementById('check_feedback1');
-                    var userAnswer = localStorage.getItem('userAnswer1_{{Infinitive}}_{{PastSimple}}') || '';
-                    userAnswer = userAnswer.trim().toLowerCase();
-                    var correctAnswer = '{{PastSimple}}'.toLowerCase();
-
-                    if (userAnswer === correctAnswer) {
-                        feedback.className = 'feedback correct';
-                        feedback.innerHTML = '✓ Правильно! Ваш ответ: ' + userAnswer;
-                        feedback.style.display = 'block';
-                    } else {
-                        feedback.className = 'feedback incorrect';
-                        feedback.innerHTML = '✗ Неправильно.<br>Ваш ответ: ' + (userAnswer || '(пусто)') + '<br>Правильный ответ: {{PastSimple}}';
-                        feedback.style.display = 'block';
-                    }
-                    localStorage.removeItem('userAnswer1_{{Infinitive}}_{{PastSimple}}');
-                })();
-                </script>
-                """,
-            },
-        ],
-        css=css,
-    )
 
-    # Model 2: Past Simple + Past Participle → Infinitive
-    model2 = genanki.Model(
-        1607392320,
-        "Irregular Verbs - PS+PP to Inf",
-        fields=[
-            {"name": "Infinitive"},
-            {"name": "PastSimple"},
-            {"name": "PastParticiple"},
-            {"name": "TransInf"},
-            {"name": "TransPS"},
-            {"name": "TransPP"},
-            {"name": "Translation"},
-            {"name": "ExampleEn"},
-            {"name": "ExampleRu"},
-        ],
-        templates=[
-            {
-                "name": "Card 2",
-                "qfmt": """
-                <div class="front">
-                    <input type="text" id="input2" placeholder="?" oninput="localStorage.setItem('userAnswer2_{{Infinitive}}_{{PastSimple}}', this.value)" onblur="localStorage.setItem('userAnswer2_{{Infinitive}}_{{PastSimple}}', this.value)">
-                    <span> - </span>
-                    <div class="verb-form">{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
-                + create_tts_button("{{PastSimple}}")
-                + """</div>
-                    <span> - </span>
-                    <div class="verb-form">{{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
-                + create_tts_button("{{PastParticiple}}")
-                + """</div>
-                </div>
-                <script>
-                window.addEventListener('beforeunload', function() {
-                    var input = document.getElementById('input2');
-                    if (input) localStorage.setItem('userAnswer2', input.value);
-                });
-                </script>
-                """,
-                "afmt": """
-                <div class="front">
-                    <div class="verb-form"><strong>{{Infinitive}}</strong> <span class="transcription">{{TransInf}}</span> """
-                + create_tts_button("{{Infinitive}}")
-                + """</div>
-                    <span> - </span>
-                    <div class="verb-form">{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
-                + create_tts_button("{{PastSimple}}")
-                + """</div>
-                    <span> - </span>
-                    <div class="verb-form">{{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
-                + create_tts_button("{{PastParticiple}}")
-                + """</div>
-                </div>
-                <div class="translation">{{Translation}}</div>
-                <div class="example">{{ExampleEn}}<br>{{ExampleRu}}</div>
-                <hr>
-                <div style="margin-top: 15px;">
-                    <div id="check_feedback2" class="feedback"></div>
-                </div>
-                <script>
-                (function() {
-                    var feedback = document.getElementById('check_feedback2');
-                    var userAnswer = localStorage.getItem('userAnswer2_{{Infinitive}}_{{PastSimple}}') || '';
-                    userAnswer = userAnswer.trim().toLowerCase();
-                    var correctAnswer = '{{Infinitive}}'.toLowerCase();
-
-                    if (userAnswer === correctAnswer) {
-                        feedback.className = 'feedback correct';
-                        feedback.innerHTML = '✓ Правильно! Ваш ответ: ' + userAnswer;
-                        feedback.style.display = 'block';
-                    } else {
-                        feedback.className = 'feedback incorrect';
-                        feedback.innerHTML = '✗ Неправильно.<br>Ваш ответ: ' + (userAnswer || '(пусто)') + '<br>Правильный ответ: {{Infinitive}}';
-                        feedback.style.display = 'block';
-                    }
-                    localStorage.removeItem('userAnswer2_{{Infinitive}}_{{PastSimple}}');
-                })();
-                </script>
-                """,
-            },
-        ],
-        css=css,
-    )
+# Defined once per template (or shipped once as a media file with
+# --shared-assets); the chosen voice is cached on window.speakText so the
+# voice list is filtered once per review session, not on every click.
+TTS_JS = """
+if (!window.speakText) {
+    window.speakText = function(text) {
+        var utterance = new SpeechSynthesisUtterance(text);
+        utterance.lang = 'en-US';
+        utterance.rate = 0.8;
+        utterance.pitch = 1.0;
+        if (window.speakText.voice === undefined) {
+            var voices = speechSynthesis.getVoices();
+            var americanVoices = voices.filter(voice =>
+                voice.lang === 'en-US' && (
+                    voice.name.includes('Google US English') ||
+                    voice.name.includes('Microsoft David') ||
+                    voice.name.includes('Microsoft Mark') ||
+                    voice.name.includes('Microsoft Zira') ||
+                    voice.name.includes('Alex') ||
+                    voice.name.includes('Samantha') ||
+                    voice.name.includes('American') ||
+                    (voice.name.includes('English') && voice.name.includes('United States'))
+                )
+            );
+            if (americanVoices.length === 0) {
+                americanVoices = voices.filter(voice => voice.lang === 'en-US');
+            }
+            // The voice list loads asynchronously; only cache a real answer
+            if (voices.length > 0) {
+                window.speakText.voice = americanVoices[0] || null;
+            }
+        }
+        if (window.speakText.voice) {
+            utterance.voice = window.speakText.voice;
+        }
+        speechSynthesis.speak(utterance);
+    };
+}
+"""
 
-    # Model 3: Infinitive + Past Simple → Past Participle
-    model3 = genanki.Model(
-        1607392321,
-        "Irregular Verbs - Inf+PS to PP",
-        fields=[
-            {"name": "Infinitive"},
-            {"name": "PastSimple"},
-            {"name": "PastParticiple"},
-            {"name": "TransInf"},
-            {"name": "TransPS"},
-            {"name": "TransPP"},
-            {"name": "Translation"},
-            {"name": "ExampleEn"},
-            {"name": "ExampleRu"},
-        ],
-        templates=[
-            {
-                "name": "Card 3",
-                "qfmt": """
-                <div class="front">
-                    <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
-                + create_tts_button("{{Infinitive}}")
-                + """</div>
-                    <span> - </span>
-                    <div class="verb-form">{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
-                + create_tts_button("{{PastSimple}}")
-                + """</div>
-                    <span> - </span>
-                    <input type="text" id="input3" placeholder="?" oninput="localStorage.setItem('userAnswer3_{{Infinitive}}_{{PastSimple}}', this.value)" onblur="localStorage.setItem('userAnswer3_{{Infinitive}}_{{PastSimple}}', this.value)">
-                </div>
-                <script>
-                window.addEventListener('beforeunload', function() {
-                    var input = document.getElementById('input3');
-                    if (input) localStorage.setItem('userAnswer3', input.value);
-                });
-                </script>
-                """,
-                "afmt": """
-                <div class="front">
-                    <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
-                + create_tts_button("{{Infinitive}}")
-                + """</div>
-                    <span> - </span>
-                    <div class="verb-form">{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
-                + create_tts_button("{{PastSimple}}")
-                + """</div>
-                    <span> - </span>
-                    <div class="verb-form"><strong>{{PastParticiple}}</strong> <span class="transcription">{{TransPP}}</span> """
-                + create_tts_button("{{PastParticiple}}")
-                + """</div>
-                </div>
-                <div class="translation">{{Translation}}</div>
-                <div class="example">{{ExampleEn}}<br>{{ExampleRu}}</div>
-                <hr>
-                <div style="margin-top: 15px;">
-                    <div id="check_feedback3" class="feedback"></div>
-                </div>
-                <script>
-                (function() {
-                    var feedback = document.getElementById('check_feedback3');
-                    var userAnswer = localStorage.getItem('userAnswer3_{{Infinitive}}_{{PastSimple}}') || '';
-                    userAnswer = userAnswer.trim().toLowerCase();
-                    var correctAnswer = '{{PastParticiple}}'.toLowerCase();
-
-                    if (userAnswer === correctAnswer) {
-                        feedback.className = 'feedback correct';
-                        feedback.innerHTML = '✓ Правильно! Ваш ответ: ' + userAnswer;
-                        feedback.style.display = 'block';
-                    } else {
-                        feedback.className = 'feedback incorrect';
-                        feedback.innerHTML = '✗ Неправильно.<br>Ваш ответ: ' + (userAnswer || '(пусто)') + '<br>Правильный ответ: {{PastParticiple}}';
-                        feedback.style.display = 'block';
-                    }
-                    localStorage.removeItem('userAnswer3_{{Infinitive}}_{{PastSimple}}');
-                })();
-                </script>
-                """,
-            },
-        ],
-        css=css,
-    )
+TTS_SCRIPT = f"<script>\n{TTS_JS}</script>\n"
 
-    # Model 4: EN → RUS
-    model4 = genanki.Model(
-        1607392322,
-        "Irregular Verbs - EN to RUS",
-        fields=[
-            {"name": "Infinitive"},
-            {"name": "PastSimple"},
-            {"name": "PastParticiple"},
-            {"name": "TransInf"},
-            {"name": "TransPS"},
-            {"name": "TransPP"},
-            {"name": "Translation"},
-            {"name": "ExampleEn"},
-            {"name": "ExampleRu"},
-        ],
-        templates=[
-            {
-                "name": "Card 4",
-                "qfmt": """
-                <div class="front">
-                    <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
-                + create_tts_button("{{Infinitive}}")
-                + """</div>
-                    <br><br>
-                    <input type="text" id="input4" placeholder="Перевод на русский" oninput="localStorage.setItem('userAnswer4_{{Infinitive}}_{{Translation}}', this.value)" onblur="localStorage.setItem('userAnswer4_{{Infinitive}}_{{Translation}}', this.value)">
-                </div>
-                <script>
-                window.addEventListener('beforeunload', function() {
-                    var input = document.getElementById('input4');
-                    if (input) localStorage.setItem('userAnswer4', input.value);
-                });
-                </script>
-                """,
-                "afmt": """
-                <div class="front">
-                    <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
-                + create_tts_button("{{Infinitive}}")
-                + """</div>
-                </div>
-                <div class="translation"><strong>{{Translation}}</strong></div>
-                <div class="example">{{ExampleEn}}<br>{{ExampleRu}}</div>
-                <hr>
-                <div>{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
-                + create_tts_button("{{PastSimple}}")
-                + """ | {{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
-                + create_tts_button("{{PastParticiple}}")
-                + """</div>
-                <hr>
-                <div style="margin-top: 15px;">
-                    <div id="check_feedback4" class="feedback"></div>
-                </div>
-                <script>
-                (function() {
-                    var feedback = document.getElementById('check_feedback4');
-                    var userAnswer = localStorage.getItem('userAnswer4_{{Infinitive}}_{{Translation}}') || '';
-                    userAnswer = userAnswer.trim().toLowerCase();
-                    var correctAnswer = '{{Translation}}'.toLowerCase();
-
-                    if (userAnswer === correctAnswer) {
-                        feedback.className = 'feedback correct';
-                        feedback.innerHTML = '✓ Правильно! Ваш ответ: ' + userAnswer;
-                        feedback.style.display = 'block';
-                    } else {
-                        feedback.className = 'feedback incorrect';
-                        feedback.innerHTML = '✗ Неправильно.<br>Ваш ответ: ' + (userAnswer || '(пусто)') + '<br>Правильный ответ: {{Translation}}';
-                        feedback.style.display = 'block';
-                    }
-                    localStorage.removeItem('userAnswer4_{{Infinitive}}_{{Translation}}');
-                })();
-                </script>
-                """,
-            },
-        ],
-        css=css,
+# Typed answers are kept in answerStore under '<NoteId>:<card number>' keys
+STORE_SCRIPT = f"<script>\n{ANSWER_STORE_JS}</script>\n"
+
+# Answer check for the back sides: the typed answer is taken from the store
+# and looked up in the accepted answers of field, read from the Accepted
+# field of the note. Only the fronts carry the answer store itself.
+CHECK_JS = (
+    ANSWERS_JS
+    + """
+window.checkVerbAnswer = function(feedbackId, storageKey, field) {
+    var feedback = document.getElementById(feedbackId);
+    var accepted = readAccepted(field);
+    var correctAnswer = accepted ? accepted.text : '';
+    var userAnswer = takeAnswer(storageKey).trim();
+    var result = findAnswer(accepted, userAnswer);
+
+    if (result === 1) {
+        feedback.className = 'feedback correct';
+        feedback.innerHTML = '✓ Правильно! Ваш ответ: ' + userAnswer;
+    } else if (result === 2) {
+        feedback.className = 'feedback correct';
+        feedback.innerHTML = '✓ Правильно, но с опечаткой.<br>Ваш ответ: ' + userAnswer + '<br>Правильный ответ: ' + correctAnswer;
+    } else {
+        feedback.className = 'feedback incorrect';
+        feedback.innerHTML = '✗ Неправильно.<br>Ваш ответ: ' + (userAnswer || '(пусто)') + '<br>Правильный ответ: ' + correctAnswer;
+    }
+    feedback.style.display = 'block';
+};
+"""
+)
+
+CHECK_SCRIPT = f"<script>\n{CHECK_JS}</script>\n"
+
+
+def create_tts_button(text):
+    return f'<button onclick="speakText(\'{text}\')" style="background: #4CAF50; color: white; border: none; padding: 5px 10px; border-radius: 3px; cursor: pointer;">🔊</button>'
+
+
+def create_audio_button(field):
+    """The pre-generated audio of a verb form, or the browser TTS button without it."""
+    audio = AUDIO_FIELDS[field]
+    return (
+        f"{{{{#{audio}}}}}{{{{{audio}}}}}{{{{/{audio}}}}}"
+        f"{{{{^{audio}}}}}{create_tts_button(f'{{{{{field}}}}}')}{{{{/{audio}}}}}"
     )
 
-    # Model 5: RUS → EN
-    model5 = genanki.Model(
-        1607392323,
-        "Irregular Verbs - RUS to EN",
-        fields=[
-            {"name": "Infinitive"},
-            {"name": "PastSimple"},
-            {"name": "PastParticiple"},
-            {"name": "TransInf"},
-            {"name": "TransPS"},
-            {"name": "TransPP"},
-            {"name": "Translation"},
-            {"name": "ExampleEn"},
-            {"name": "ExampleRu"},
-        ],
-        templates=[
-            {
-                "name": "Card 5",
-                "qfmt": """
-                <div class="front">
-                    <div class="translation">{{Translation}}</div>
-                    <br><br>
-                    <input type="text" id="input5" placeholder="English translation" oninput="localStorage.setItem('userAnswer5_{{Infinitive}}_{{Translation}}', this.value)" onblur="localStorage.setItem('userAnswer5_{{Infinitive}}_{{Translation}}', this.value)">
-                </div>
-                <script>
-                window.addEventListener('beforeunload', function() {
-                    var input = document.getElementById('input5');
-                    if (input) localStorage.setItem('userAnswer5', input.value);
-                });
-                </script>
-                """,
-                "afmt": """
-                <div class="front">
-                    <div class="translation">{{Translation}}</div>
-                </div>
+
+def with_tts_script(template, tts_script=TTS_SCRIPT):
+    """Prepend the TTS script to each side of the template that has a TTS button."""
+    for side in ("qfmt", "afmt"):
+        if "speakText(" in template[side]:
+            template[side] = tts_script + template[side]
+    return template
+
+
+def create_check_function(correct_answer, input_id):
+    return f"""
+    function checkAnswer_{input_id}() {{
+        var input = document.getElementById('{input_id}');
+        var feedback = document.getElementById('feedback_{input_id}');
+        var userAnswer = input.value.trim().toLowerCase();
+        var correctAnswer = '{correct_answer}'.toLowerCase();
+
+        if (userAnswer === correctAnswer) {{
+            input.className = 'input-correct';
+            feedback.className = 'feedback correct';
+            feedback.innerHTML = '✓ Правильно!';
+            feedback.style.display = 'block';
+        }} else {{
+            input.className = 'input-incorrect';
+            feedback.className = 'feedback incorrect';
+            feedback.innerHTML = '✗ Неправильно. Правильный ответ: {correct_answer}';
+            feedback.style.display = 'block';
+        }}
+    }}
+    """
+
+
+def create_back_check_function(correct_answer, input_id):
+    return f"""
+    function checkAnswerBack_{input_id}() {{
+        var input = document.getElementById('{input_id}');
+        var feedback = document.getElementById('back_feedback_{input_id}');
+        var userAnswer = input.value.trim().toLowerCase();
+        var correctAnswer = '{correct_answer}'.toLowerCase();
+
+        if (userAnswer === correctAnswer) {{
+            input.className = 'input-correct';
+            feedback.className = 'feedback correct';
+            feedback.innerHTML = '✓ Правильно!';
+            feedback.style.display = 'block';
+        }} else {{
+            input.className = 'input-incorrect';
+            feedback.className = 'feedback incorrect';
+            feedback.innerHTML = '✗ Неправильно. Правильный ответ: {correct_answer}';
+            feedback.style.display = 'block';
+        }}
+    }}
+    """
+
+
+def create_card_templates(
+    tts_script=TTS_SCRIPT, check_script=CHECK_SCRIPT, store_script=STORE_SCRIPT
+):
+    templates = [
+        # Infinitive → Past Participle (need Past Simple)
+        {
+            "name": "Card 1",
+            "qfmt": """
+            <div class="front">
+                <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
+            + create_audio_button("Infinitive")
+            + """</div>
+                <span> - </span>
+                <input type="text" id="input1" placeholder="?" oninput="answerStore.set('{{NoteId}}:1', this.value)\">
+                <span> - </span>
+                <div class="verb-form">{{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
+            + create_audio_button("PastParticiple")
+            + """</div>
+            </div>
+            """,
+            "afmt": """
+            <div class="front">
+                <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
+            + create_audio_button("Infinitive")
+            + """</div>
+                <span> - </span>
+                <div class="verb-form"><strong>{{PastSimple}}</strong> <span class="transcription">{{TransPS}}</span> """
+            + create_audio_button("PastSimple")
+            + """</div>
+                <span> - </span>
+                <div class="verb-form">{{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
+            + create_audio_button("PastParticiple")
+            + """</div>
+            </div>
+            <div class="translation">{{Translation}}</div>
+            <div class="example">{{ExampleEn}}<br>{{ExampleRu}}</div>
+            <hr>
+            <div style="margin-top: 15px;">
+                <div id="check_feedback1" class="feedback"></div>
+            </div>
+            <script type="application/json" id="accepted_answers">{{Accepted}}</script>
+            <script>
+            checkVerbAnswer('check_feedback1', '{{NoteId}}:1', 'PastSimple');
+            </script>
+            """,
+        },
+        # Past Simple + Past Participle → Infinitive
+        {
+            "name": "Card 2",
+            "qfmt": """
+            <div class="front">
+                <input type="text" id="input2" placeholder="?" oninput="answerStore.set('{{NoteId}}:2', this.value)\">
+                <span> - </span>
+                <div class="verb-form">{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
+            + create_audio_button("PastSimple")
+            + """</div>
+                <span> - </span>
+                <div class="verb-form">{{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
+            + create_audio_button("PastParticiple")
+            + """</div>
+            </div>
+            """,
+            "afmt": """
+            <div class="front">
                 <div class="verb-form"><strong>{{Infinitive}}</strong> <span class="transcription">{{TransInf}}</span> """
-                + create_tts_button("{{Infinitive}}")
-                + """</div>
-                <div class="example">{{ExampleEn}}<br>{{ExampleRu}}</div>
-                <hr>
-                <div>{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
-                + create_tts_button("{{PastSimple}}")
-                + """ | {{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
-                + create_tts_button("{{PastParticiple}}")
-                + """</div>
-                <hr>
-                <div style="margin-top: 15px;">
-                    <div id="check_feedback5" class="feedback"></div>
-                </div>
-                <script>
-                (function() {
-                    var feedback = document.getElementById('check_feedback5');
-                    var userAnswer = localStorage.getItem('userAnswer5_{{Infinitive}}_{{Translation}}') || '';
-                    userAnswer = userAnswer.trim().toLowerCase();
-                    var correctAnswer = '{{Infinitive}}'.toLowerCase();
-
-                    if (userAnswer === correctAnswer) {
-                        feedback.className = 'feedback correct';
-                        feedback.innerHTML = '✓ Правильно! Ваш ответ: ' + userAnswer;
-                        feedback.style.display = 'block';
-                    } else {
-                        feedback.className = 'feedback incorrect';
-                        feedback.innerHTML = '✗ Неправильно.<br>Ваш ответ: ' + (userAnswer || '(пусто)') + '<br>Правильный ответ: {{Infinitive}}';
-                        feedback.style.display = 'block';
-                    }
-                    localStorage.removeItem('userAnswer5_{{Infinitive}}_{{Translation}}');
-                })();
-                </script>
-                """,
-            },
-        ],
+            + create_audio_button("Infinitive")
+            + """</div>
+                <span> - </span>
+                <div class="verb-form">{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
+            + create_audio_button("PastSimple")
+            + """</div>
+                <span> - </span>
+                <div class="verb-form">{{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
+            + create_audio_button("PastParticiple")
+            + """</div>
+            </div>
+            <div class="translation">{{Translation}}</div>
+            <div class="example">{{ExampleEn}}<br>{{ExampleRu}}</div>
+            <hr>
+            <div style="margin-top: 15px;">
+                <div id="check_feedback2" class="feedback"></div>
+            </div>
+            <script type="application/json" id="accepted_answers">{{Accepted}}</script>
+            <script>
+            checkVerbAnswer('check_feedback2', '{{NoteId}}:2', 'Infinitive');
+            </script>
+            """,
+        },
+        # Infinitive + Past Simple → Past Participle
+        {
+            "name": "Card 3",
+            "qfmt": """
+            <div class="front">
+                <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
+            + create_audio_button("Infinitive")
+            + """</div>
+                <span> - </span>
+                <div class="verb-form">{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
+            + create_audio_button("PastSimple")
+            + """</div>
+                <span> - </span>
+                <input type="text" id="input3" placeholder="?" oninput="answerStore.set('{{NoteId}}:3', this.value)\">
+            </div>
+            """,
+            "afmt": """
+            <div class="front">
+                <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
+            + create_audio_button("Infinitive")
+            + """</div>
+                <span> - </span>
+                <div class="verb-form">{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
+            + create_audio_button("PastSimple")
+            + """</div>
+                <span> - </span>
+                <div class="verb-form"><strong>{{PastParticiple}}</strong> <span class="transcription">{{TransPP}}</span> """
+            + create_audio_button("PastParticiple")
+            + """</div>
+            </div>
+            <div class="translation">{{Translation}}</div>
+            <div class="example">{{ExampleEn}}<br>{{ExampleRu}}</div>
+            <hr>
+            <div style="margin-top: 15px;">
+                <div id="check_feedback3" class="feedback"></div>
+            </div>
+            <script type="application/json" id="accepted_answers">{{Accepted}}</script>
+            <script>
+            checkVerbAnswer('check_feedback3', '{{NoteId}}:3', 'PastParticiple');
+            </script>
+            """,
+        },
+        # EN → RUS
+        {
+            "name": "Card 4",
+            "qfmt": """
+            <div class="front">
+                <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
+            + create_audio_button("Infinitive")
+            + """</div>
+                <br><br>
+                <input type="text" id="input4" placeholder="Перевод на русский" oninput="answerStore.set('{{NoteId}}:4', this.value)\">
+            </div>
+            """,
+            "afmt": """
+            <div class="front">
+                <div class="verb-form">{{Infinitive}} <span class="transcription">{{TransInf}}</span> """
+            + create_audio_button("Infinitive")
+            + """</div>
+            </div>
+            <div class="translation"><strong>{{Translation}}</strong></div>
+            <div class="example">{{ExampleEn}}<br>{{ExampleRu}}</div>
+            <hr>
+            <div>{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
+            + create_audio_button("PastSimple")
+            + """ | {{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
+            + create_audio_button("PastParticiple")
+            + """</div>
+            <hr>
+            <div style="margin-top: 15px;">
+                <div id="check_feedback4" class="feedback"></div>
+            </div>
+            <script type="application/json" id="accepted_answers">{{Accepted}}</script>
+            <script>
+            checkVerbAnswer('check_feedback4', '{{NoteId}}:4', 'Translation');
+            </script>
+            """,
+        },
+        # RUS → EN
+        {
+            "name": "Card 5",
+            "qfmt": """
+            <div class="front">
+                <div class="translation">{{Translation}}</div>
+                <br><br>
+                <input type="text" id="input5" placeholder="English translation" oninput="answerStore.set('{{NoteId}}:5', this.value)\">
+            </div>
+            """,
+            "afmt": """
+            <div class="front">
+                <div class="translation">{{Translation}}</div>
+            </div>
+            <div class="verb-form"><strong>{{Infinitive}}</strong> <span class="transcription">{{TransInf}}</span> """
+            + create_audio_button("Infinitive")
+            + """</div>
+            <div class="example">{{ExampleEn}}<br>{{ExampleRu}}</div>
+            <hr>
+            <div>{{PastSimple}} <span class="transcription">{{TransPS}}</span> """
+            + create_audio_button("PastSimple")
+            + """ | {{PastParticiple}} <span class="transcription">{{TransPP}}</span> """
+            + create_audio_button("PastParticiple")
+            + """</div>
+            <hr>
+            <div style="margin-top: 15px;">
+                <div id="check_feedback5" class="feedback"></div>
+            </div>
+            <script type="application/json" id="accepted_answers">{{Accepted}}</script>
+            <script>
+            checkVerbAnswer('check_feedback5', '{{NoteId}}:5', 'Infinitive');
+            </script>
+            """,
+        },
+    ]
+    for template in templates:
+        template["qfmt"] = store_script + template["qfmt"]
+        template["afmt"] = check_script + template["afmt"]
+    return [with_tts_script(template, tts_script) for template in templates]
+
+
+def create_templates_and_css(assets=None):
+    """
+    Card templates and model CSS. With a SharedAssets collector the TTS,
+    answer store and answer check scripts and the CSS are referenced from
+    media files instead of inlined.
+    """
+    if assets is None:
+        return create_card_templates(), CSS
+    tts_script = assets.script("tts.js", TTS_JS)
+    check_script = assets.script("check_answer.js", CHECK_JS)
+    store_script = assets.script("answer_store.js", ANSWER_STORE_JS)
+    templates = create_card_templates(tts_script, check_script, store_script)
+    return templates, assets.stylesheet("styles.css", CSS)
+
+
+def create_card_model(assets=None):
+    """One note type with all five card templates (default layout)."""
+    import genanki
+
+    templates, css = create_templates_and_css(assets)
+    return genanki.Model(
+        MODEL_ID,
+        MODEL_NAME,
+        fields=[{"name": name} for name in FIELDS],
+        templates=templates,
         css=css,
     )
 
-    return [model1, model2, model3, model4, model5]
 
+def create_card_models(layout=LAYOUT_SINGLE, assets=None):
+    """Models for the chosen layout: one shared model, or five legacy models."""
+    import genanki
 
-def load_verbs_from_csv(csv_file):
-    verbs = []
+    if layout == LAYOUT_SINGLE:
+        return [create_card_model(assets)]
+    templates, css = create_templates_and_css(assets)
+    return [
+        genanki.Model(
+            model_id,
+            name,
+            fields=[{"name": name} for name in FIELDS],
+            templates=[template],
+            css=css,
+        )
+        for (model_id, name), template in zip(LEGACY_MODELS, templates)
+    ]
+
+
+# Source columns are matched by CSV column name or by note field name
+SOURCE_FIELDS = SourceFields(
+    names=VerbRecord._fields,
+    required=VerbRecord._fields[:-1],
+    aliases=dict(zip(VerbRecord._fields, FIELDS)),
+)
+
+
+def iter_verbs(source):
+    """
+    Stream VerbRecord tuples one row at a time from a CSV, JSONL, SQLite or
+    Parquet source (a SourceSpec or a file path).
+    """
+    spec = source if isinstance(source, SourceSpec) else SourceSpec(source)
+    reader = None
     try:
-        with open(csv_file, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                verbs.append(
-                    {
-                        "infinitive": row["infinitive"].strip(),
-                        "past_simple": row["past_simple"].strip(),
-                        "past_participle": row["past_participle"].strip(),
-                        "transcription_inf": row["transcription_inf"].strip(),
-                        "transcription_ps": row["transcription_ps"].strip(),
-                        "transcription_pp": row["transcription_pp"].strip(),
-                        "translation": row["translation"].strip(),
-                        "example_en": row["example_en"].strip(),
-                        "example_ru": (
-                            row["example_ru"].strip() if "example_ru" in row else ""
-                        ),
-                    }
-                )
+        reader = open_source(spec)
+        for values in reader.records(SOURCE_FIELDS):
+            yield VerbRecord._make(values)
     except FileNotFoundError:
-        print(f"Error: File {csv_file} not found.")
+        print(f"Error: File {spec.path} not found.")
         sys.exit(1)
     except Exception as e:
-        print(f"Error reading CSV file: {e}")
+        row = f" (row {reader.position})" if reader and reader.position else ""
+        print(f"Error reading {spec.path}{row}: {e}")
+        print("Run with --validate to list every problem in a CSV file.")
         sys.exit(1)
 
-    return verbs
 
+def iter_verbs_from_csv(csv_file):
+    return iter_verbs(SourceSpec(csv_file))
+
+
+VALIDATION_SCHEMA = SCHEMAS["verbs"]
+
+
+def load_verbs(source):
+    return list(iter_verbs(source))
+
+
+def load_verbs_from_csv(csv_file):
+    return load_verbs(csv_file)
+
+
+def create_notes(
+    verb,
+    models,
+    guid_field=DEFAULT_GUID_FIELD,
+    answers=DEFAULT_ANSWERS,
+    audio=("", "", ""),
+):
+    """
+    One note per model. GUIDs are keyed on guid_field and the model ID, so
+    edited rows update the existing notes on re-import. answers builds the
+    Accepted field; audio holds the AudioInf, AudioPS and AudioPP values.
+    NoteId is the same for the notes of one verb in every layout.
+    """
+    import genanki
+
+    key = getattr(verb, guid_field)
+    fields = [*verb, answers(verb), *audio, note_key(models[0], key)]
+    return [
+        genanki.Note(model=model, fields=fields, guid=note_guid(model, key))
+        for model in models
+    ]
 
-def create_deck(verbs, deck_name="Irregular English Verbs"):
-    deck_id = random.randrange(1 << 30, 1 << 31)
-    deck = genanki.Deck(deck_id, deck_name)
 
-    models = create_card_models()
+def verb_forms(verb):
+    return verb.infinitive, verb.past_simple, verb.past_participle
 
-    for verb in verbs:
-        for i, model in enumerate(models):
-            note = genanki.Note(
-                model=model,
-                fields=[
-                    verb["infinitive"],
-                    verb["past_simple"],
-                    verb["past_participle"],
-                    verb["transcription_inf"],
-                    verb["transcription_ps"],
-                    verb["transcription_pp"],
-                    verb["translation"],
-                    verb["example_en"],
-                    verb["example_ru"],
-                ],
-            )
-            deck.add_note(note)
 
-    return deck
+def tts_audio(source, engine, workers):
+    """
+    Pre-generate audio for every verb form. Returns (media, errors): media
+    maps the spoken text to (media file name, path in the cache).
+    """
+    texts = (
+        speech_text(form) for verb in iter_verbs(source) for form in verb_forms(verb)
+    )
+    files, errors = generate_audio(texts, engine, workers=workers)
+    return {text: (media_name(path), path) for text, path in files.items()}, errors
 
 
-def main():
+def parse_args(argv=None):
+    """Parse command line arguments (argv=None reads sys.argv)."""
     parser = argparse.ArgumentParser(
         description="Generate Anki deck for irregular English verbs"
     )
-    parser.add_argument("csv_file", help="Path to CSV file with verb data")
+    parser.add_argument(
+        "csv_file",
+        help="Path to the verb data: a CSV, JSONL, SQLite database or Parquet file",
+    )
     parser.add_argument(
         "-o", "--output", default="irregular_verbs.apkg", help="Output deck file name"
     )
     parser.add_argument(
         "-n", "--name", default="Irregular English Verbs", help="Deck name"
     )
+    parser.add_argument(
+        "--guid-field",
+        choices=VerbRecord._fields,
+        default=DEFAULT_GUID_FIELD,
+        help="CSV column note GUIDs are derived from (default: infinitive)",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="Rebuild the whole deck, ignoring the build manifest",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=[LAYOUT_SINGLE, LAYOUT_LEGACY],
+        default=LAYOUT_SINGLE,
+        help=(
+            "single: one note type with 5 card templates (default); "
+            "legacy: 5 note types with one template each, laid out like older "
+            "decks (their notes are not updated in place, see README)"
+        ),
+    )
+    parser.add_argument(
+        "--shared-assets",
+        action="store_true",
+        help=(
+            "Ship the TTS and answer check scripts and CSS once as media files "
+            "instead of inlining them"
+        ),
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help=(
+            "Minify the template HTML, JS and CSS and hoist repeated inline "
+            "styles into classes"
+        ),
+    )
+    parser.add_argument(
+        "--since",
+        metavar="PREVIOUS",
+        help=(
+            "Write a delta package with only new and changed notes compared "
+            "to a previous build (its .apkg or manifest)"
+        ),
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=BACKEND_GENANKI,
+        help=(
+            "Collection writer: genanki (default) or sqlite, which batches "
+            "inserts directly into SQLite and is faster for large decks"
+        ),
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        help="Format of the verb data file (default: from the file extension)",
+    )
+    parser.add_argument(
+        "--table", help="SQLite table to read (default: the only table in the database)"
+    )
+    parser.add_argument(
+        "--query", metavar="SQL", help="SQL query to use instead of --table"
+    )
+    parser.add_argument(
+        "--map",
+        metavar="FIELD=COLUMN",
+        action="append",
+        help="Source column for a field (infinitive or Infinitive); can be repeated",
+    )
+    parser.add_argument(
+        "--typos",
+        action="store_true",
+        help=(
+            "Accept answers with one typo (a missing, extra or wrong letter "
+            "in answers of 5+ letters)"
+        ),
+    )
+    parser.add_argument(
+        "--tts",
+        choices=ENGINES,
+        help=(
+            "Pre-generate audio of every verb form with a local speech "
+            "synthesizer and embed it in the deck"
+        ),
+    )
+    parser.add_argument(
+        "--tts-command",
+        metavar="CMD",
+        help=(
+            "Custom synthesis command instead of --tts: the text is passed on "
+            "stdin, {voice}, {output} (a WAV file) and {text} are substituted"
+        ),
+    )
+    parser.add_argument(
+        "--tts-voice",
+        help="Voice: espeak-ng voice (default: en-us) or piper .onnx model path",
+    )
+    parser.add_argument(
+        "--tts-cache",
+        default=str(default_cache_dir(TTS_CACHE_NAME)),
+        help="Synthesized audio cache (default: ~/.cache/rus-english-anki/tts)",
+    )
+    parser.add_argument(
+        "--tts-workers",
+        type=int,
+        help="Parallel synthesizer processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--audio-format",
+        choices=AUDIO_FORMATS,
+        help=(
+            "Re-encode embedded audio with ffmpeg to this format "
+            "(mono, --audio-bitrate)"
+        ),
+    )
+    parser.add_argument(
+        "--audio-bitrate",
+        default=DEFAULT_BITRATE,
+        help=f"Bitrate of re-encoded audio (default: {DEFAULT_BITRATE})",
+    )
+    parser.add_argument(
+        "--media-cache",
+        default=str(default_cache_dir(MEDIA_CACHE_NAME)),
+        help=(
+            "Cache of media digests and re-encoded audio "
+            "(default: ~/.cache/rus-english-anki/media)"
+        ),
+    )
+    parser.add_argument(
+        "--exclude",
+        metavar="CSV",
+        action="append",
+        default=[],
+        help=(
+            "Skip verbs already covered by another corpus (a words or verbs "
+            "CSV); can be given several times"
+        ),
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Only check the CSV and print a JSON report of every problem, no build",
+    )
+    parser.add_argument(
+        "--report",
+        metavar="FILE",
+        help="JSON report file for --validate (default: stdout)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes for --validate and --preview (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--preview",
+        metavar="DIR",
+        help="Render every card to a static HTML site in DIR instead of building",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help=f"Notes per --preview page (default: {DEFAULT_PAGE_SIZE})",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="After building, watch the CSV file and rebuild the deck when it changes",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="File polling interval in --watch mode, seconds (default: 0.2)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="REPORT",
+        help="Write a JSON report with time, row count and rows/s per build phase",
+    )
+    parser.add_argument(
+        "--cprofile", metavar="FILE", help="Save a cProfile profile of the build"
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        metavar="FILE",
+        help="Save a tracemalloc report of memory allocations during the build",
+    )
+
+    args = parser.parse_args(argv)
+    try:
+        mapping = parse_mapping(args.map)
+    except ValueError as e:
+        parser.error(str(e))
+    args.source = SourceSpec(
+        args.csv_file, args.format, args.table, args.query, mapping
+    )
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.validate:
+        if args.format != FORMAT_CSV and not args.csv_file.lower().endswith(".csv"):
+            print("Error: --validate only checks CSV files.")
+            sys.exit(1)
+        schema = VALIDATION_SCHEMA._replace(key=args.guid_field)
+        sys.exit(run_validation(args.csv_file, schema, args.report, args.workers))
+
+    if args.preview:
+        preview(args)
+        return
+
+    if args.watch:
+        cache = FileCache()
+        build(args, cache=cache)
+        args.force = False
+        watch(
+            [args.csv_file, *args.exclude],
+            lambda changed: build(args, cache=cache),
+            args.watch_interval,
+        )
+        return
+
+    profile = create_profile(args.profile)
+    with capture(args.cprofile, args.tracemalloc):
+        build(args, profile)
+    if args.profile:
+        profile.save(args.profile)
+        print(f"Build phase report written to {args.profile}")
+
+
+def preview(args):
+    """Render the cards of every verb to a static HTML site (--preview)."""
+    for csv_file in [args.csv_file, *args.exclude]:
+        if not Path(csv_file).exists():
+            print(f"Error: File '{csv_file}' does not exist.")
+            sys.exit(1)
+    assets = SharedAssets(ASSETS_PREFIX, args.minify) if args.shared_assets else None
+    models = create_card_models(args.layout, assets)
+    if args.minify:
+        minify_models(models)
+    answers = AcceptedAnswers(ANSWER_FIELDS, typos=args.typos)
+    try:
+        exclusion = Exclusion(args.exclude)
+    except ValueError as e:
+        print(f"Error in --exclude: {e}")
+        sys.exit(1)
+    verbs = exclusion.filter(iter_verbs(args.source), attrgetter("infinitive"))
+    notes = (
+        note
+        for verb in verbs
+        for note in create_notes(verb, models, args.guid_field, answers)
+    )
+    result = write_preview(
+        args.preview,
+        models,
+        notes,
+        title=args.name,
+        page_size=args.page_size,
+        workers=args.workers,
+        media=assets.files if assets else None,
+    )
+    print(
+        f"Preview of {result.notes} notes, {result.cards} cards on "
+        f"{result.pages} pages: {result.index}"
+    )
+
+
+def build(args, profile=NULL_PROFILE, cache=None):
+    """
+    Build the deck from parsed command line arguments. cache is the
+    FileCache of --watch mode that keeps parsed CSV rows between rebuilds.
+    """
+    for csv_file in [args.csv_file, *args.exclude]:
+        if not Path(csv_file).exists():
+            print(f"Error: File '{csv_file}' does not exist.")
+            sys.exit(1)
+    try:
+        # Check the source format, table and columns before building
+        open_source(args.source).records(SOURCE_FIELDS)
+    except Exception as e:
+        print(f"Error: {args.csv_file}: {e}")
+        sys.exit(1)
 
-    args = parser.parse_args()
+    answers = AcceptedAnswers(ANSWER_FIELDS, typos=args.typos)
+    media_stage = MediaStage(args.media_cache, args.audio_format, args.audio_bitrate)
+    try:
+        engine = TtsEngine.from_args(
+            args.tts, args.tts_command, args.tts_voice, args.tts_cache
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    inputs = [args.csv_file, *args.exclude]
+    options = {
+        "name": args.name,
+        "layout": args.layout,
+        "shared_assets": args.shared_assets,
+        "minify": args.minify,
+        "guid_field": args.guid_field,
+        **source_options(args.source),
+        **answers.options(),
+        **(engine.options() if engine else {}),
+        **media_stage.options(),
+    }
+    # An unchanged deck is skipped before the models are built and genanki
+    # is imported
+    with profile.phase("manifest"):
+        sources = source_hashes([Path(__file__).resolve()])
+        current = (
+            not args.force
+            and not args.since
+            and is_up_to_date(args.output, inputs, sources, options)
+        )
+    if current:
+        print(f"{args.output} is up to date, nothing to rebuild.")
+        return
+
+    import genanki
+
+    with profile.phase("model"):
+        assets = None
+        if args.shared_assets:
+            assets = SharedAssets(ASSETS_PREFIX, args.minify)
+        models = create_card_models(args.layout, assets)
+        source_bytes = template_bytes(models)
+        if args.minify:
+            minify_models(models)
+    with profile.phase("manifest"):
+        writer = PackageWriter(
+            args.output,
+            inputs=inputs,
+            templates=model_hashes(models),
+            options=options,
+            force=args.force,
+            sources=sources,
+        )
+        try:
+            since = load_previous_build(args.since) if args.since else None
+        except (OSError, ValueError) as e:
+            print(f"Error in --since: {e}", file=sys.stderr)
+            sys.exit(1)
+        current = since is None and writer.is_current()
+    if current:
+        writer.mark_current()
+        print(f"{args.output} is up to date, nothing to rebuild.")
+        return
 
-    if not Path(args.csv_file).exists():
-        print(f"Error: CSV file '{args.csv_file}' does not exist.")
+    try:
+        exclusion = Exclusion(args.exclude, cache)
+    except ValueError as e:
+        print(f"Error in --exclude: {e}")
         sys.exit(1)
 
-    print(f"Loading verbs from {args.csv_file}...")
-    verbs = load_verbs_from_csv(args.csv_file)
-    print(f"Loaded {len(verbs)} verbs.")
+    tts = {}
+    if engine is not None:
+        print("Synthesizing verb audio...")
+        with profile.phase("tts"):
+            try:
+                tts, errors = tts_audio(args.source, engine, args.tts_workers)
+            except TtsError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+        print(f"Synthesized forms: {len(tts)}, synthesis errors: {len(errors)}.")
+        for text, error in list(errors.items())[:20]:
+            print(f"  {text}: {error}")
+        if len(errors) > 20:
+            print(f"  ... and {len(errors) - 20} more")
+
+    if tts:
+        with profile.phase("media"):
+            try:
+                staged = media_stage.process(tts.values())
+            except MediaError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+        tts = {text: staged.files[name] for text, (name, _) in tts.items()}
+        print(
+            f"Media: {staged.duplicates} duplicates, {staged.encoded} re-encoded, "
+            f"{staged.saved // 1024} KB saved."
+        )
+        for name, error in list(staged.errors.items())[:20]:
+            print(f"  {name}: {error}")
+
+    def audio_fields(verb):
+        if not tts:
+            return ("", "", "")
+        return tuple(
+            sound_tag(tts[text][0]) if text in tts else ""
+            for text in map(speech_text, verb_forms(verb))
+        )
 
-    print("Creating Anki deck...")
-    deck = create_deck(verbs, args.name)
+    media = dict(assets.files) if assets else {}
+    media.update(tts.values())
 
-    print(f"Generating {args.output}...")
-    genanki.Package(deck).write_to_file(args.output)
+    print(f"Generating {args.output} from {args.csv_file}...")
+    deck = genanki.Deck(stable_deck_id(args.name), args.name)
+    if cache is not None:
+        verbs = cache.get(args.csv_file, load_verbs, args.source)
+    else:
+        verbs = iter_verbs(args.source)
+    verbs = exclusion.filter(verbs, attrgetter("infinitive"))
+    rows = ((hash_row([*verb, *audio_fields(verb)]), verb) for verb in verbs)
+    result = writer.write(
+        deck,
+        models,
+        rows,
+        lambda verb: create_notes(
+            verb, models, args.guid_field, answers, audio_fields(verb)
+        ),
+        media=media,
+        since=since,
+        profile=profile,
+        backend=args.backend,
+    )
+    if exclusion.excluded:
+        print(f"Skipped {exclusion.excluded} verbs already covered by other corpora.")
+    if since is not None:
+        print(
+            f"Delta package {args.output}: {result.notes} new or changed notes "
+            f"from {result.rows} verbs, {result.media} media files"
+        )
+        return
+    if result.patched:
+        print(
+            f"Rebuilt {result.rebuilt} of {result.rows} rows, "
+            f"removed {result.removed_notes} stale notes."
+        )
 
     print(
-        f"Successfully created {args.output} with {len(verbs) * 5} cards ({len(verbs)} verbs x 5 card types)"
+        f"Successfully created {args.output} with {result.rows * 5} cards "
+        f"({result.rows} verbs x 5 card types, {result.rows * len(models)} notes)"
     )
+    size = template_bytes(models)
+    if args.minify:
+        print(f"Card templates: {size} bytes ({source_bytes} before minification)")
+    else:
+        print(f"Card templates: {size} bytes")
 
 
 if __name__ == "__main__":
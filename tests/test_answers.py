@@ -0,0 +1,112 @@
+import json
+import shutil
+import subprocess
+from collections import namedtuple
+
+import pytest
+
+from deck_tools.answers import (
+    ANSWER_STORE_JS,
+    ANSWERS_JS,
+    EXACT,
+    TYPO,
+    AcceptedAnswers,
+    find_answer,
+    normalize_answer,
+)
+from deck_tools.build_all import load_generator
+
+Record = namedtuple("Record", "word")
+needs_node = pytest.mark.skipif(shutil.which("node") is None, reason="нет node")
+
+# Значение поля -> введённые ответы; короткие ответы проверяют, что опечатки
+# (и лишняя буква) принимаются только от MIN_TYPO_LENGTH букв
+CASES = {
+    "go": ["go", "goo", "gos", "g", "og", "gp", "Go!", ""],
+    "cat": ["cat", "cats", "caat", "ct", "cut"],
+    "near": ["near", "nearr", "nea", "neat"],
+    "house": ["house", "houses", "hous", "hoose", "huose", "hose", "h ouse"],
+    "идти; ходить": ["идти", "ходить", "ходитт", "ходитьь", "идти, ходить", "иди"],
+    "to abandon": ["abandon", "to abandon", "abandn", "abanddon", "abandonn"],
+    "дом (здание)": ["дом", "здание", "домм", "зданиее", "дом здание"],
+    "Ёлка": ["елка", "ёлка", "ЁЛКА", "ёлкаа"],
+}
+
+# window и localStorage карточки для node
+CARD_ENV = """
+var window = globalThis;
+var storage = {};
+var localStorage = {
+    getItem: function(key) { return key in storage ? storage[key] : null; },
+    setItem: function(key, value) { storage[key] = String(value); },
+    removeItem: function(key) { delete storage[key]; },
+    key: function(i) { return Object.keys(storage)[i]; },
+    get length() { return Object.keys(storage).length; }
+};
+"""
+
+
+def run_js(*scripts):
+    """Выполняет скрипты в node и возвращает JSON, выведенный последним"""
+    result = subprocess.run(
+        ["node", "-e", "\n".join((CARD_ENV, *scripts))],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+@needs_node
+def test_take_answer_reads_answer_store():
+    # Лицевая сторона пишет через answerStore, обратная читает takeAnswer
+    front = ANSWER_STORE_JS + "answerStore.set('abc:t', 'кот');"
+    back = ANSWERS_JS + (
+        "console.log(JSON.stringify([takeAnswer('abc:t'), takeAnswer('abc:t'),"
+        " takeAnswer('other:t')]));"
+    )
+    assert run_js(front, back) == ["кот", "", ""]
+
+
+def test_store_only_on_fronts_and_matcher_only_on_backs():
+    words = load_generator("words").create_card_model()
+    verbs = load_generator("verbs").create_card_model()
+    for template in words.templates + verbs.templates:
+        assert "window.answerStore =" in template["qfmt"]
+        assert "findAnswer" not in template["qfmt"]
+        assert "window.answerStore =" not in template["afmt"]
+        assert "window.findAnswer =" in template["afmt"]
+
+
+@needs_node
+@pytest.mark.parametrize("typos", [False, True])
+def test_find_answer_matches_answers_js(typos):
+    answers = AcceptedAnswers([("Word", "word")], typos=typos)
+    checks = []
+    for value, inputs in CASES.items():
+        accepted = json.loads(answers(Record(value)))["Word"]
+        checks += [(accepted, user_answer) for user_answer in inputs]
+    script = ANSWERS_JS + (
+        f"var checks = {json.dumps(checks, ensure_ascii=False)};"
+        "console.log(JSON.stringify(checks.map(function(check) {"
+        " return [normalizeAnswer(check[1]), findAnswer(check[0], check[1])];"
+        "})));"
+    )
+    expected = [
+        [normalize_answer(user_answer), find_answer(accepted, user_answer)]
+        for accepted, user_answer in checks
+    ]
+    assert run_js(script) == expected
+
+
+def test_no_typos_for_short_answers():
+    accepted = json.loads(AcceptedAnswers([("Word", "word")], True)(Record("go")))
+    assert [find_answer(accepted["Word"], text) for text in ("go", "goo", "g")] == [
+        EXACT,
+        0,
+        0,
+    ]
+    accepted = json.loads(AcceptedAnswers([("Word", "word")], True)(Record("house")))
+    assert [
+        find_answer(accepted["Word"], text) for text in ("houses", "hous", "hoose")
+    ] == [TYPO, TYPO, TYPO]
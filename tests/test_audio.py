@@ -0,0 +1,82 @@
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from deck_tools.audio import AudioCache, fetch_audio
+
+AUDIO = b"ID3 audio"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = Counter()
+
+    def do_GET(self):
+        self.requests[self.path] += 1
+        if self.path == "/ok.mp3":
+            self.reply(200, AUDIO)
+        elif self.path == "/flaky.mp3" and self.requests[self.path] == 1:
+            self.reply(503, b"busy")
+        elif self.path == "/flaky.mp3":
+            self.reply(200, AUDIO + b" flaky")
+        else:
+            self.reply(404, b"not found")
+
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # Повтор после 5xx без паузы
+    monkeypatch.setattr("deck_tools.audio.time.sleep", lambda seconds: None)
+    Handler.requests = Counter()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(
+        target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", Handler.requests
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_cache_hit_does_not_request_again(server, tmp_path):
+    base, requests = server
+    url = f"{base}/ok.mp3"
+    files, errors = fetch_audio([url, url], AudioCache(tmp_path), workers=2)
+    assert errors == {}
+    assert files[url].read_bytes() == AUDIO
+    # Индекс сохранён на диск: новый кеш тоже не обращается к серверу
+    files, errors = fetch_audio([url], AudioCache(tmp_path))
+    assert files[url].read_bytes() == AUDIO
+    assert requests["/ok.mp3"] == 1
+
+
+def test_404_is_recorded_as_missing(server, tmp_path):
+    base, requests = server
+    url = f"{base}/gone.mp3"
+    files, errors = fetch_audio([url], AudioCache(tmp_path))
+    assert files == {} and "404" in errors[url]
+    cache = AudioCache(tmp_path)
+    assert cache.is_missing(url)
+    files, errors = fetch_audio([url], cache)
+    assert url in errors
+    assert requests["/gone.mp3"] == 1
+
+
+def test_retry_after_transient_5xx(server, tmp_path):
+    base, requests = server
+    url = f"{base}/flaky.mp3"
+    files, errors = fetch_audio([url], AudioCache(tmp_path), retries=2)
+    assert errors == {}
+    assert files[url].read_bytes() == AUDIO + b" flaky"
+    assert requests["/flaky.mp3"] == 2
@@ -0,0 +1,158 @@
+import csv
+import itertools
+import sqlite3
+import zipfile
+from types import SimpleNamespace
+
+import genanki
+import pytest
+
+from deck_tools import apkg
+from deck_tools.build_all import load_generator
+from deck_tools.bulk import BulkNoteWriter, field_checksum
+
+TIMESTAMP = 1700000000.5
+WORDS = [
+    ["word", "transcription", "translation", "example_en", "example_ru", "audio_url"],
+    ["cat", "[kæt]", "кот, кошка", 'He said "meow".', "Он сказал «мяу».", ""],
+    ["dog", "", "собака", "", "", "https://example.com/dog.mp3"],
+    ["<b>ice</b> cream", "[aɪs kriːm]", "мороженое", "I like it.", "Люблю.", ""],
+]
+VERBS = [
+    [
+        "infinitive",
+        "past_simple",
+        "past_participle",
+        "transcription_inf",
+        "transcription_ps",
+        "transcription_pp",
+        "translation",
+        "example_en",
+        "example_ru",
+    ],
+    ["be", "was/were", "been", "[biː]", "[wʌz/wɜːr]", "[biːn]", "быть", "I was.", ""],
+    ["go", "went", "gone", "", "", "", "идти", "", ""],
+]
+ROWS = {"words": WORDS, "verbs": VERBS}
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def collection(apkg_path, tmp_path):
+    directory = tmp_path / apkg_path.stem
+    with zipfile.ZipFile(apkg_path) as package:
+        package.extract(apkg.COLLECTION_NAME, directory)
+    return sqlite3.connect(str(directory / apkg.COLLECTION_NAME))
+
+
+def dump(conn):
+    """Строки notes (без csum), cards и col, индексы notes и cards"""
+    notes = conn.execute("SELECT * FROM notes ORDER BY id").fetchall()
+    return {
+        "notes": [note[:8] + note[9:] for note in notes],
+        "cards": conn.execute("SELECT * FROM cards ORDER BY id").fetchall(),
+        "col": conn.execute("SELECT * FROM col").fetchall(),
+        "indexes": conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name IN ('notes', 'cards') ORDER BY name"
+        ).fetchall(),
+    }
+
+
+def checksums(conn):
+    return conn.execute("SELECT sfld, csum FROM notes").fetchall()
+
+
+@pytest.mark.parametrize("generator", ["words", "verbs"])
+def test_generator_backends_write_the_same_collection(
+    generator, tmp_path, monkeypatch, capsys
+):
+    monkeypatch.setattr(apkg, "time", SimpleNamespace(time=lambda: TIMESTAMP))
+    source = tmp_path / f"{generator}.csv"
+    write_csv(source, ROWS[generator])
+    module = load_generator(generator)
+    dumps = {}
+    for backend in apkg.BACKENDS:
+        output = tmp_path / f"{backend}.apkg"
+        module.main([str(source), "-o", str(output), "--backend", backend])
+        conn = collection(output, tmp_path)
+        dumps[backend] = dump(conn)
+        if backend == apkg.BACKEND_SQLITE:
+            # csum genanki оставляет нулевым, пакетная запись считает его
+            for sort_field, csum in checksums(conn):
+                assert csum == field_checksum(sort_field)
+        conn.close()
+    assert dumps[apkg.BACKEND_SQLITE] == dumps[apkg.BACKEND_GENANKI]
+    assert len(dumps[apkg.BACKEND_SQLITE]["notes"]) == len(ROWS[generator]) - 1
+
+
+MODEL = genanki.Model(
+    1,
+    "test",
+    fields=[{"name": "Front"}, {"name": "Audio"}, {"name": "Example"}],
+    templates=[
+        {"name": "Front", "qfmt": "{{Front}}", "afmt": "{{Example}}"},
+        {"name": "Audio", "qfmt": "{{Front}}{{Audio}}", "afmt": "-"},
+        {
+            "name": "Both",
+            "qfmt": "{{#Audio}}{{#Example}}{{Audio}}{{Example}}{{/Example}}{{/Audio}}",
+            "afmt": "-",
+        },
+    ],
+    sort_field_index=2,
+)
+
+
+def notes():
+    for number, (audio, example) in enumerate(
+        itertools.product(["", "[sound:a.mp3]"], ["", "<i>ex</i>"])
+    ):
+        yield genanki.Note(
+            model=MODEL,
+            fields=[f"front{number}", audio, example],
+            tags=["t1", "t2"] if number % 2 else [],
+            due=number,
+        )
+
+
+def write_notes(db_path, bulk):
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    deck = genanki.Deck(2, "deck")
+    apkg.write_collection_header(cursor, deck, [MODEL], TIMESTAMP)
+    id_gen = itertools.count(1000)
+    if bulk:
+        writer = BulkNoteWriter(
+            cursor, TIMESTAMP, deck.deck_id, id_gen, batch_size=3, defer_indexes=True
+        )
+        for note in notes():
+            writer.add(note, next(id_gen))
+        writer.finish()
+    else:
+        for note in notes():
+            note.write_to_db(cursor, TIMESTAMP, deck.deck_id, id_gen)
+    conn.commit()
+    return conn
+
+
+def test_bulk_writer_matches_write_to_db(tmp_path):
+    expected = write_notes(tmp_path / "genanki.anki2", bulk=False)
+    actual = write_notes(tmp_path / "bulk.anki2", bulk=True)
+    assert dump(actual) == dump(expected)
+    # Карточки по требованиям модели: Front всегда, Audio - при Front,
+    # Both - только при Audio и Example
+    ords = actual.execute("SELECT ord, count(*) FROM cards GROUP BY ord").fetchall()
+    assert ords == [(0, 4), (1, 4), (2, 1)]
+    assert checksums(actual)[3] == ("<i>ex</i>", field_checksum("ex"))
+    expected.close()
+    actual.close()
+
+
+def test_field_checksum_ignores_html():
+    assert field_checksum("<b>cat</b>") == field_checksum("cat")
+    assert field_checksum("a&amp;b") == field_checksum("a&b")
+    assert field_checksum("cat") != field_checksum("dog")
+    assert 0 <= field_checksum("cat") < 2**32
@@ -0,0 +1,22 @@
+import zipfile
+
+import pytest
+
+from deck_tools.delta import load_previous_build
+
+
+def test_missing_previous_build(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_previous_build(tmp_path / "missing.apkg")
+
+
+@pytest.mark.parametrize("content", ["word,translation\n", None])
+def test_invalid_previous_build(tmp_path, content):
+    path = tmp_path / "previous.apkg"
+    if content is None:
+        with zipfile.ZipFile(path, "w") as apkg:
+            apkg.writestr("media", "{}")
+    else:
+        path.write_text(content, encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_previous_build(path)
@@ -0,0 +1,198 @@
+import csv
+import zlib
+
+import pytest
+
+from deck_tools.dictionary import (
+    MAX_TRANSLATIONS,
+    PRONUNCIATIONS,
+    SLOT,
+    TRANSLATIONS,
+    Dictionary,
+    arpabet_to_ipa,
+    open_dictionary,
+    transcribe,
+    write_index,
+)
+from deck_tools.enrich import enrich_csv
+
+
+def build(tmp_path, pairs, merge=False):
+    path = tmp_path / "test.idx"
+    write_index(pairs, path, merge=merge)
+    return Dictionary(path)
+
+
+def slot_of(dictionary, key):
+    return zlib.crc32(key.encode("utf-8")) & dictionary.mask
+
+
+def test_empty_index(tmp_path):
+    dictionary = build(tmp_path, [])
+    assert len(dictionary) == 0
+    assert dictionary.lookup("cat") is None
+    assert dictionary.lookup("") is None
+    dictionary.close()
+
+
+def test_round_trip_and_missing_keys(tmp_path):
+    pairs = [("cat", "кот"), ("ice cream", "мороженое"), ("ёж", "hedgehog")]
+    dictionary = build(tmp_path, pairs)
+    assert len(dictionary) == 3
+    assert dictionary.lookup("Cat") == "кот"
+    assert dictionary.lookup("  Ice   Cream ") == "мороженое"
+    assert dictionary.lookup("ЁЖ") == "hedgehog"
+    for term in ("ca", "cats", "ice", "dog"):
+        assert dictionary.lookup(term) is None
+    dictionary.close()
+
+
+def test_slot_collision(tmp_path):
+    # Два ключа в одном слоте таблицы: второй лежит в следующем слоте
+    first = "alpha"
+    mask = 3  # 2 записи -> 4 слота
+    second = next(
+        f"key{i}"
+        for i in range(1000)
+        if zlib.crc32(f"key{i}".encode()) & mask == zlib.crc32(first.encode()) & mask
+    )
+    dictionary = build(tmp_path, [(first, "1"), (second, "2")])
+    assert dictionary.mask == mask
+    assert slot_of(dictionary, first) == slot_of(dictionary, second)
+    assert dictionary.lookup(first) == "1"
+    assert dictionary.lookup(second) == "2"
+    missing = next(
+        f"missing{i}"
+        for i in range(1000)
+        if zlib.crc32(f"missing{i}".encode()) & mask == slot_of(dictionary, first)
+    )
+    assert dictionary.lookup(missing) is None
+    dictionary.close()
+
+
+def test_crc32_collision(tmp_path):
+    # Одинаковый crc32: ключи различаются только сравнением байтов
+    assert zlib.crc32(b"plumless") == zlib.crc32(b"buckeroo")
+    dictionary = build(tmp_path, [("plumless", "a"), ("buckeroo", "b"), ("c", "c")])
+    assert dictionary.lookup("plumless") == "a"
+    assert dictionary.lookup("buckeroo") == "b"
+    assert dictionary.lookup("plum") is None
+    stored = [
+        SLOT.unpack_from(dictionary.map, dictionary.table + i * SLOT.size)
+        for i in range(dictionary.mask + 1)
+    ]
+    assert sum(1 for crc, offset in stored if offset) == 3
+    dictionary.close()
+
+
+def test_merged_translations(tmp_path):
+    pairs = [
+        ("cat", "кот"),
+        ("cat", "кошка"),
+        ("cat", "кот"),
+        ("cat", "котёнок"),
+        ("cat", "киса"),
+        ("dog", "собака"),
+    ]
+    merged = build(tmp_path, pairs, merge=True)
+    assert merged.lookup("cat") == "кот; кошка; котёнок"
+    assert len(merged.lookup("cat").split("; ")) == MAX_TRANSLATIONS
+    assert merged.lookup("dog") == "собака"
+    merged.close()
+    first = build(tmp_path, pairs)
+    assert first.lookup("cat") == "кот"
+    first.close()
+
+
+def test_tabs_and_newlines_in_values(tmp_path):
+    dictionary = build(tmp_path, [("a\tb", "x"), ("word", "one\ttwo\nthree")])
+    assert len(dictionary) == 1
+    assert dictionary.lookup("word") == "one two three"
+    dictionary.close()
+
+
+@pytest.mark.parametrize(
+    "phones, ipa",
+    [
+        # Односложные слова - без знака ударения
+        ("P AE1 K", "pæk"),
+        ("G OW1", "ɡoʊ"),
+        ("S T R EH1 NG K TH S", "streŋkθs"),
+        ("AH0", "ə"),
+        # Ударение на первом слоге - в начале слова
+        ("EH1 K S T R AH0", "ˈekstrə"),
+        ("HH AE1 P IY0", "ˈhæpi"),
+        # Знак ударения перед самым длинным допустимым началом слога
+        ("AH0 B AE1 N D AH0 N", "əˈbændən"),
+        ("HH OW0 T EH1 L", "hoʊˈtel"),
+        ("D IH0 S T R OY1", "dɪˈstrɔɪ"),
+        ("IH0 K S P L EY1 N", "ɪkˈspleɪn"),
+        ("K AH0 M P Y UW1 T ER0", "kəmˈpjuːtər"),
+        ("B IH0 T W IY1 N", "bɪˈtwiːn"),
+        ("AE2 B S AH0 L UW1 T", "æbsəˈluːt"),
+    ],
+)
+def test_arpabet_to_ipa(phones, ipa):
+    assert arpabet_to_ipa(phones.split()) == ipa
+
+
+def test_arpabet_unknown_phone():
+    with pytest.raises(ValueError):
+        arpabet_to_ipa(["XX1"])
+
+
+def test_open_dictionary_from_dumps(tmp_path):
+    cmudict = tmp_path / "cmudict.dict"
+    cmudict.write_text(
+        ";;; comment\n"
+        "ABANDON  AH0 B AE1 N D AH0 N\n"
+        "ABANDON(2)  AH0 B AE1 N D IH0 N\n"
+        "WAS  W AA1 Z  # comment\n"
+        "WERE  W ER1\n"
+        "ICE  AY1 S\n"
+        "CREAM  K R IY1 M\n"
+        "BAD  B AE1 D XX\n",
+        encoding="utf-8",
+    )
+    cache = tmp_path / "cache"
+    pronunciations = open_dictionary(cmudict, PRONUNCIATIONS, cache)
+    assert len(pronunciations) == 5
+    assert transcribe("abandon", pronunciations) == "[əˈbændən]"
+    assert transcribe("was/were", pronunciations) == "[wɑːz/wɜːr]"
+    assert transcribe("ice-cream", pronunciations) == "[aɪs-kriːm]"
+    assert transcribe("bad", pronunciations) is None
+    # Повторное открытие берёт готовый индекс из кеша
+    assert len(list(cache.iterdir())) == 1
+    open_dictionary(cmudict, PRONUNCIATIONS, cache).close()
+    assert len(list(cache.iterdir())) == 1
+    pronunciations.close()
+
+
+def test_enrich_fills_only_empty_cells(tmp_path):
+    cmudict = tmp_path / "cmudict.dict"
+    cmudict.write_text("CAT  K AE1 T\nDOG  D AO1 G\n", encoding="utf-8")
+    tsv = tmp_path / "en-ru.tsv"
+    tsv.write_text("cat\tкот\ncat\tкошка\ndog\tсобака\n", encoding="utf-8")
+    source = tmp_path / "words.csv"
+    source.write_text(
+        "word,transcription,translation,example_en,example_ru,audio_url\n"
+        "cat,,,A cat.,Кот.,\n"
+        "dog,[dɒɡ],,A dog.,Собака.,\n"
+        "unknown,,,,,\n",
+        encoding="utf-8",
+    )
+    dictionaries = {
+        PRONUNCIATIONS: open_dictionary(cmudict, PRONUNCIATIONS, tmp_path / "c"),
+        TRANSLATIONS: open_dictionary(tsv, TRANSLATIONS, tmp_path / "c"),
+    }
+    output = tmp_path / "out.csv"
+    enricher = enrich_csv(source, output, dictionaries)
+    with open(output, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[1][:3] == ["cat", "[kæt]", "кот; кошка"]
+    assert rows[2][:3] == ["dog", "[dɒɡ]", "собака"]
+    assert rows[3][:3] == ["unknown", "", ""]
+    assert enricher.filled == {"transcription": 1, "translation": 2}
+    assert enricher.missing == {"transcription": 1, "translation": 1}
+    for dictionary in dictionaries.values():
+        dictionary.close()
@@ -0,0 +1,78 @@
+import csv
+import sqlite3
+import zipfile
+
+import pytest
+
+from deck_tools.build_all import load_generator
+from deck_tools.extract import SCHEMAS, extract_csv, plain_text
+
+WORDS = [
+    ["word", "transcription", "translation", "example_en", "example_ru", "audio_url"],
+    ["cat", "[kæt]", "кот, кошка", 'He said "meow".', "Он сказал «мяу».", ""],
+    ["chemist's", "[ˈkemɪsts]", "аптека", "At the chemist's.", "В аптеке.", ""],
+    ["ice cream", "[aɪs kriːm]", "мороженое", "I like ice cream.", "Люблю.", ""],
+]
+VERBS = [
+    [column for column, _ in SCHEMAS["verbs"].columns],
+    ["be", "was/were", "been", "[biː]", "[wʌz/wɜːr]", "[biːn]", "быть", "I was.", ""],
+    ["go", "went", "gone", "[ɡoʊ]", "[went]", "[ɡɔːn]", "идти, ехать", "Go!", "Иди!"],
+]
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+
+def build(generator, rows, tmp_path, *args):
+    source = tmp_path / f"{generator}.csv"
+    output = tmp_path / f"{generator}.apkg"
+    write_csv(source, rows)
+    load_generator(generator).main([str(source), "-o", str(output), *args])
+    return output
+
+
+def test_words_round_trip(tmp_path, capsys):
+    apkg = build("words", WORDS, tmp_path)
+    extractor = extract_csv(apkg, tmp_path / "out.csv")
+    assert read_csv(tmp_path / "out.csv") == WORDS
+    assert (extractor.rows, extractor.duplicates) == (3, 0)
+
+
+def test_verbs_round_trip(tmp_path, capsys):
+    apkg = build("verbs", VERBS, tmp_path)
+    extractor = extract_csv(apkg, tmp_path / "out.csv", chunk_size=1)
+    assert read_csv(tmp_path / "out.csv") == VERBS
+    assert (extractor.rows, extractor.duplicates) == (2, 0)
+
+
+def test_legacy_layout_duplicates_are_collapsed(tmp_path, capsys):
+    # Прежняя раскладка: пять моделей и пять одинаковых заметок на глагол
+    apkg = build("verbs", VERBS, tmp_path, "--layout", "legacy")
+    with zipfile.ZipFile(apkg) as package:
+        package.extract("collection.anki2", tmp_path)
+    conn = sqlite3.connect(str(tmp_path / "collection.anki2"))
+    (notes,) = conn.execute("SELECT count(*) FROM notes").fetchone()
+    conn.close()
+    assert notes == 10
+    extractor = extract_csv(apkg, tmp_path / "out.csv")
+    assert read_csv(tmp_path / "out.csv") == VERBS
+    assert (extractor.rows, extractor.duplicates) == (2, 8)
+
+
+def test_schema_must_match_package(tmp_path, capsys):
+    apkg = build("words", WORDS, tmp_path)
+    with pytest.raises(ValueError):
+        extract_csv(apkg, tmp_path / "out.csv", schema="verbs")
+    assert not (tmp_path / "out.csv").exists()
+
+
+def test_plain_text():
+    assert plain_text("cat") == "cat"
+    assert plain_text("<b>cat</b><br>кот&nbsp;&amp; <div>dog</div>") == "cat кот & dog"
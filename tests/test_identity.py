@@ -0,0 +1,145 @@
+import csv
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from deck_tools.build_all import load_generator
+from deck_tools.identity import note_guid, note_key, stable_deck_id
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL = SimpleNamespace(model_id=1607392319)
+# Значения из прошлых сборок: если они изменятся, Anki при импорте создаст
+# новую колоду и дубликаты всех заметок
+KNOWN = {
+    "deck": 1534724125,
+    "deck_parts": 1463199389,
+    "guid": "C8=1U#~+g!",
+    "key": "mmydx3yac",
+}
+IDENTITIES = """
+import json
+from types import SimpleNamespace
+from deck_tools.identity import note_guid, note_key, stable_deck_id
+model = SimpleNamespace(model_id=1607392319)
+print(json.dumps({
+    "deck": stable_deck_id("English Words"),
+    "deck_parts": stable_deck_id("a", "b"),
+    "guid": note_guid(model, "cat"),
+    "key": note_key(model, "cat"),
+}))
+"""
+
+WORDS = [
+    ["word", "transcription", "translation", "example_en", "example_ru", "audio_url"],
+    ["cat", "[kæt]", "кот", "A cat.", "Кот.", ""],
+    ["become", "", "становиться", "", "", ""],
+    ["ice cream", "", "мороженое", "", "", ""],
+]
+VERBS = [
+    [
+        "infinitive",
+        "past_simple",
+        "past_participle",
+        "transcription_inf",
+        "transcription_ps",
+        "transcription_pp",
+        "translation",
+        "example_en",
+        "example_ru",
+    ],
+    ["become", "became", "become", "", "", "", "становиться", "", ""],
+    ["go", "went", "gone", "", "", "", "идти", "", ""],
+]
+
+
+def test_known_values():
+    assert stable_deck_id("English Words") == KNOWN["deck"]
+    assert stable_deck_id("a", "b") == KNOWN["deck_parts"]
+    assert note_guid(MODEL, "cat") == KNOWN["guid"]
+    assert note_key(MODEL, "cat") == KNOWN["key"]
+
+
+@pytest.mark.parametrize("seed", ["0", "1", "random"])
+def test_same_values_in_new_process(seed):
+    # Встроенный hash() строк зависит от PYTHONHASHSEED, ID от него - нет
+    env = dict(os.environ, PYTHONHASHSEED=seed)
+    result = subprocess.run(
+        [sys.executable, "-c", IDENTITIES],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert json.loads(result.stdout) == KNOWN
+
+
+def test_ranges_and_separation():
+    deck_id = stable_deck_id("English Words")
+    assert 1 << 30 <= deck_id < 1 << 31
+    # Части разделяются, а не склеиваются
+    assert stable_deck_id("ab", "c") != stable_deck_id("a", "bc")
+    other = SimpleNamespace(model_id=MODEL.model_id + 1)
+    assert note_guid(MODEL, "become") != note_guid(other, "become")
+    assert note_key(MODEL, "become") != note_key(other, "become")
+    key = note_key(MODEL, "it's; \"quoted\"")
+    assert len(key) <= 10 and key.isalnum() and key == key.lower()
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def build(generator, rows, directory, *args):
+    directory.mkdir()
+    source = directory / f"{generator}.csv"
+    output = directory / f"{generator}.apkg"
+    write_csv(source, rows)
+    load_generator(generator).main([str(source), "-o", str(output), *args])
+    with zipfile.ZipFile(output) as package:
+        package.extract("collection.anki2", directory)
+    conn = sqlite3.connect(str(directory / "collection.anki2"))
+    guids = dict(
+        conn.execute(
+            "SELECT substr(flds, 1, instr(flds, char(31)) - 1), guid FROM notes"
+        )
+    )
+    decks = set(conn.execute("SELECT DISTINCT did FROM cards").fetchall())
+    conn.close()
+    return guids, decks
+
+
+@pytest.mark.parametrize("generator, rows", [("words", WORDS), ("verbs", VERBS)])
+def test_rebuilds_keep_deck_id_and_guids(generator, rows, tmp_path, capsys):
+    guids, decks = build(generator, rows, tmp_path / "first")
+    assert len(guids) == len(rows) - 1
+    assert len(set(guids.values())) == len(guids)
+    # Другой порядок строк и изменённые переводы: GUID по ключевой колонке
+    column = rows[0].index("translation")
+    changed = [rows[0]]
+    for row in reversed(rows[1:]):
+        changed.append(row[:column] + [row[column] + " (new)"] + row[column + 1 :])
+    again, again_decks = build(generator, changed, tmp_path / "second")
+    assert again == guids
+    assert again_decks == decks
+    assert len(decks) == 1
+
+
+def test_deck_name_sets_deck_id(tmp_path, capsys):
+    _, decks = build("words", WORDS, tmp_path / "default")
+    assert decks == {(stable_deck_id("English Words"),)}
+    _, decks = build("words", WORDS, tmp_path / "named", "--name", "Other")
+    assert decks == {(stable_deck_id("Other"),)}
+
+
+def test_same_key_in_words_and_verbs(tmp_path, capsys):
+    words, _ = build("words", WORDS, tmp_path / "words")
+    verbs, _ = build("verbs", VERBS, tmp_path / "verbs")
+    assert words["become"] != verbs["become"]
@@ -0,0 +1,86 @@
+import sqlite3
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+from deck_tools.build_all import load_generator
+
+ROOT = Path(__file__).resolve().parent.parent
+GENERATORS = [
+    (ROOT / "word" / "generate_words_deck.py", ROOT / "word" / "words.csv"),
+    (
+        ROOT / "irregular_verbs" / "generate_verbs_deck.py",
+        ROOT / "irregular_verbs" / "verbs.csv",
+    ),
+]
+# Запускает генератор и печатает, был ли импортирован genanki
+RUN = """
+import os, runpy, sys
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+finally:
+    print("genanki" in sys.modules)
+"""
+
+
+def run(script, *args):
+    result = subprocess.run(
+        [sys.executable, "-c", RUN, str(script), *map(str, args)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.splitlines()
+
+
+def test_unchanged_deck_is_skipped_before_genanki(tmp_path):
+    for script, source in GENERATORS:
+        output = tmp_path / f"{script.stem}.apkg"
+        assert run(script, source, "-o", output)[-1] == "True"
+        lines = run(script, source, "-o", output)
+        assert lines[-1] == "False"
+        assert str(output) in lines[-2]
+
+
+def test_changed_source_is_rebuilt(tmp_path):
+    script, source = GENERATORS[0]
+    output = tmp_path / "words.apkg"
+    csv_file = tmp_path / "words.csv"
+    csv_file.write_text(source.read_text(encoding="utf-8"), encoding="utf-8")
+    run(script, csv_file, "-o", output)
+    with open(csv_file, "a", encoding="utf-8") as f:
+        f.write("zebra,[ˈziːbrə],зебра,A zebra ran.,Зебра бежала.,\n")
+    assert run(script, csv_file, "-o", output)[-1] == "True"
+
+
+def test_shuffled_patch_keeps_positions_unique(tmp_path, capsys):
+    main = load_generator("words").main
+    csv_file = tmp_path / "words.csv"
+    output = tmp_path / "words.apkg"
+    header = "word,transcription,translation,example_en,example_ru,audio_url\n"
+    rows = [f"word{i},,перевод {i},,,\n" for i in range(20)]
+    csv_file.write_text(header + "".join(rows), encoding="utf-8")
+    main([str(csv_file), "-o", str(output), "--shuffle"])
+    # Новые и изменённые строки пересобираются, остальные заметки остаются
+    rows[3] = "word3,,новый перевод,,,\n"
+    rows += [f"new{i},,новое {i},,,\n" for i in range(5)]
+    csv_file.write_text(header + "".join(rows), encoding="utf-8")
+    main([str(csv_file), "-o", str(output), "--shuffle"])
+    assert "Пересобрано строк: 6 из 25" in capsys.readouterr().out
+    with zipfile.ZipFile(output) as package:
+        package.extract("collection.anki2", tmp_path)
+    conn = sqlite3.connect(str(tmp_path / "collection.anki2"))
+    dues = dict(conn.execute("SELECT DISTINCT nid, due FROM cards"))
+    (first_new,) = conn.execute(
+        "SELECT MIN(id) FROM notes WHERE flds LIKE 'new%' OR flds LIKE 'word3%'"
+    ).fetchone()
+    conn.close()
+    assert len(dues) == 25
+    assert len(set(dues.values())) == 25
+    kept = [due for nid, due in dues.items() if nid < first_new]
+    rebuilt = [due for nid, due in dues.items() if nid >= first_new]
+    assert len(rebuilt) == 6
+    assert min(rebuilt) > max(kept)
@@ -0,0 +1,249 @@
+import re
+import shutil
+import subprocess
+from html.parser import HTMLParser
+from types import SimpleNamespace
+
+import pytest
+
+from deck_tools.minify import (
+    BLOCK_TAGS,
+    STYLE_CLASS_PREFIX,
+    minify_html,
+    minify_js,
+    minify_models,
+)
+from deck_tools.preview import compile_template
+
+needs_node = pytest.mark.skipif(shutil.which("node") is None, reason="нет node")
+
+FIELDS = ("Word", "Audio", "NoteId")
+NOTES = [
+    ("cat", "", "k3x9a"),
+    ("chemist's", "[sound:a.mp3]", "b7q2z"),
+]
+# Правила классов, в которые вынесены атрибуты style
+_RULE_RE = re.compile(r"\.(%s\d+)\{([^{}]*)\}" % STYLE_CLASS_PREFIX)
+
+
+def node(code):
+    result = subprocess.run(
+        ["node", "-e", code], capture_output=True, text=True, check=True
+    )
+    return result.stdout
+
+
+def declarations(style):
+    """Объявления CSS как {свойство: значение} без !important и лишних пробелов"""
+    result = {}
+    for declaration in style.split(";"):
+        name, _, value = declaration.partition(":")
+        if name.strip():
+            value = value.replace("!important", "")
+            result[name.strip().lower()] = " ".join(value.split())
+    return result
+
+
+class Rendered(HTMLParser):
+    """
+    Что отображает браузер: элементы с атрибутами и итоговым стилем (style
+    и правила вынесенных классов), видимый текст и тексты скриптов.
+    """
+
+    def __init__(self, html, rules=None):
+        super().__init__(convert_charrefs=True)
+        self.rules = rules or {}
+        self.elements = []
+        self.text = []
+        self.scripts = []
+        self.raw = None
+        self.feed(html)
+        self.close()
+        text = re.sub(r"[ \t\r\n\f]+", " ", "".join(self.text))
+        self.text = re.sub(r" ?\x00[ \x00]*", "\n", text).strip()
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        style = declarations(attrs.pop("style", None) or "")
+        classes = []
+        for name in (attrs.pop("class", None) or "").split():
+            if name in self.rules:
+                style.update(self.rules[name])
+            else:
+                classes.append(name)
+        if classes:
+            attrs["class"] = " ".join(classes)
+        self.elements.append((tag, sorted(attrs.items()), style))
+        if tag in ("script", "style"):
+            self.raw = []
+        elif tag in BLOCK_TAGS:
+            self.text.append("\x00")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self.raw is not None:
+            if tag == "script":
+                self.scripts.append("".join(self.raw))
+            self.raw = None
+        elif tag in BLOCK_TAGS:
+            self.text.append("\x00")
+
+    def handle_data(self, data):
+        if self.raw is not None:
+            self.raw.append(data)
+        else:
+            self.text.append(data)
+
+    def view(self):
+        return self.elements, self.text
+
+
+def rules(css):
+    return {name: declarations(body) for name, body in _RULE_RE.findall(css)}
+
+
+def render(template, note):
+    return compile_template(template, FIELDS)(list(note))
+
+
+@needs_node
+def test_js_strings_and_regex_literals_are_kept():
+    code = r"""
+    // комментарий с 'кавычкой' и /слешем/
+    var url = 'http://example.com/a  b';  /* блок */
+    var quoted = "он сказал: \"//не комментарий\"";
+    var template = `a  ${url.length}  /* тоже строка */`;
+    var slashes = /\/\/+/g, klass = /[/]x/, spaces = / +/;
+    var a = 10, b = 2, half = a / b / 2;
+    function test(s) { return /^a.*z$/i.test(s); }
+    var parts = 'a / b'.split(/ \/ /);
+    console.log(JSON.stringify([
+        url, quoted, template, 'x//y'.replace(slashes, '/'),
+        klass.test('/x'), 'a  b'.replace(spaces, '_'), half,
+        test('abcz'), parts, typeof /x/
+    ]));
+    """
+    minified = minify_js(code)
+    assert len(minified) < len(code)
+    assert node(minified) == node(code)
+
+
+@needs_node
+def test_js_newlines_for_automatic_semicolons_are_kept():
+    code = """
+    var a = 1
+    var b = 2
+    var c = a
+    ++b
+    function f() {
+        return
+            42
+    }
+    var i = 0
+    i
+    ++
+    i
+    var s = 'x'
+    ;[1, 2].forEach(function(x) { s += x })
+    var g = function() { return 'g' }
+    (function() { s += '!' })
+    console.log(JSON.stringify([a, b, c, String(f()), i, s]))
+    """
+    minified = minify_js(code)
+    assert "\n" in minified
+    assert node(minified) == node(code)
+
+
+MUSTACHE_TEMPLATE = """
+<div class="word {{#Audio}}has-audio{{/Audio}}"  title="{{Word}}  ({{NoteId}})">
+    {{Word}}   <span class="hint">  {{NoteId}} </span>
+</div>
+{{#Audio}}<span class="audio">  {{Audio}}  </span>{{/Audio}}
+{{^Audio}}<button onclick="speakText('{{Word}}')"   style="color: red">
+    🔊  </button>{{/Audio}}
+<input type="text" oninput="answerStore.set('{{NoteId}}:t',  this.value)">
+<script type="application/json" id="accepted">{"w":  "{{Word}}"}</script>
+<script>
+// поле в комментарии: {{Word}}
+var word = "{{Word}}";   /* {{NoteId}} */
+var key = '{{NoteId}}' + ':t';
+{{#Audio}}var audio = true;{{/Audio}}{{^Audio}}var audio = false;{{/Audio}}
+console.log(JSON.stringify([word, key, audio,  10 / 2 / 5]))
+</script>
+"""
+
+
+@needs_node
+def test_mustache_tags_in_attributes_and_scripts():
+    minified = minify_html(MUSTACHE_TEMPLATE)
+    assert len(minified) < len(MUSTACHE_TEMPLATE)
+    for tag in ("{{#Audio}}has-audio{{/Audio}}", "{{^Audio}}", "'{{NoteId}}:t'"):
+        assert tag in minified
+    for note in NOTES:
+        before = Rendered(render(MUSTACHE_TEMPLATE, note))
+        after = Rendered(render(minified, note))
+        assert after.view() == before.view()
+        assert len(after.scripts) == len(before.scripts) == 2
+        assert after.scripts[0] == before.scripts[0]
+        assert node(after.scripts[1]) == node(before.scripts[1])
+
+
+def test_block_and_inline_whitespace():
+    template = """
+    <div>
+        <b>{{Word}}</b>   <i>{{NoteId}}</i>
+        <br>
+        text  <!-- комментарий -->  more
+    </div>
+    <pre>  {{Word}}
+      keep  </pre>
+    """
+    minified = minify_html(template)
+    assert "<pre>  {{Word}}\n      keep  </pre>" in minified
+    for note in NOTES:
+        before = Rendered(render(template, note))
+        assert Rendered(render(minified, note)).view() == before.view()
+
+
+STYLE_TEMPLATES = [
+    {
+        "qfmt": """
+        <div style="color: red; margin: 0 5px">{{Word}}</div>
+        <span class="hint" style="color:red;margin:0 5px;">{{NoteId}}</span>
+        <div id="feedback" style="color: red; margin: 0 5px"></div>
+        <p style="font-weight: bold">{{Word}}</p>
+        """,
+        "afmt": """
+        <div style="color: red; margin: 0 5px">{{Word}}</div>
+        <div style="color: {{Word}}">{{Word}}</div>
+        <div style="color: {{Word}}">{{Word}}</div>
+        <button style="background: #4CAF50; border: none;">🔊</button>
+        """,
+    },
+    {
+        "qfmt": """<button style="background: #4CAF50; border: none">🔊</button>""",
+        "afmt": """<div style="color: blue !important">x</div>
+        <div style="color: blue !important">y</div>""",
+    },
+]
+
+
+def test_style_hoisting_keeps_rendered_styles():
+    css = ".card { font-family: arial; }\n.hint { color: gray; }"
+    templates = [dict(template) for template in STYLE_TEMPLATES]
+    model = SimpleNamespace(templates=templates, css=css)
+    minify_models([model])
+    assert "ms1" in model.css and "!important" in model.css
+    # Повторяющиеся стили вынесены, уникальные, с id и с полями - нет
+    sides = [template[side] for template in templates for side in ("qfmt", "afmt")]
+    assert sum(side.count("style=") for side in sides) == 6
+    assert 'id="feedback" style="color: red; margin: 0 5px"' in sides[0]
+    assert sides[1].count('style="color: {{Word}}"') == 2
+    assert 'class="hint ms' in sides[0]
+    for original, minified in zip(
+        (template[side] for template in STYLE_TEMPLATES for side in ("qfmt", "afmt")),
+        sides,
+    ):
+        for note in NOTES:
+            before = Rendered(render(original, note))
+            after = Rendered(render(minified, note), rules(model.css))
+            assert after.view() == before.view()
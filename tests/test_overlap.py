@@ -0,0 +1,193 @@
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+from deck_tools.build_all import load_generator
+from deck_tools.extract import extract_csv
+from deck_tools.overlap import (
+    DUPLICATE,
+    NEAR,
+    OVERLAP,
+    Exclusion,
+    Location,
+    Match,
+    OverlapIndex,
+    main,
+    skeleton,
+    terms,
+)
+
+VERBS = [
+    [
+        "infinitive",
+        "past_simple",
+        "past_participle",
+        "transcription_inf",
+        "transcription_ps",
+        "transcription_pp",
+        "translation",
+        "example_en",
+        "example_ru",
+    ],
+    ["be", "was/were", "been", "[biː]", "[wʌz/wɜːr]", "[biːn]", "быть", "", ""],
+    ["go", "went", "gone", "[ɡoʊ]", "[went]", "[ɡɔːn]", "идти", "", ""],
+    ["cost", "cost", "cost", "", "", "", "стоить", "", ""],
+]
+WORDS = [
+    ["word", "transcription", "translation", "example_en", "example_ru", "audio_url"],
+    ["cat", "[kæt]", "кот", "A cat.", "Кот.", ""],
+    ["To Go", "", "идти", "", "", ""],
+    ["Cat", "", "кошка", "", "", ""],
+    ["was", "", "был", "", "", ""],
+    ["pack", "", "пачка", "", "", ""],
+    ["packing", "", "упаковка", "", "", ""],
+]
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+    return str(path)
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+
+@pytest.fixture
+def corpora(tmp_path):
+    return (
+        write_csv(tmp_path / "verbs.csv", VERBS),
+        write_csv(tmp_path / "words.csv", WORDS),
+    )
+
+
+def test_terms_and_skeleton():
+    assert terms("[wʌz/wɜːr] was/were") == ["was", "were"]
+    assert terms("  To  Go ") == ["go"]
+    assert terms("a; A, b") == ["a", "b"]
+    assert terms("[x]") == []
+    assert skeleton("packing") == skeleton("pack") == "pack"
+    assert skeleton("chooses") == skeleton("choose") == "chos"
+    # Короткая основа окончание не теряет
+    assert skeleton("bed") == "bed"
+
+
+def test_matches(corpora):
+    verbs, words = corpora
+    index = OverlapIndex()
+    assert index.add_file(verbs) == 3
+    assert index.add_file(words) == 6
+    assert list(index.iter_matches()) == [
+        Match(
+            OVERLAP,
+            Location(verbs, 3, "infinitive", "go"),
+            Location(words, 3, "word", "go"),
+        ),
+        Match(
+            DUPLICATE,
+            Location(words, 2, "word", "cat"),
+            Location(words, 4, "word", "cat"),
+        ),
+        # Формы глаголов тоже попадают в отчёт
+        Match(
+            OVERLAP,
+            Location(verbs, 2, "past_simple", "was"),
+            Location(words, 5, "word", "was"),
+        ),
+        Match(
+            NEAR,
+            Location(words, 6, "word", "pack"),
+            Location(words, 7, "word", "packing"),
+        ),
+    ]
+
+
+def test_matches_keep_terms_without_rereading(corpora):
+    # Термины совпадений, в том числе первого почти-дубликата, берутся из
+    # индекса, а не из файлов
+    verbs, words = corpora
+    index = OverlapIndex()
+    for csv_file in corpora:
+        index.add_file(csv_file)
+    os.remove(words)
+    near = [match for match in index.iter_matches() if match.code == NEAR]
+    assert [(match.first.term, match.other.term) for match in near] == [
+        ("pack", "packing")
+    ]
+
+
+def test_report_without_near(corpora):
+    verbs, words = corpora
+    index = OverlapIndex(near=False)
+    for csv_file in corpora:
+        index.add_file(csv_file)
+    report = index.report()
+    assert report["sources"] == [
+        {"file": verbs, "schema": "verbs", "rows": 3},
+        {"file": words, "schema": "words", "rows": 6},
+    ]
+    # cost/cost/cost - один термин строки
+    assert report["terms"] == 11
+    assert report["by_code"] == {OVERLAP: 2, DUPLICATE: 1}
+    assert json.loads(json.dumps(report)) == report
+
+
+def test_unknown_schema(tmp_path):
+    path = write_csv(tmp_path / "other.csv", [["front", "back"], ["a", "b"]])
+    with pytest.raises(ValueError, match="схема"):
+        OverlapIndex().add_file(path)
+
+
+def test_cli_report(corpora, tmp_path, monkeypatch, capsys):
+    report = tmp_path / "report.json"
+    monkeypatch.setattr(sys, "argv", ["overlap", *corpora, "--report", str(report)])
+    main()
+    data = json.loads(report.read_text(encoding="utf-8"))
+    assert data["by_code"] == {OVERLAP: 2, DUPLICATE: 1, NEAR: 1}
+    assert "почти-дубликатов: 1" in capsys.readouterr().err
+
+
+def test_exclusion_uses_primary_terms_only(corpora):
+    verbs, _ = corpora
+    exclusion = Exclusion([verbs])
+    assert exclusion.keys == {"be", "go", "cost"}
+    assert exclusion.covers("to go")
+    assert exclusion.covers("Be")
+    # Формы (was, went) не исключают
+    assert not exclusion.covers("was")
+    assert not exclusion.covers("went")
+    kept = list(exclusion.filter(["go", "cat", "cost", "was"], str))
+    assert kept == ["cat", "was"]
+    assert exclusion.excluded == 2
+
+
+def test_empty_exclusion_keeps_everything():
+    exclusion = Exclusion([])
+    assert list(exclusion.filter(["go", "cat"], str)) == ["go", "cat"]
+    assert exclusion.excluded == 0
+
+
+def test_words_deck_exclude(corpora, tmp_path, capsys):
+    verbs, words = corpora
+    source = write_csv(tmp_path / "unique.csv", [WORDS[0], WORDS[1], WORDS[2]])
+    output = tmp_path / "words.apkg"
+    load_generator("words").main([source, "-o", str(output), "--exclude", verbs])
+    assert "Исключено слов, уже покрытых другими корпусами: 1" in (
+        capsys.readouterr().out
+    )
+    extract_csv(output, tmp_path / "out.csv")
+    assert read_csv(tmp_path / "out.csv") == [WORDS[0], WORDS[1]]
+
+
+def test_verbs_deck_exclude(corpora, tmp_path, capsys):
+    verbs, words = corpora
+    output = tmp_path / "verbs.apkg"
+    load_generator("verbs").main([verbs, "-o", str(output), "--exclude", words])
+    assert "Skipped 1 verbs" in capsys.readouterr().out
+    extract_csv(output, tmp_path / "out.csv")
+    assert read_csv(tmp_path / "out.csv") == [VERBS[0], VERBS[1], VERBS[3]]
@@ -0,0 +1,134 @@
+import itertools
+
+import chevron
+import genanki
+import pytest
+
+from deck_tools.build_all import load_generator
+from deck_tools.preview import (
+    CompiledModel,
+    compile_template,
+    model_spec,
+    write_preview,
+)
+
+FIELDS = ("Word", "Audio", "Example")
+# Шаблоны, которые chevron (им genanki считает обязательные поля) и Anki
+# подставляют одинаково
+TEMPLATES = [
+    "{{Word}}",
+    "<b>{{Word}}</b> - {{ Example }}!",
+    "{{#Audio}}[{{Audio}}]{{/Audio}}",
+    "{{^Audio}}нет аудио у {{Word}}{{/Audio}}",
+    "{{#Word}}{{#Example}}{{Word}}: {{Example}}{{/Example}}{{/Word}}",
+    "{{#Audio}}a{{/Audio}}{{^Audio}}b{{/Audio}} {{Word}}{{Word}}",
+    "text only",
+    "",
+]
+# Значения без HTML спецсимволов: chevron их экранирует, Anki - нет
+VALUES = ["", "cat", "ice cream", "it's"]
+
+
+def model(templates, afmt="{{FrontSide}}<hr>{{Example}}"):
+    return genanki.Model(
+        1,
+        "test",
+        fields=[{"name": name} for name in FIELDS],
+        templates=[
+            {"name": f"T{number}", "qfmt": qfmt, "afmt": afmt}
+            for number, qfmt in enumerate(templates, 1)
+        ],
+    )
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_substitution_matches_chevron(template):
+    render = compile_template(template, FIELDS)
+    for values in itertools.product(VALUES, repeat=len(FIELDS)):
+        expected = chevron.render(template, dict(zip(FIELDS, values)))
+        assert render(list(values)) == expected
+
+
+def test_anki_specific_substitution():
+    # Поле из пробелов для секций пустое, text: убирает HTML, FrontSide -
+    # отрисованная лицевая сторона
+    render = compile_template("{{#Audio}}a{{/Audio}}{{^Audio}}b{{/Audio}}", FIELDS)
+    assert render(["", "  ", ""]) == "b"
+    render = compile_template("{{text:Word}}|{{Word}}", FIELDS)
+    assert render(["<b>cat</b>", "", ""]) == "cat|<b>cat</b>"
+    render = compile_template("{{FrontSide}}<hr>{{Example}}", FIELDS)
+    assert render(["", "", "ex"], "front") == "front<hr>ex"
+    render = compile_template("{{Missing}}", FIELDS)
+    assert render(["", "", ""]) == "{unknown field Missing}"
+
+
+@pytest.mark.parametrize(
+    "template", ["{{#Word}}x", "{{/Word}}", "{{#Word}}{{/Audio}}"]
+)
+def test_unbalanced_sections(template):
+    with pytest.raises(ValueError):
+        compile_template(template, FIELDS)
+
+
+def cards(model, values):
+    return [name for name, _, _ in CompiledModel(model_spec(model, {})).cards(values)]
+
+
+def genanki_cards(model, values):
+    note = genanki.Note(model=model, fields=list(values))
+    return [model.templates[card.ord]["name"] for card in note.cards]
+
+
+def test_cards_match_genanki():
+    # Без инвертированных секций, полей из пробелов и шаблонов без полей
+    # требования genanki совпадают с Anki
+    test_model = model(
+        [
+            "{{Word}}",
+            "{{#Audio}}{{Audio}}{{/Audio}}",
+            "{{#Word}}{{#Example}}{{Example}}{{/Example}}{{/Word}}",
+            "{{Word}} {{Example}}",
+        ]
+    )
+    for values in itertools.product(["", "x"], repeat=len(FIELDS)):
+        assert cards(test_model, values) == genanki_cards(test_model, values)
+
+
+def test_cards_follow_anki():
+    # Карточка есть, только если лицевая сторона подставляет непустое поле
+    test_model = model(
+        [
+            "{{^Audio}}{{Word}} без аудио{{/Audio}}",
+            "{{^Audio}}без аудио{{/Audio}}",
+            "text only",
+        ]
+    )
+    assert cards(test_model, ["cat", "", ""]) == ["T1"]
+    assert cards(test_model, ["cat", "a", ""]) == []
+    assert cards(test_model, ["", "", ""]) == []
+    # Поле из пробелов для Anki пустое
+    assert cards(test_model, ["  ", "", ""]) == []
+
+
+def test_generator_models_match_genanki(capsys):
+    words = load_generator("words").create_card_model()
+    verbs = load_generator("verbs").create_card_model()
+    for generator_model in (words, verbs):
+        names = [field["name"] for field in generator_model.fields]
+        full = [f"v{i}" for i in range(len(names))]
+        assert cards(generator_model, full) == genanki_cards(generator_model, full)
+        assert len(cards(generator_model, full)) == len(generator_model.templates)
+
+
+def test_write_preview(tmp_path):
+    test_model = model(["{{Word}}", "{{#Audio}}{{Audio}}{{/Audio}}"])
+    notes = [
+        genanki.Note(model=test_model, fields=[f"w{i}", "a" if i % 2 else "", "e"])
+        for i in range(5)
+    ]
+    result = write_preview(tmp_path, [test_model], notes, page_size=2, workers=1)
+    assert (result.notes, result.cards, result.pages) == (5, 7, 3)
+    pages = sorted(tmp_path.glob("page-*.html"))
+    assert len(pages) == 3
+    text = "".join(page.read_text(encoding="utf-8") for page in pages)
+    assert all(f"w{i}" in text for i in range(5))
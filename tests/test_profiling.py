@@ -0,0 +1,52 @@
+import pstats
+import subprocess
+import sys
+from pathlib import Path
+
+from deck_tools.profiling import NULL_PROFILE, capture, create_profile
+
+ROOT = Path(__file__).resolve().parent.parent
+# Печатает, какие профилировщики импортированы после пустого capture()
+IMPORTS = """
+import sys
+from deck_tools.profiling import capture
+with capture():
+    pass
+print("cProfile" in sys.modules, "tracemalloc" in sys.modules)
+"""
+
+
+def test_capture_without_options_imports_nothing():
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORTS],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.split() == ["False", "False"]
+
+
+def test_capture_writes_reports(tmp_path):
+    cprofile_path = tmp_path / "build.prof"
+    tracemalloc_path = tmp_path / "memory.txt"
+    with capture(str(cprofile_path), str(tracemalloc_path)):
+        data = [str(i) * 10 for i in range(1000)]
+    assert data
+    assert pstats.Stats(str(cprofile_path)).total_calls > 0
+    report = tracemalloc_path.read_text(encoding="utf-8")
+    assert report.startswith("current: ")
+    assert "peak: " in report
+
+
+def test_phases():
+    assert create_profile(False) is NULL_PROFILE
+    profile = create_profile(True)
+    rows = list(profile.timed_iter("csv", iter(range(5))))
+    with profile.phase("zip"):
+        pass
+    assert rows == list(range(5))
+    phases = profile.report()["phases"]
+    assert phases["csv"]["rows"] == 5
+    assert set(phases) == {"csv", "zip"}
+    assert NULL_PROFILE.timed_call("notes", len) is len
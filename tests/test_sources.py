@@ -0,0 +1,213 @@
+import csv
+import json
+import sqlite3
+
+import pytest
+
+from deck_tools.sources import (
+    FORMAT_CSV,
+    FORMAT_JSONL,
+    FORMAT_PARQUET,
+    FORMAT_SQLITE,
+    Source,
+    SourceFields,
+    SourceSpec,
+    open_source,
+    parse_mapping,
+    source_format,
+    source_options,
+)
+
+FIELDS = SourceFields(
+    names=("word", "translation", "example"),
+    required=("word", "translation"),
+    aliases={"word": "Word", "translation": "Translation", "example": "Example"},
+)
+ROWS = [
+    {"word": "cat", "translation": " кот, кошка ", "example": "A cat."},
+    {"word": "ice cream", "translation": "мороженое", "example": ""},
+    {"word": "it's", "translation": 'это "оно"', "example": "It's me."},
+]
+RECORDS = [
+    ["cat", "кот, кошка", "A cat."],
+    ["ice cream", "мороженое", ""],
+    ["it's", 'это "оно"', "It's me."],
+]
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_jsonl(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n\n")
+
+
+def write_sqlite(path, rows):
+    conn = sqlite3.connect(str(path))
+    columns = list(rows[0])
+    conn.execute(f"CREATE TABLE words ({', '.join(columns)})")
+    conn.executemany(
+        f"INSERT INTO words VALUES ({', '.join('?' for _ in columns)})",
+        [list(row.values()) for row in rows],
+    )
+    conn.commit()
+    conn.close()
+
+
+def write_parquet(path, rows):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    columns = {name: [row[name] for row in rows] for name in rows[0]}
+    pq.write_table(pa.table(columns), path, row_group_size=2)
+
+
+WRITERS = {
+    FORMAT_CSV: (".csv", write_csv),
+    FORMAT_JSONL: (".jsonl", write_jsonl),
+    FORMAT_SQLITE: (".db", write_sqlite),
+    FORMAT_PARQUET: (".parquet", write_parquet),
+}
+
+
+def make_source(tmp_path, source_format, rows, **spec):
+    suffix, write = WRITERS[source_format]
+    path = tmp_path / f"words{suffix}"
+    write(path, rows)
+    return open_source(SourceSpec(str(path), **spec))
+
+
+@pytest.fixture(params=list(WRITERS))
+def fmt(request):
+    return request.param
+
+
+def test_records(tmp_path, fmt):
+    source = make_source(tmp_path, fmt, ROWS)
+    assert list(source.records(FIELDS)) == RECORDS
+    assert source.count() == len(ROWS)
+    assert source.position > 0
+
+
+def test_anki_field_names_and_column_order(tmp_path, fmt):
+    rows = [
+        {
+            "Example": row["example"],
+            "Translation": row["translation"],
+            "WORD": row["word"],
+        }
+        for row in ROWS
+    ]
+    source = make_source(tmp_path, fmt, rows)
+    assert list(source.records(FIELDS)) == RECORDS
+
+
+def test_optional_column_missing(tmp_path, fmt):
+    rows = [{"word": row["word"], "translation": row["translation"]} for row in ROWS]
+    source = make_source(tmp_path, fmt, rows)
+    assert [record[2] for record in source.records(FIELDS)] == ["", "", ""]
+
+
+def test_explicit_mapping(tmp_path, fmt):
+    rows = [
+        {"headword": row["word"], "ru": row["translation"], "example": row["example"]}
+        for row in ROWS
+    ]
+    mapping = parse_mapping(["word=headword", "Translation=ru"])
+    source = make_source(tmp_path, fmt, rows, mapping=mapping)
+    assert list(source.records(FIELDS)) == RECORDS
+    bad = open_source(source.spec._replace(mapping=(("word", "nope"),)))
+    with pytest.raises(ValueError, match="nope"):
+        list(bad.records(FIELDS))
+
+
+def test_missing_required_column(tmp_path, fmt):
+    rows = [{"word": row["word"], "example": row["example"]} for row in ROWS]
+    source = make_source(tmp_path, fmt, rows)
+    with pytest.raises(ValueError, match="Translation"):
+        list(source.records(FIELDS))
+
+
+def test_jsonl_keys_vary_between_records(tmp_path):
+    path = tmp_path / "words.jsonl"
+    write_jsonl(
+        path,
+        [
+            {"word": "cat", "translation": "кот"},
+            {"Word": "dog", "TRANSLATION": "собака", "example": "A dog."},
+            {"word": "owl", "translation": None, "extra": 1},
+        ],
+    )
+    source = open_source(str(path))
+    assert list(source.records(FIELDS)) == [
+        ["cat", "кот", ""],
+        ["dog", "собака", "A dog."],
+        ["owl", "", ""],
+    ]
+
+
+def test_jsonl_missing_required_field(tmp_path):
+    path = tmp_path / "words.jsonl"
+    write_jsonl(path, [{"word": "cat", "translation": "кот"}, {"word": "dog"}])
+    source = open_source(str(path))
+    records = source.records(FIELDS)
+    assert next(records) == ["cat", "кот", ""]
+    with pytest.raises(ValueError, match="Translation"):
+        next(records)
+    assert source.position == 3
+
+
+def test_source_is_abstract():
+    with pytest.raises(TypeError):
+        Source(SourceSpec("a.csv"))
+
+
+def test_csv_short_row(tmp_path):
+    path = tmp_path / "words.csv"
+    path.write_text("word,translation,example\ncat,кот\n\ndog\n", encoding="utf-8")
+    source = open_source(str(path))
+    records = source.records(FIELDS)
+    assert next(records) == ["cat", "кот", ""]
+    with pytest.raises(ValueError, match="колонок"):
+        next(records)
+    assert source.position == 4
+
+
+def test_sqlite_table_query_and_types(tmp_path):
+    path = tmp_path / "words.db"
+    write_sqlite(path, ROWS)
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE other (word, translation, example)")
+    conn.execute("INSERT INTO other VALUES (42, 'сорок два', NULL)")
+    conn.commit()
+    conn.close()
+    with pytest.raises(ValueError, match="--table"):
+        open_source(str(path)).records(FIELDS)
+    source = open_source(SourceSpec(str(path), table="other"))
+    assert list(source.records(FIELDS)) == [["42", "сорок два", ""]]
+    source = open_source(
+        SourceSpec(str(path), query="SELECT * FROM words WHERE word LIKE 'i%'")
+    )
+    assert list(source.records(FIELDS)) == [RECORDS[1], RECORDS[2]]
+    assert source.count() == 2
+
+
+def test_source_format():
+    assert source_format(SourceSpec("a.NDJSON")) == FORMAT_JSONL
+    assert source_format(SourceSpec("a.txt", format=FORMAT_CSV)) == FORMAT_CSV
+    with pytest.raises(ValueError, match="--format"):
+        source_format(SourceSpec("a.txt"))
+    with pytest.raises(ValueError):
+        parse_mapping(["word"])
+
+
+def test_source_options():
+    assert source_options(SourceSpec("a.csv")) == {}
+    options = source_options(SourceSpec("a.db", table="t", mapping=(("word", "w"),)))
+    assert options["source"]["table"] == "t"
+    assert options["source"]["map"] == {"word": "w"}
@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from deck_tools.validation import SCHEMAS, run_validation, validate_csv
+
+ROOT = Path(__file__).resolve().parent.parent
+WORDS_HEADER = "word,transcription,translation,example_en,example_ru,audio_url\n"
+
+
+def js_literal_issues(report, column=None):
+    return [
+        issue
+        for issue in report["issues"]
+        if issue["code"] == "js_literal"
+        and (column is None or issue["column"] == column)
+    ]
+
+
+def test_words_csv_has_no_js_literals():
+    # chemist's и подобные слова: ответы читаются из поля Accepted, а не из JS,
+    # а шаблон примеров с '{{ExampleEn}}' не собирается
+    report = validate_csv(ROOT / "word" / "words.csv", SCHEMAS["words"], workers=1)
+    assert js_literal_issues(report) == []
+
+
+def test_js_literal_only_for_fields_in_js_strings(tmp_path):
+    csv_file = tmp_path / "words.csv"
+    csv_file.write_text(
+        WORDS_HEADER
+        + "chemist's,[ˈkemɪsts],аптека 'у',It's here.,Тут.,https://a/it's.mp3\n",
+        encoding="utf-8",
+    )
+    report = validate_csv(csv_file, SCHEMAS["words"], workers=1)
+    assert [issue["column"] for issue in js_literal_issues(report)] == ["audio_url"]
+
+
+def test_verbs_translation_is_not_js_literal(tmp_path):
+    csv_file = tmp_path / "verbs.csv"
+    csv_file.write_text(
+        ",".join(SCHEMAS["verbs"].columns)
+        + "\ngo,went,gone,[ɡoʊ],[went],[ɡɔːn],идти 'пешком',I go.,Я иду.\n",
+        encoding="utf-8",
+    )
+    report = validate_csv(csv_file, SCHEMAS["verbs"], workers=1)
+    assert js_literal_issues(report) == []
+
+
+def test_run_validation_missing_csv(tmp_path, capsys):
+    assert run_validation(tmp_path / "missing.csv", SCHEMAS["words"]) == 2
+    assert capsys.readouterr().err.startswith("Ошибка: ")
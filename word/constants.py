@@ -13,6 +13,11 @@ FIELD_TRANSLATION = "Translation"
 FIELD_EXAMPLE_EN = "ExampleEn"
 FIELD_EXAMPLE_RU = "ExampleRu"
 FIELD_AUDIO_URL = "AudioUrl"
+FIELD_AUDIO = "Audio"
+# Принимаемые ответы, считаются при сборке (deck_tools/answers.py)
+FIELD_ACCEPTED = "Accepted"
+# Короткий ID заметки для ключей введённых ответов в localStorage
+FIELD_NOTE_ID = "NoteId"
 
 # Файлы шаблонов
 TEMPLATE_FILES = {
@@ -23,7 +28,19 @@ TEMPLATE_FILES = {
 # Настройки по умолчанию
 DEFAULT_OUTPUT_FILE = "english_words.apkg"
 DEFAULT_DECK_NAME = "English Words"
+# Колонка CSV, по которой строится GUID заметки
+DEFAULT_GUID_FIELD = "word"
 TEMPLATES_DIR = "templates"
 
+# Каталог кеша скачанного аудио для --bundle-audio (внутри XDG_CACHE_HOME)
+AUDIO_CACHE_NAME = "audio"
+# Каталог кеша озвучки --tts (внутри XDG_CACHE_HOME)
+TTS_CACHE_NAME = "tts"
+# Каталог кеша хешей и перекодированного аудио (внутри XDG_CACHE_HOME)
+MEDIA_CACHE_NAME = "media"
+
+# Префикс общих медиафайлов (JS/CSS) в режиме --shared-assets
+ASSETS_PREFIX = "english_words"
+
 # Количество шаблонов карточек
 NUM_TEMPLATES = 2
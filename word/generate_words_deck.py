@@ -2,23 +2,34 @@
 """
 Генератор Anki колоды для изучения английских слов
 Использует внешние файлы для CSS, JS и HTML шаблонов
+
+genanki импортируется в функциях сборки, а не при загрузке модуля: --help,
+--validate и команды python -m deck_tools без сборки запускаются быстро.
 """
 import argparse
-import csv
-import genanki
-import random
 import sys
+from collections import namedtuple
+from operator import attrgetter
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
 from constants import (
+    ASSETS_PREFIX,
+    AUDIO_CACHE_NAME,
     DEFAULT_DECK_NAME,
+    DEFAULT_GUID_FIELD,
     DEFAULT_OUTPUT_FILE,
+    FIELD_ACCEPTED,
+    FIELD_AUDIO,
     FIELD_AUDIO_URL,
     FIELD_EXAMPLE_EN,
     FIELD_EXAMPLE_RU,
+    FIELD_NOTE_ID,
     FIELD_TRANSCRIPTION,
     FIELD_TRANSLATION,
     FIELD_WORD,
+    MEDIA_CACHE_NAME,
     MODEL_ID,
     MODEL_NAME,
     NUM_TEMPLATES,
@@ -26,6 +37,45 @@ from constants import (
     TEMPLATE_FILES,
     TEMPLATE_RUS_TO_EN,
     TEMPLATES_DIR,
+    TTS_CACHE_NAME,
+)
+from deck_tools.answers import ANSWER_STORE_JS, ANSWERS_JS, AcceptedAnswers
+from deck_tools.apkg import BACKEND_GENANKI, BACKENDS, PackageWriter, is_up_to_date
+from deck_tools.assets import SharedAssets
+from deck_tools.audio import AudioCache, default_cache_dir, fetch_audio, sound_tag
+from deck_tools.delta import load_previous_build
+from deck_tools.identity import note_guid, note_key, stable_deck_id
+from deck_tools.manifest import hash_row, hash_text, model_hashes, source_hashes
+from deck_tools.media import AUDIO_FORMATS, DEFAULT_BITRATE, MediaError, MediaStage
+from deck_tools.minify import minify_models
+from deck_tools.overlap import Exclusion
+from deck_tools.preview import DEFAULT_PAGE_SIZE, write_preview
+from deck_tools.profiling import NULL_PROFILE, capture, create_profile
+from deck_tools.sources import (
+    FORMAT_CSV,
+    FORMATS,
+    SourceFields,
+    SourceSpec,
+    open_source,
+    parse_mapping,
+    source_options,
+)
+from deck_tools.streaming import shuffled_positions
+from deck_tools.template_stats import template_bytes
+from deck_tools.tts import (
+    ENGINES,
+    TtsEngine,
+    TtsError,
+    generate_audio,
+    media_name,
+    speech_text,
+)
+from deck_tools.validation import SCHEMAS, run_validation
+from deck_tools.watch import DEFAULT_INTERVAL, FileCache, watch
+
+WordRecord = namedtuple(
+    "WordRecord",
+    "word transcription translation example_en example_ru audio_url",
 )
 
 
@@ -36,15 +86,31 @@ def inject_js_to_html(html, js_code):
     return f"<script>\n{js_code}\n</script>\n{html}"
 
 
+def read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
 class TemplateLoader:
-    def __init__(self, templates_dir=TEMPLATES_DIR):
+    """
+    cache — FileCache режима --watch: неизменённые файлы не перечитываются
+    между пересборками.
+    """
+
+    def __init__(self, templates_dir=TEMPLATES_DIR, cache=None):
         self.templates_dir = Path(__file__).parent / templates_dir
+        self.cache = cache
+        self.file_hashes = {}
 
     def load_file(self, filename):
         file_path = self.templates_dir / filename
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read()
+            if self.cache is not None:
+                content = self.cache.get(file_path, read_text)
+            else:
+                content = read_text(file_path)
+            self.file_hashes[filename] = hash_text(content)
+            return content
         except FileNotFoundError:
             print(f"Ошибка: Файл {file_path} не найден.")
             sys.exit(1)
@@ -58,6 +124,9 @@ class TemplateLoader:
     def load_js(self):
         return self.load_file("check_answer.js")
 
+    def load_tts_js(self):
+        return self.load_file("tts_button.js")
+
     def load_card_template(self, front_file, back_file):
         return {
             "front": self.load_file(front_file),
@@ -65,11 +134,52 @@ class TemplateLoader:
         }
 
 
-def create_card_model():
-    loader = TemplateLoader()
+def model_sources(templates_dir=TEMPLATES_DIR):
+    """source_hashes генератора, констант и файлов шаблонов"""
+    script = Path(__file__).resolve()
+    templates = (script.parent / templates_dir).iterdir()
+    return source_hashes(
+        [
+            script,
+            script.parent / "constants.py",
+            *sorted(path for path in templates if path.is_file()),
+        ]
+    )
+
+
+def create_card_model(loader=None, assets=None):
+    """
+    Создаёт модель. Если передан SharedAssets, JS и CSS не встраиваются
+    в каждый шаблон, а подключаются из общих медиафайлов.
+    """
+    import genanki
+
+    loader = loader or TemplateLoader()
 
     css = loader.load_css()
-    js_code = loader.load_js()
+    # Лицевая сторона только сохраняет ввод, обратная - проверяет его
+    front_js = ANSWER_STORE_JS
+    back_js = ANSWERS_JS + loader.load_js()
+
+    if assets is None:
+
+        def front(html):
+            return inject_js_to_html(html, front_js)
+
+        def back(html):
+            return inject_js_to_html(html, back_js)
+
+    else:
+        tts_script = assets.script("tts_button.js", loader.load_tts_js())
+        front_script = assets.script("answer_store.js", front_js) + tts_script
+        back_script = assets.script("check_answer.js", back_js) + tts_script
+        css = assets.stylesheet("styles.css", css)
+
+        def front(html):
+            return front_script + html
+
+        def back(html):
+            return back_script + html
 
     en_to_rus = loader.load_card_template(*TEMPLATE_FILES["en_to_rus"])
     rus_to_en = loader.load_card_template(*TEMPLATE_FILES["rus_to_en"])
@@ -84,17 +194,20 @@ def create_card_model():
             {"name": FIELD_EXAMPLE_EN},
             {"name": FIELD_EXAMPLE_RU},
             {"name": FIELD_AUDIO_URL},
+            {"name": FIELD_AUDIO},
+            {"name": FIELD_ACCEPTED},
+            {"name": FIELD_NOTE_ID},
         ],
         templates=[
             {
                 "name": TEMPLATE_EN_TO_RUS,
-                "qfmt": inject_js_to_html(en_to_rus["front"], js_code),
-                "afmt": inject_js_to_html(en_to_rus["back"], js_code),
+                "qfmt": front(en_to_rus["front"]),
+                "afmt": back(en_to_rus["back"]),
             },
             {
                 "name": TEMPLATE_RUS_TO_EN,
-                "qfmt": inject_js_to_html(rus_to_en["front"], js_code),
-                "afmt": inject_js_to_html(rus_to_en["back"], js_code),
+                "qfmt": front(rus_to_en["front"]),
+                "afmt": back(rus_to_en["back"]),
             },
         ],
         css=css,
@@ -103,67 +216,125 @@ def create_card_model():
     return model
 
 
-def load_words_from_csv(csv_file):
-    words = []
+# Поля записи в источнике: колонки CSV или поля модели Anki
+SOURCE_FIELDS = SourceFields(
+    names=WordRecord._fields,
+    required=("word", "transcription", "translation", "example_en"),
+    aliases=dict(
+        zip(
+            WordRecord._fields,
+            [
+                FIELD_WORD,
+                FIELD_TRANSCRIPTION,
+                FIELD_TRANSLATION,
+                FIELD_EXAMPLE_EN,
+                FIELD_EXAMPLE_RU,
+                FIELD_AUDIO_URL,
+            ],
+        )
+    ),
+)
+
+
+def iter_words(source):
+    """
+    Построчно читает источник (CSV, JSONL, SQLite, Parquet — SourceSpec или
+    путь к файлу) и выдаёт компактные записи WordRecord.
+    """
+    spec = source if isinstance(source, SourceSpec) else SourceSpec(source)
+    reader = None
     try:
-        with open(csv_file, "r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                words.append(
-                    {
-                        "word": row["word"].strip(),
-                        "transcription": row["transcription"].strip(),
-                        "translation": row["translation"].strip(),
-                        "example_en": row["example_en"].strip(),
-                        "example_ru": row.get("example_ru", "").strip(),
-                        "audio_url": row.get("audio_url", "").strip(),
-                    }
-                )
+        reader = open_source(spec)
+        for values in reader.records(SOURCE_FIELDS):
+            yield WordRecord._make(values)
     except FileNotFoundError:
-        print(f"Ошибка: Файл {csv_file} не найден.")
+        print(f"Ошибка: Файл {spec.path} не найден.")
         sys.exit(1)
     except Exception as e:
-        print(f"Ошибка при чтении CSV файла: {e}")
+        line = f" (строка {reader.position})" if reader and reader.position else ""
+        print(f"Ошибка при чтении {spec.path}{line}: {e}")
+        print("Полный список проблем в CSV покажет запуск с --validate.")
         sys.exit(1)
 
-    return words
 
+def iter_words_from_csv(csv_file):
+    return iter_words(SourceSpec(csv_file))
 
-def create_deck(words, deck_name=DEFAULT_DECK_NAME, shuffle=False):
-    deck_id = random.randrange(1 << 30, 1 << 31)
-    deck = genanki.Deck(deck_id, deck_name)
-    model = create_card_model()
 
-    notes = []
-    for word in words:
-        note = genanki.Note(
-            model=model,
-            fields=[
-                word["word"],
-                word["transcription"],
-                word["translation"],
-                word["example_en"],
-                word["example_ru"],
-                word["audio_url"],
-            ],
-        )
-        notes.append(note)
+VALIDATION_SCHEMA = SCHEMAS["words"]
 
-    if shuffle:
-        random.shuffle(notes)
-        print("Карточки перемешаны случайным образом.")
 
-    for note in notes:
-        deck.add_note(note)
+def load_words(source):
+    return list(iter_words(source))
 
-    return deck
 
+def load_words_from_csv(csv_file):
+    return load_words(csv_file)
+
+
+# Поля, ответы на которые проверяются на карточках
+ANSWER_FIELDS = [(FIELD_TRANSLATION, "translation"), (FIELD_WORD, "word")]
+DEFAULT_ANSWERS = AcceptedAnswers(ANSWER_FIELDS)
+
+
+def create_notes(
+    word,
+    model,
+    audio="",
+    guid_field=DEFAULT_GUID_FIELD,
+    answers=DEFAULT_ANSWERS,
+):
+    """
+    audio — значение поля Audio, например [sound:...] для встроенного файла;
+    guid_field — колонка, по которой строится GUID заметки;
+    answers — AcceptedAnswers для поля Accepted.
+    """
+    import genanki
+
+    key = getattr(word, guid_field)
+    return [
+        genanki.Note(
+            model=model,
+            fields=[*word, audio, answers(word), note_key(model, key)],
+            guid=note_guid(model, key),
+        )
+    ]
+
+
+def bundle_audio(source, cache_dir, workers):
+    """
+    Скачивает все audio_url источника в кеш и возвращает (медиа, ошибки):
+    медиа — audio_url -> (имя медиафайла, путь в кеше).
+    """
+    urls = (word.audio_url for word in iter_words(source) if word.audio_url)
+    files, errors = fetch_audio(urls, AudioCache(cache_dir), workers=workers)
+    return {url: (path.name, path) for url, path in files.items()}, errors
+
+
+def tts_audio(source, engine, workers, bundled=None):
+    """
+    Озвучивает слова, для которых нет аудио: без audio_url или (при
+    --bundle-audio) без скачанного файла. Возвращает (медиа, ошибки): медиа —
+    текст озвучки -> (имя медиафайла, путь в кеше).
+    """
+    texts = (
+        speech_text(word.word)
+        for word in iter_words(source)
+        if not word.audio_url or (bundled is not None and word.audio_url not in bundled)
+    )
+    files, errors = generate_audio(texts, engine, workers=workers)
+    return {text: (media_name(path), path) for text, path in files.items()}, errors
 
-def main():
+
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки (argv=None - sys.argv)"""
     parser = argparse.ArgumentParser(
         description="Генератор Anki колоды для изучения английских слов"
     )
-    parser.add_argument("csv_file", help="Путь к CSV файлу со словами")
+    parser.add_argument(
+        "csv_file",
+        help="Путь к файлу со словами: CSV, JSONL, база SQLite или Parquet",
+    )
     parser.add_argument(
         "-o", "--output", default=DEFAULT_OUTPUT_FILE, help="Имя выходного файла"
     )
@@ -176,28 +347,498 @@ def main():
         action="store_true",
         help="Перемешать карточки случайным образом",
     )
+    parser.add_argument(
+        "--guid-field",
+        choices=WordRecord._fields,
+        default=DEFAULT_GUID_FIELD,
+        help="Колонка CSV, по которой строится GUID заметки (по умолчанию: word)",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="Пересобрать колоду целиком, не используя манифест сборки",
+    )
+    parser.add_argument(
+        "--shared-assets",
+        action="store_true",
+        help="Положить JS и CSS в колоду один раз медиафайлами вместо копий в каждом шаблоне",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help=(
+            "Минифицировать HTML, JS и CSS шаблонов и вынести повторяющиеся "
+            "стили в классы"
+        ),
+    )
+    parser.add_argument(
+        "--bundle-audio",
+        action="store_true",
+        help="Скачать аудио из audio_url и встроить его в колоду для работы без сети",
+    )
+    parser.add_argument(
+        "--audio-cache",
+        default=str(default_cache_dir(AUDIO_CACHE_NAME)),
+        help="Каталог кеша скачанного аудио",
+    )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=8,
+        help="Число одновременных загрузок аудио",
+    )
+    parser.add_argument(
+        "--tts",
+        choices=ENGINES,
+        help=(
+            "Озвучить слова без аудио локальным синтезатором речи и встроить "
+            "файлы в колоду"
+        ),
+    )
+    parser.add_argument(
+        "--tts-command",
+        metavar="CMD",
+        help=(
+            "Своя команда синтеза вместо --tts: текст подаётся на stdin, в "
+            "команду подставляются {voice}, {output} (WAV файл) и {text}"
+        ),
+    )
+    parser.add_argument(
+        "--tts-voice",
+        help="Голос: для espeak-ng по умолчанию en-us, для piper - путь к модели .onnx",
+    )
+    parser.add_argument(
+        "--tts-cache",
+        default=str(default_cache_dir(TTS_CACHE_NAME)),
+        help="Каталог кеша озвучки (по умолчанию: ~/.cache/rus-english-anki/tts)",
+    )
+    parser.add_argument(
+        "--tts-workers",
+        type=int,
+        help="Число одновременных процессов синтеза (по умолчанию: число CPU)",
+    )
+    parser.add_argument(
+        "--audio-format",
+        choices=AUDIO_FORMATS,
+        help=(
+            "Перекодировать встроенное аудио ffmpeg в этот формат (моно, "
+            "--audio-bitrate) для уменьшения колоды"
+        ),
+    )
+    parser.add_argument(
+        "--audio-bitrate",
+        default=DEFAULT_BITRATE,
+        help=f"Битрейт перекодированного аудио (по умолчанию: {DEFAULT_BITRATE})",
+    )
+    parser.add_argument(
+        "--media-cache",
+        default=str(default_cache_dir(MEDIA_CACHE_NAME)),
+        help=(
+            "Каталог кеша хешей и перекодированного аудио "
+            "(по умолчанию: ~/.cache/rus-english-anki/media)"
+        ),
+    )
+    parser.add_argument(
+        "--since",
+        metavar="PREVIOUS",
+        help=(
+            "Собрать дельта-пакет только с новыми и изменёнными заметками "
+            "относительно прошлой сборки (её .apkg или манифест)"
+        ),
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=BACKEND_GENANKI,
+        help=(
+            "Способ записи коллекции: genanki (по умолчанию) или sqlite - "
+            "пакетная запись напрямую в SQLite, быстрее на больших колодах"
+        ),
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        help="Формат файла со словами (по умолчанию: по расширению)",
+    )
+    parser.add_argument(
+        "--table", help="Таблица SQLite (по умолчанию: единственная в базе)"
+    )
+    parser.add_argument("--query", metavar="SQL", help="SQL запрос вместо --table")
+    parser.add_argument(
+        "--map",
+        metavar="ПОЛЕ=КОЛОНКА",
+        action="append",
+        help=(
+            "Колонка источника для поля (word или Word); можно указать "
+            "несколько раз"
+        ),
+    )
+    parser.add_argument(
+        "--typos",
+        action="store_true",
+        help=(
+            "Принимать ответ с одной опечаткой (пропущенная, лишняя или "
+            "заменённая буква в ответах от 5 букв)"
+        ),
+    )
+    parser.add_argument(
+        "--exclude",
+        metavar="CSV",
+        action="append",
+        default=[],
+        help=(
+            "Не включать слова, которые уже есть в другом корпусе (CSV слов "
+            "или глаголов); можно указать несколько раз"
+        ),
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Только проверить CSV и вывести JSON отчёт обо всех проблемах, без сборки",
+    )
+    parser.add_argument(
+        "--report",
+        metavar="FILE",
+        help="Файл для JSON отчёта --validate (по умолчанию stdout)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Число процессов для --validate и --preview (по умолчанию: число CPU)",
+    )
+    parser.add_argument(
+        "--preview",
+        metavar="DIR",
+        help=(
+            "Не собирать колоду, а отрисовать все карточки в статический HTML "
+            "в каталоге DIR"
+        ),
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help=f"Заметок на странице --preview (по умолчанию: {DEFAULT_PAGE_SIZE})",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="После сборки следить за CSV и шаблонами и пересобирать колоду при их изменении",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="Период опроса файлов в режиме --watch, секунд (по умолчанию: 0.2)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="REPORT",
+        help="Записать JSON отчёт со временем, числом строк и строк/с по фазам сборки",
+    )
+    parser.add_argument(
+        "--cprofile", metavar="FILE", help="Сохранить профиль cProfile сборки"
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        metavar="FILE",
+        help="Сохранить отчёт tracemalloc о выделениях памяти при сборке",
+    )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    try:
+        mapping = parse_mapping(args.map)
+    except ValueError as e:
+        parser.error(str(e))
+    args.source = SourceSpec(
+        args.csv_file, args.format, args.table, args.query, mapping
+    )
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.validate:
+        if args.format != FORMAT_CSV and not args.csv_file.lower().endswith(".csv"):
+            print("Ошибка: --validate проверяет только CSV файлы.")
+            sys.exit(1)
+        schema = VALIDATION_SCHEMA._replace(key=args.guid_field)
+        sys.exit(run_validation(args.csv_file, schema, args.report, args.workers))
+
+    if args.preview:
+        preview(args)
+        return
+
+    if args.watch:
+        cache = FileCache()
+        build(args, cache=cache)
+        args.force = False
+        templates_dir = Path(__file__).parent / TEMPLATES_DIR
+        paths = [args.csv_file, *args.exclude] + [
+            path
+            for path in sorted(templates_dir.iterdir())
+            if path.suffix in (".html", ".css", ".js")
+        ]
+        watch(paths, lambda changed: build(args, cache=cache), args.watch_interval)
+        return
+
+    profile = create_profile(args.profile)
+    with capture(args.cprofile, args.tracemalloc):
+        build(args, profile)
+    if args.profile:
+        profile.save(args.profile)
+        print(f"Отчёт о фазах сборки записан в {args.profile}")
+
+
+def preview(args):
+    """Отрисовывает карточки всех слов в статический HTML (--preview)"""
+    for csv_file in [args.csv_file, *args.exclude]:
+        if not Path(csv_file).exists():
+            print(f"Ошибка: Файл '{csv_file}' не существует.")
+            sys.exit(1)
+    assets = SharedAssets(ASSETS_PREFIX, args.minify) if args.shared_assets else None
+    model = create_card_model(TemplateLoader(), assets)
+    if args.minify:
+        minify_models([model])
+    answers = AcceptedAnswers(ANSWER_FIELDS, typos=args.typos)
+    try:
+        exclusion = Exclusion(args.exclude)
+    except ValueError as e:
+        print(f"Ошибка в --exclude: {e}")
+        sys.exit(1)
+    words = exclusion.filter(iter_words(args.source), attrgetter("word"))
+    notes = (
+        note
+        for word in words
+        for note in create_notes(
+            word, model, guid_field=args.guid_field, answers=answers
+        )
+    )
+    result = write_preview(
+        args.preview,
+        [model],
+        notes,
+        title=args.name,
+        page_size=args.page_size,
+        workers=args.workers,
+        media=assets.files if assets else None,
+    )
+    print(
+        f"Предпросмотр: {result.notes} слов, {result.cards} карточек на "
+        f"{result.pages} страницах: {result.index}"
+    )
+
+
+def build(args, profile=NULL_PROFILE, cache=None, template_cache=None):
+    """
+    Собирает колоду по разобранным аргументам командной строки. cache —
+    FileCache режима --watch для шаблонов и разобранных строк CSV;
+    template_cache — FileCache только для шаблонов (build-all: шаблоны
+    читаются один раз на процесс, а строки CSV не держатся в памяти).
+    """
+    for csv_file in [args.csv_file, *args.exclude]:
+        if not Path(csv_file).exists():
+            print(f"Ошибка: Файл '{csv_file}' не существует.")
+            sys.exit(1)
+    try:
+        # Формат, таблица и колонки источника проверяются до сборки
+        open_source(args.source).records(SOURCE_FIELDS)
+    except Exception as e:
+        print(f"Ошибка: {args.csv_file}: {e}")
+        sys.exit(1)
+
+    answers = AcceptedAnswers(ANSWER_FIELDS, typos=args.typos)
+    media_stage = MediaStage(args.media_cache, args.audio_format, args.audio_bitrate)
+    try:
+        engine = TtsEngine.from_args(
+            args.tts, args.tts_command, args.tts_voice, args.tts_cache
+        )
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        sys.exit(1)
+    inputs = [args.csv_file, *args.exclude]
+    options = {
+        "name": args.name,
+        "shuffle": args.shuffle,
+        "shared_assets": args.shared_assets,
+        "minify": args.minify,
+        "bundle_audio": args.bundle_audio,
+        "guid_field": args.guid_field,
+        **source_options(args.source),
+        **answers.options(),
+        **(engine.options() if engine else {}),
+        **media_stage.options(),
+    }
+    # Без изменений колода пропускается до построения модели и импорта genanki
+    with profile.phase("manifest"):
+        sources = model_sources()
+        current = (
+            not args.force
+            and not args.since
+            and is_up_to_date(args.output, inputs, sources, options)
+        )
+    if current:
+        print(f"Колода {args.output} актуальна, пересборка не требуется.")
+        return
+
+    import genanki
+
+    with profile.phase("model"):
+        loader = TemplateLoader(cache=cache or template_cache)
+        assets = None
+        if args.shared_assets:
+            assets = SharedAssets(ASSETS_PREFIX, args.minify)
+        model = create_card_model(loader, assets)
+        source_bytes = template_bytes([model])
+        if args.minify:
+            minify_models([model])
+    with profile.phase("manifest"):
+        writer = PackageWriter(
+            args.output,
+            inputs=inputs,
+            templates={**loader.file_hashes, **model_hashes([model])},
+            options=options,
+            force=args.force,
+            sources=sources,
+        )
+        try:
+            since = load_previous_build(args.since) if args.since else None
+        except (OSError, ValueError) as e:
+            print(f"Ошибка в --since: {e}", file=sys.stderr)
+            sys.exit(1)
+        current = since is None and writer.is_current()
+    if current:
+        writer.mark_current()
+        print(f"Колода {args.output} актуальна, пересборка не требуется.")
+        return
 
-    if not Path(args.csv_file).exists():
-        print(f"Ошибка: CSV файл '{args.csv_file}' не существует.")
+    try:
+        exclusion = Exclusion(args.exclude, cache)
+    except ValueError as e:
+        print(f"Ошибка в --exclude: {e}")
         sys.exit(1)
 
-    print(f"Загрузка слов из {args.csv_file}...")
-    words = load_words_from_csv(args.csv_file)
-    print(f"Загружено {len(words)} слов.")
+    positions = None
+    if args.shuffle:
+        with profile.phase("shuffle"):
+            positions = iter(shuffled_positions(open_source(args.source).count()))
+        print("Карточки перемешаны случайным образом.")
 
-    print("Создание Anki колоды...")
-    deck = create_deck(words, args.name, shuffle=args.shuffle)
+    audio = {}
+    if args.bundle_audio:
+        print("Загрузка аудио...")
+        with profile.phase("audio"):
+            audio, errors = bundle_audio(
+                args.source, args.audio_cache, args.download_workers
+            )
+        print(f"Аудио в кеше: {len(audio)} файлов, ошибок загрузки: {len(errors)}.")
+        for url, error in errors.items():
+            print(f"  {url}: {error}")
+
+    tts = {}
+    if engine is not None:
+        print("Озвучка слов без аудио...")
+        with profile.phase("tts"):
+            try:
+                tts, errors = tts_audio(
+                    args.source,
+                    engine,
+                    args.tts_workers,
+                    audio if args.bundle_audio else None,
+                )
+            except TtsError as e:
+                print(f"Ошибка: {e}")
+                sys.exit(1)
+        print(f"Озвучено слов: {len(tts)}, ошибок синтеза: {len(errors)}.")
+        for text, error in list(errors.items())[:20]:
+            print(f"  {text}: {error}")
+        if len(errors) > 20:
+            print(f"  ... и ещё {len(errors) - 20}")
+
+    if audio or tts:
+        with profile.phase("media"):
+            try:
+                staged = media_stage.process([*audio.values(), *tts.values()])
+            except MediaError as e:
+                print(f"Ошибка: {e}")
+                sys.exit(1)
+        audio = {url: staged.files[name] for url, (name, _) in audio.items()}
+        tts = {text: staged.files[name] for text, (name, _) in tts.items()}
+        print(
+            f"Медиафайлы: дубликатов {staged.duplicates}, перекодировано "
+            f"{staged.encoded}, сэкономлено {staged.saved // 1024} КБ."
+        )
+        for name, error in list(staged.errors.items())[:20]:
+            print(f"  {name}: {error}")
+
+    def audio_field(word):
+        if word.audio_url in audio:
+            return sound_tag(audio[word.audio_url][0])
+        if tts:
+            speech = tts.get(speech_text(word.word))
+            if speech is not None:
+                return sound_tag(speech[0])
+        return ""
+
+    def notes_for_row(word):
+        return create_notes(
+            word,
+            model,
+            audio=audio_field(word),
+            guid_field=args.guid_field,
+            answers=answers,
+        )
 
-    print(f"Генерация {args.output}...")
-    genanki.Package(deck).write_to_file(args.output)
+    media = dict(assets.files) if assets else {}
+    media.update(audio.values())
+    media.update(tts.values())
+
+    print(f"Генерация {args.output} из {args.csv_file}...")
+    deck = genanki.Deck(stable_deck_id(args.name), args.name)
+    if cache is not None:
+        words = cache.get(args.csv_file, load_words, args.source)
+    else:
+        words = iter_words(args.source)
+    words = exclusion.filter(words, attrgetter("word"))
+    rows = ((hash_row([*word, audio_field(word)]), word) for word in words)
+    result = writer.write(
+        deck,
+        [model],
+        rows,
+        notes_for_row,
+        media=media,
+        since=since,
+        profile=profile,
+        backend=args.backend,
+        positions=positions,
+    )
+    if exclusion.excluded:
+        print(f"Исключено слов, уже покрытых другими корпусами: {exclusion.excluded}.")
+    if since is not None:
+        print(
+            f"Дельта-пакет {args.output}: {result.notes} новых или изменённых "
+            f"заметок из {result.rows} слов, медиафайлов: {result.media}"
+        )
+        return
+    if result.patched:
+        print(
+            f"Пересобрано строк: {result.rebuilt} из {result.rows}, "
+            f"удалено устаревших заметок: {result.removed_notes}."
+        )
 
-    total_cards = len(words) * NUM_TEMPLATES
+    total_cards = result.rows * NUM_TEMPLATES
     print(
         f"Успешно создана колода {args.output} с {total_cards} карточками "
-        f"({len(words)} слов x {NUM_TEMPLATES} шаблонов в одной модели)"
+        f"({result.rows} слов x {NUM_TEMPLATES} шаблонов в одной модели)"
     )
+    size = template_bytes([model])
+    if args.minify:
+        print(f"Размер шаблонов: {size} байт (до минификации {source_bytes} байт)")
+    else:
+        print(f"Размер шаблонов: {size} байт")
 
 
 if __name__ == "__main__":
@@ -1,57 +1,32 @@
-// Функция проверки ответа для карточки EN -> RUS
-window.checkTranslationAnswer = function(feedbackId, storageKey, userAnswer, correctAnswer) {
+// Функция проверки ответа по полю Accepted (принимаемые ответы поля field
+// собраны при генерации колоды, см. deck_tools/answers.js)
+window.checkAnswer = function(feedbackId, userAnswer, field) {
     var feedback = document.getElementById(feedbackId);
     if (!feedback) {
         console.error('Element with id "' + feedbackId + '" not found');
         return;
     }
-    
-    userAnswer = userAnswer.trim().toLowerCase();
-    correctAnswer = correctAnswer.toLowerCase();
-    
-    // Разрешаем несколько вариантов ответа через точку с запятой
-    var correctAnswers = correctAnswer.split(';').map(a => a.trim());
-    var isCorrect = correctAnswers.some(answer => 
-        userAnswer === answer || userAnswer.includes(answer)
-    );
 
-    if (isCorrect) {
-        feedback.className = 'feedback correct';
-        feedback.innerHTML = '✓ Правильно! Ваш ответ: ' + userAnswer;
-        feedback.style.display = 'block';
-    } else {
-        feedback.className = 'feedback incorrect';
-        feedback.innerHTML = '✗ Неправильно.<br>Ваш ответ: ' + (userAnswer || '(пусто)') + '<br>Правильный ответ: ' + correctAnswer;
-        feedback.style.display = 'block';
-    }
-    localStorage.removeItem(storageKey);
-};
+    var accepted = readAccepted(field);
+    var correctAnswer = accepted ? accepted.text : '';
+    userAnswer = userAnswer.trim();
 
-// Функция проверки ответа для карточки RUS -> EN
-window.checkWordAnswer = function(feedbackId, storageKey, userAnswer, correctAnswer) {
-    var feedback = document.getElementById(feedbackId);
-    if (!feedback) {
-        console.error('Element with id "' + feedbackId + '" not found');
-        return;
-    }
-    
-    userAnswer = userAnswer.trim().toLowerCase();
-    correctAnswer = correctAnswer.toLowerCase();
-
-    if (userAnswer === correctAnswer) {
+    var result = findAnswer(accepted, userAnswer);
+    if (result === 1) {
         feedback.className = 'feedback correct';
         feedback.innerHTML = '✓ Правильно! Ваш ответ: ' + userAnswer;
-        feedback.style.display = 'block';
+    } else if (result === 2) {
+        feedback.className = 'feedback correct';
+        feedback.innerHTML = '✓ Правильно, но с опечаткой.<br>Ваш ответ: ' + userAnswer + '<br>Правильный ответ: ' + correctAnswer;
     } else {
         feedback.className = 'feedback incorrect';
         feedback.innerHTML = '✗ Неправильно.<br>Ваш ответ: ' + (userAnswer || '(пусто)') + '<br>Правильный ответ: ' + correctAnswer;
-        feedback.style.display = 'block';
     }
-    localStorage.removeItem(storageKey);
+    feedback.style.display = 'block';
 };
 
 // Функция отображения ответа для практики с примерами
-window.displayExampleAnswer = function(feedbackId, storageKey, userAnswer, correctAnswer) {
+window.displayExampleAnswer = function(feedbackId, userAnswer, correctAnswer) {
     var feedback = document.getElementById(feedbackId);
     if (!feedback) {
         console.error('Element with id "' + feedbackId + '" not found');
@@ -66,6 +41,5 @@ window.displayExampleAnswer = function(feedbackId, storageKey, userAnswer, corre
         feedback.style.color = '#1565c0';
         feedback.style.border = '2px solid #90caf9';
     }
-    localStorage.removeItem(storageKey);
 };
 